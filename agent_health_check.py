@@ -8,7 +8,7 @@ import requests
 def post_chat(base_url: str, message: str, user_id: str, timeout_s: int) -> Dict[str, str]:
     resp = requests.post(
         f"{base_url}/chat",
-        json={"message": message, "user_id": user_id},
+        json={"message": message, "user_id": user_id, "include_context": True},
         timeout=timeout_s,
     )
     resp.raise_for_status()
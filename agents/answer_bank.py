@@ -0,0 +1,121 @@
+# agents/answer_bank.py
+"""Model-written answers prepared ahead of time, for use during outages.
+
+In degraded mode the teaching fallback can only paste a library lesson, and the
+library covers seven topics in one voice for everyone. Most teaching questions
+are a handful of shapes - explain X, show an example of X, what goes wrong with
+X, when do I use X, explain X more simply - so `tools/build_answer_bank.py`
+asks the real teaching agent each of those for every topic, level and learning
+style while quota is cheap (overnight, or whenever the daily window resets),
+and writes the answers to a JSON file. The coordinator loads that file at
+startup and serves from it before falling back to the library.
+
+File shape (`ANSWER_BANK_PATH`):
+
+    {"version": 1, "answers": [
+        {"topic": "loops", "level": "beginner", "style": "visual",
+         "template": "example", "question": "...", "answer": "...",
+         "model": "gemini-2.5-flash", "generated_at": "2026-10-19T02:14:00Z"},
+        ...]}
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BANK_VERSION = 1
+
+# Question shapes worth answering in advance, with the phrases that mark a
+# learner's message as that shape. "explain" is the default and has no cues.
+TEMPLATES: Dict[str, str] = {
+    "explain": "Explain {topic} in Python.",
+    "example": "Show me a worked example of {topic} in Python.",
+    "mistakes": "What are the most common mistakes with {topic} in Python, and how do I avoid them?",
+    "when": "When should I use {topic} in Python, and when not?",
+    "simpler": "Explain {topic} in Python again in simpler terms, with an everyday analogy.",
+}
+TEMPLATE_CUES: Dict[str, Tuple[str, ...]] = {
+    "simpler": ("simpler", "simple terms", "explain again", "don't get", "dont get", "confused"),
+    "example": ("example", "show me", "demonstrate", "sample code"),
+    "mistakes": ("mistake", "pitfall", "go wrong", "avoid", "error", "wrong"),
+    "when": ("when should", "when do", "why use", "why would", "when to use"),
+}
+
+LEVELS = ("beginner", "intermediate", "advanced")
+STYLES = ("visual", "auditory", "kinesthetic", "adaptive")
+
+
+class BankedAnswer(NamedTuple):
+    topic: str
+    level: str
+    style: str
+    template: str
+    answer: str
+
+
+def match_template(message: str) -> str:
+    low = (message or "").lower()
+    for name, cues in TEMPLATE_CUES.items():
+        if any(cue in low for cue in cues):
+            return name
+    return "explain"
+
+
+class AnswerBank:
+    """Answers keyed by (topic, level, style, template)."""
+
+    def __init__(self, entries: Optional[List[Dict[str, str]]] = None):
+        self._answers: Dict[Tuple[str, str, str, str], str] = {}
+        for entry in entries or []:
+            try:
+                key = (entry["topic"], entry["level"], entry["style"], entry["template"])
+                answer = entry["answer"].strip()
+            except (KeyError, AttributeError, TypeError):
+                continue
+            if answer:
+                self._answers[key] = answer
+
+    def __len__(self) -> int:
+        return len(self._answers)
+
+    @classmethod
+    def load(cls, path: str) -> "AnswerBank":
+        """The bank at `path`; empty (never an error) if missing or unreadable."""
+        if not path or not os.path.exists(path):
+            return cls()
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Answer bank %s not loaded: %s", path, e)
+            return cls()
+        if not isinstance(data, dict):
+            logger.warning("Answer bank %s not loaded: expected an object, got %s", path, type(data).__name__)
+            return cls()
+        if data.get("version") != BANK_VERSION:
+            logger.warning("Answer bank %s has version %s, expected %s", path, data.get("version"), BANK_VERSION)
+            return cls()
+        answers = data.get("answers")
+        bank = cls(answers if isinstance(answers, list) else None)
+        logger.info("Loaded %d banked answers from %s", len(bank), path)
+        return bank
+
+    def lookup(self, topic: str, level: str, style: str, message: str) -> Optional[BankedAnswer]:
+        """Best answer for this learner, relaxing the style before the question shape.
+
+        An answer in another learning style still answers the question; an
+        "explain" answer to "what goes wrong with loops?" does not, so the
+        template is only relaxed to "explain" last.
+        """
+        template = match_template(message)
+        for tmpl in dict.fromkeys((template, "explain")):
+            for sty in dict.fromkeys((style, "adaptive", *STYLES)):
+                answer = self._answers.get((topic, level, sty, tmpl))
+                if answer:
+                    return BankedAnswer(topic, level, sty, tmpl, answer)
+        return None
@@ -2,6 +2,7 @@ from google import genai
 from typing import Dict, Any
 
 from .base_agent import BaseGenAIAgent
+from .code_analysis import ADVANCED_FEATURES, INTERMEDIATE_FEATURES, analyze_code
 from .prompts import AGENT_PROMPTS
 
 # 1. ASSESSMENT LOGIC (The "Brain")
@@ -72,24 +73,15 @@ def analyze_student_input(student_input: str) -> Dict[str, Any]:
 
 def assess_with_code_sample(code_sample: str) -> Dict[str, Any]:
     """Assess skill level based on code sample"""
-    code_lower = code_sample.lower()
-    
-    advanced_indicators = ["def __", "async def", "yield", "@", "metaclass", "lambda"]
-    intermediate_indicators = ["def ", "class ", "import ", "return", "self.", "for ", "while "]
-    beginner_indicators = ["print(", "input(", "if ", "else:", "="]
-    
-    adv_count = sum(1 for ind in advanced_indicators if ind in code_lower)
-    int_count = sum(1 for ind in intermediate_indicators if ind in code_lower)
-    beg_count = sum(1 for ind in beginner_indicators if ind in code_lower)
-    
-    if adv_count >= 2: level = "advanced"
-    elif int_count >= 3: level = "intermediate"
-    else: level = "beginner"
-    
+    features = analyze_code(code_sample)
     return {
-        "assessed_level": level,
-        "code_complexity": {"advanced": adv_count, "intermediate": int_count},
-        "has_code_sample": True
+        "assessed_level": features.level,
+        "code_complexity": {
+            "advanced": len(features.present(ADVANCED_FEATURES)),
+            "intermediate": len(features.present(INTERMEDIATE_FEATURES)),
+        },
+        "has_code_sample": True,
+        **features.to_dict(),
     }
 
 # ==========================================
@@ -17,19 +17,43 @@ made the coach feel broken:
 
 from __future__ import annotations
 
+import json
+import logging
 import os
 import re
-from typing import Any, Dict, List, Optional, Sequence
+from collections.abc import Mapping
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
+import httpx
 from google import genai
 from google.genai import types
 
+logger = logging.getLogger(__name__)
+
 DEFAULT_MODEL = "gemini-2.5-flash"
 
 # Tried in order when the primary model is out of quota. Free-tier quota is
 # metered per model, so a smaller sibling is usually still available.
 DEFAULT_FALLBACK_MODELS = ["gemini-2.5-flash-lite", "gemini-2.0-flash-lite"]
 
+# Introduces results the coach computed itself, when the model is asked to
+# phrase them instead of calling tools for them.
+FACTS_HEADER = "Facts the coach has already worked out for this answer (use them as given):"
+
+# Sent after an answer that ran into max_output_tokens inside a code example,
+# with a budget of CONTINUATION_TOKENS: enough to finish the example, not to
+# write the rest of an answer that was already over budget.
+CONTINUE_PROMPT = (
+    "You ran out of space in the middle of a code example. Continue exactly where "
+    "you stopped, without repeating anything: finish that example, close its code "
+    "block, and end the answer there."
+)
+CONTINUATION_TOKENS = 256
+
+# Sentence or paragraph ends a cut-off answer can be trimmed back to.
+_COMPLETE_END_RE = re.compile(r"[.!?:)](?=\s)|\n\n")
+
 # How many prior turns to replay to the model. Enough for real follow-ups,
 # small enough to keep token cost predictable.
 HISTORY_TURNS = 8
@@ -40,6 +64,16 @@ def resolve_model_id() -> str:
     return os.getenv("ADK_MODEL") or os.getenv("GEMINI_MODEL") or DEFAULT_MODEL
 
 
+def supports_thinking(model: str) -> bool:
+    """Whether `model` takes a thinking budget (Gemini 2.5 and later).
+
+    Older models reject a request that carries `thinking_config`, and they sit
+    in the default fallback chain.
+    """
+    match = re.match(r"gemini-(\d+)\.(\d+)", model or "")
+    return bool(match) and (int(match.group(1)), int(match.group(2))) >= (2, 5)
+
+
 def resolve_fallback_models(primary: str) -> List[str]:
     """Ordered fallback models, honouring GEMINI_FALLBACK_MODELS if set."""
     configured = os.getenv("GEMINI_FALLBACK_MODELS", "")
@@ -107,21 +141,50 @@ def classify_error(exc: BaseException) -> AgentCallError:
         return AgentCallError("bad_request", text)
     if status is not None and status >= 500:
         return AgentCallError("server_error", text, retry_after)
-    if "timeout" in text.lower() or "deadline" in text.lower():
+    low = text.lower()
+    if isinstance(exc, httpx.TimeoutException) or "timeout" in low or "timed out" in low or "deadline" in low:
         return AgentCallError("timeout", text)
     return AgentCallError("unknown", text)
 
 
+def stopped_at_limit(response: Any) -> bool:
+    """Whether generation stopped at max_output_tokens rather than on its own."""
+    candidates = getattr(response, "candidates", None) or []
+    return bool(candidates) and candidates[0].finish_reason == types.FinishReason.MAX_TOKENS
+
+
+def trim_to_complete(text: str) -> Optional[str]:
+    """A cut-off answer trimmed back to its last complete sentence or paragraph.
+
+    None when the cut is inside a code block: half an example does not run, so
+    it is worth a continuation. Prose with no sentence end in its second half
+    is returned as it is rather than losing most of it.
+    """
+    if text.count("```") % 2:
+        return None
+    ends = [m.end() for m in _COMPLETE_END_RE.finditer(text + "\n")]
+    if not ends or ends[-1] < len(text) // 2:
+        return text.rstrip()
+    return text[: ends[-1]].rstrip()
+
+
+def tool_facts(tool: Callable[..., Dict[str, Any]], **kwargs: Any) -> str:
+    """Run a tool locally and describe the call and its result as `facts`."""
+    args = ", ".join(f"{k}={v!r}" for k, v in kwargs.items())
+    result = json.dumps(tool(**kwargs), ensure_ascii=False, indent=1)
+    return f"{tool.__name__}({args}) returned:\n{result}"
+
+
 def build_contents(message: str, history: Optional[Sequence[Dict[str, Any]]] = None) -> List[Any]:
     """Build a multi-turn `contents` list so the model can see the conversation.
 
-    `history` is the coordinator's turn log: dicts with a `role` of "user" or
-    "coach" and a `text` body. Anything unusable is skipped rather than raising,
+    `history` is the coordinator's turn log: mappings (dicts or `Turn`s) with a
+    `role` of "user" or "coach" and a `text` body. Anything unusable is skipped rather than raising,
     because a malformed stored turn should never cost the learner a reply.
     """
     contents: List[Any] = []
     for turn in list(history or [])[-HISTORY_TURNS * 2 :]:
-        if not isinstance(turn, dict):
+        if not isinstance(turn, Mapping):
             continue
         text = str(turn.get("text") or "").strip()
         if not text:
@@ -142,6 +205,19 @@ class BaseGenAIAgent:
     name: str = "agent"
     tools: Sequence[Any] = ()
     system_instruction: str = ""
+    # Set by the coordinator: the shared `CallScheduler`, and this agent's
+    # place in its queues (lower goes first) from AGENT_CONFIGS.
+    scheduler: Any = None
+    priority: int = 1
+    # Generation profile; None leaves the model's own default. See configure().
+    max_output_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+    thinking_budget: Optional[int] = None
+    max_tool_calls: int = 4
+    # Per-level answer budgets; a level not listed gets max_output_tokens.
+    output_tokens_by_level: Optional[Dict[str, int]] = None
+    # Follow-up calls allowed for an answer cut off mid-example.
+    max_continuations: int = 1
 
     def __init__(self, client: genai.Client, model_id: Optional[str] = None):
         self.client = client
@@ -150,51 +226,146 @@ class BaseGenAIAgent:
         # Set after a successful call so the coordinator can report which model
         # actually answered when the primary one was out of quota.
         self.last_model_used: Optional[str] = None
+        # Token counts of the last successful call, for cost reporting, and
+        # how many continuation calls it took.
+        self.last_usage: Any = None
+        self.last_continuations = 0
+
+    def configure(self, profile: Mapping[str, Any]) -> None:
+        """Apply an AGENT_CONFIGS profile.
+
+        `model` and `fallback_models` replace the env-wide chain for this agent;
+        `max_output_tokens`, `output_tokens_by_level`, `temperature`,
+        `thinking_budget`, `max_tool_calls`, `max_continuations` and `priority`
+        replace the class defaults. Absent keys change nothing.
+        """
+        if profile.get("model"):
+            self.model_id = profile["model"]
+        fallbacks = profile.get("fallback_models")
+        if fallbacks is not None:
+            self.fallback_models = [m for m in fallbacks if m != self.model_id]
+        elif profile.get("model"):
+            self.fallback_models = resolve_fallback_models(self.model_id)
+        for key in (
+            "max_output_tokens", "output_tokens_by_level", "temperature", "thinking_budget",
+            "max_tool_calls", "max_continuations", "priority",
+        ):
+            if profile.get(key) is not None:
+                setattr(self, key, profile[key])
+
+    def pre_resolve(self, known: Mapping[str, Any]) -> Optional[str]:
+        """Facts from the tool call this turn obviously needs, run locally.
+
+        `known` is what the coordinator already knows about the turn: `topic`
+        (None when nothing names one), `level`, `learning_style` and
+        `difficulty`. Returns None when no call is obvious, and the model
+        picks its tools as usual.
+        """
+        return None
 
-    def _config(self, profile_note: str) -> types.GenerateContentConfig:
+    def output_budget(self, level: Optional[str] = None) -> Optional[int]:
+        """Answer tokens allowed for a learner at `level` (None: no cap)."""
+        by_level = self.output_tokens_by_level or {}
+        return by_level.get(level or "", self.max_output_tokens)
+
+    def _config(
+        self,
+        profile_note: str,
+        use_tools: bool = True,
+        model: Optional[str] = None,
+        level: Optional[str] = None,
+        continuing: bool = False,
+    ) -> types.GenerateContentConfig:
         instruction = self.system_instruction
         if profile_note:
             instruction = f"{instruction}\n\nLearner profile:\n{profile_note}"
-        return types.GenerateContentConfig(
-            tools=list(self.tools),
-            system_instruction=instruction,
+        budget = self.output_budget(level)
+        if continuing:
+            budget = min(budget or CONTINUATION_TOKENS, CONTINUATION_TOKENS)
+        settings: Dict[str, Any] = {
+            "system_instruction": instruction,
+            "temperature": self.temperature,
+            "max_output_tokens": budget,
+        }
+        model = model or self.model_id
+        thinking = self.thinking_budget
+        if continuing:
+            # Finishing a half-written example needs no fresh reasoning. Pro
+            # models cannot turn thinking off, so they get their minimum.
+            thinking = 128 if "-pro" in model else 0
+        if thinking is not None and supports_thinking(model):
+            settings["thinking_config"] = types.ThinkingConfig(thinking_budget=thinking)
+            # Thinking tokens count against max_output_tokens; without this a
+            # long think leaves nothing for the answer.
+            if budget:
+                settings["max_output_tokens"] = budget + thinking
+        if use_tools:
+            settings["tools"] = list(self.tools)
             # Tool results are meant to be narrated to the learner, so let the
             # SDK finish the loop and hand back prose rather than a raw call.
-            automatic_function_calling=types.AutomaticFunctionCallingConfig(
-                maximum_remote_calls=4
-            ),
-        )
+            settings["automatic_function_calling"] = types.AutomaticFunctionCallingConfig(
+                maximum_remote_calls=self.max_tool_calls
+            )
+        # Without tools it is one round trip: the facts are already in the message.
+        return types.GenerateContentConfig(**settings)
 
     def query(
         self,
         message: str,
         history: Optional[Sequence[Dict[str, Any]]] = None,
         profile_note: str = "",
+        priority: Optional[int] = None,
+        facts: Optional[str] = None,
+        models: Optional[Sequence[str]] = None,
+        level: Optional[str] = None,
     ) -> str:
         """Answer one learner turn.
 
         Raises AgentCallError on failure. Returning an error string instead
         would make the caller parse prose to find out what went wrong, which is
         exactly how the original code ended up retrying unretryable errors.
+        `priority` overrides the agent's own queue priority for this call.
+
+        With `facts`, the model gets them appended to the message and no tools,
+        so it answers in a single round trip. `models` replaces the model
+        chain for this call. `level` picks the answer budget from
+        `output_tokens_by_level`.
+
+        An answer that hits the budget is trimmed back to its last complete
+        sentence when that keeps most of it, and continued (up to
+        `max_continuations` more calls) only when it stopped mid-example.
         """
+        if facts:
+            message = f"{message}\n\n{FACTS_HEADER}\n{facts}"
         contents = build_contents(message, history)
-        config = self._config(profile_note)
 
-        models = [self.model_id] + self.fallback_models
+        models = list(models) if models else [self.model_id] + self.fallback_models
         last_error: Optional[AgentCallError] = None
+        priority = self.priority if priority is None else priority
+        deadline = self.scheduler.deadline() if self.scheduler else 0.0
 
         for model in models:
-            try:
-                response = self.client.models.generate_content(
-                    model=model, contents=contents, config=config
-                )
-            except Exception as exc:  # noqa: BLE001 - re-raised as AgentCallError
-                last_error = classify_error(exc)
-                if not last_error.try_other_model:
-                    raise last_error
-                continue
-
-            text = (response.text or "").strip()
+            # Raises queue_timeout when the model's queue is too long to wait out.
+            slot = self.scheduler.slot(model, priority, deadline) if self.scheduler else nullcontext()
+            with slot:
+                try:
+                    response = self.client.models.generate_content(
+                        model=model,
+                        contents=contents,
+                        config=self._config(profile_note, use_tools=not facts, model=model, level=level),
+                    )
+                except Exception as exc:  # noqa: BLE001 - re-raised as AgentCallError
+                    last_error = classify_error(exc)
+                    if not last_error.try_other_model:
+                        raise last_error
+                    continue
+                text, continuations = response.text or "", 0
+                if text.strip() and stopped_at_limit(response):
+                    text, continuations, response = self._complete(
+                        model, contents, text, response, profile_note, level
+                    )
+
+            text = text.strip()
             if not text:
                 # A tool call with no narration leaves the learner with a blank
                 # bubble, which reads as a crash. Treat it as a failed attempt.
@@ -202,6 +373,45 @@ class BaseGenAIAgent:
                 continue
 
             self.last_model_used = model
+            self.last_usage = getattr(response, "usage_metadata", None)
+            self.last_continuations = continuations
             return text
 
         raise last_error or AgentCallError("unknown", "No model produced a response")
+
+    def _complete(
+        self,
+        model: str,
+        contents: List[Any],
+        text: str,
+        response: Any,
+        profile_note: str,
+        level: Optional[str],
+    ) -> Tuple[str, int, Any]:
+        """Finish an answer cut off by the budget: (text, continuations, last response)."""
+        continuations = 0
+        while True:
+            trimmed = trim_to_complete(text)
+            if trimmed is not None:
+                return trimmed, continuations, response
+            if continuations >= self.max_continuations:
+                return text, continuations, response
+            attempt = contents + [
+                types.Content(role="model", parts=[types.Part(text=text)]),
+                types.Content(role="user", parts=[types.Part(text=CONTINUE_PROMPT)]),
+            ]
+            try:
+                response = self.client.models.generate_content(
+                    model=model,
+                    contents=attempt,
+                    config=self._config(
+                        profile_note, use_tools=False, model=model, level=level, continuing=True
+                    ),
+                )
+            except Exception as exc:  # noqa: BLE001 - a partial answer beats none
+                logger.info("Continuing a cut-off %s answer failed: %s", self.name, exc)
+                return text, continuations, response
+            continuations += 1
+            text += response.text or ""
+            if not stopped_at_limit(response):
+                return text, continuations, response
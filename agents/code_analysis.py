@@ -0,0 +1,266 @@
+# agents/code_analysis.py
+"""What a learner's code sample shows about their level, read from its syntax.
+
+`assess_with_code_sample` used to lowercase the paste and count substrings:
+`"@"` in an email address counted as a decorator, `"for "` inside a comment
+as a loop, and every indicator was a fresh scan of the whole text. Here the
+code is parsed once and walked once. Strings and comments are never mistaken
+for syntax, and cyclomatic complexity comes from the same walk.
+
+Code that does not parse (a fragment, a typo, prose around the code) falls
+back to Python's tokenizer, which still tells names from strings and
+comments. It counts keywords rather than structure, and never raises.
+
+Results are cached per code text: the same paste is often analysed more than
+once per request (by the assessment tool and again by the local fallback).
+"""
+
+from __future__ import annotations
+
+import ast
+import io
+import keyword
+import re
+import tokenize
+from functools import lru_cache
+from typing import Any, Dict, NamedTuple, Optional
+
+# Feature groups behind each level, in the order they are reported.
+ADVANCED_FEATURES = ("decorators", "generators", "async_code", "dunder_methods", "lambdas", "metaclasses")
+INTERMEDIATE_FEATURES = (
+    "functions", "classes", "imports", "returns", "loops", "comprehensions", "exception_handling",
+)
+BEGINNER_FEATURES = ("assignments", "conditionals", "calls")
+
+# Nodes that add a path through a function (McCabe).
+_BRANCHES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.IfExp, ast.ExceptHandler, ast.Assert, ast.comprehension)
+_COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+# A line only code starts: a block header ending in ':' or an import. Used to
+# tell unparseable code from prose that happens to contain "for" and "if".
+_CODE_LINE_RE = re.compile(
+    r"^\s*(?:(?:def|class|for|while|if|elif|else|try|except|finally|with|async)\b.*:\s*(?:#.*)?"
+    r"|(?:import|from)\s+[\w.]+.*)$",
+    re.MULTILINE,
+)
+
+
+class CodeFeatures(NamedTuple):
+    """Counts of each feature, the level they point to, and how it was read."""
+
+    counts: Dict[str, int]
+    complexity: int
+    lines: int
+    parsed: bool
+    syntax_error: Optional[str]
+    is_code: bool
+
+    @property
+    def level(self) -> str:
+        advanced = sum(1 for f in ADVANCED_FEATURES if self.counts.get(f))
+        intermediate = sum(1 for f in INTERMEDIATE_FEATURES if self.counts.get(f))
+        if advanced >= 2:
+            return "advanced"
+        if intermediate >= 3:
+            return "intermediate"
+        return "beginner"
+
+    def present(self, group=ADVANCED_FEATURES + INTERMEDIATE_FEATURES + BEGINNER_FEATURES):
+        """Names of the features in `group` the code uses."""
+        return [f for f in group if self.counts.get(f)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "features": {f: n for f, n in self.counts.items() if n},
+            "cyclomatic_complexity": self.complexity,
+            "lines": self.lines,
+            "parsed": self.parsed,
+            "syntax_error": self.syntax_error,
+        }
+
+
+class _Walker(ast.NodeVisitor):
+    """One pass over the tree: feature counts plus per-function complexity."""
+
+    def __init__(self):
+        self.counts: Dict[str, int] = dict.fromkeys(
+            ADVANCED_FEATURES + INTERMEDIATE_FEATURES + BEGINNER_FEATURES, 0
+        )
+        self.complexity = [1]  # module level, then one entry per open function
+        self.max_complexity = 1
+        self.statements = 0
+
+    def generic_visit(self, node: ast.AST) -> None:
+        c = self.counts
+        if isinstance(node, ast.stmt) and not (
+            isinstance(node, ast.Expr) and isinstance(node.value, (ast.Name, ast.Constant, ast.Attribute))
+        ):
+            self.statements += 1
+        if isinstance(node, _BRANCHES):
+            self.complexity[-1] += 1
+        elif isinstance(node, ast.BoolOp):
+            self.complexity[-1] += len(node.values) - 1
+        elif isinstance(node, ast.match_case):
+            self.complexity[-1] += 1
+
+        if isinstance(node, (ast.For, ast.AsyncFor, ast.While)):
+            c["loops"] += 1
+        elif isinstance(node, _COMPREHENSIONS):
+            c["comprehensions"] += 1
+            if isinstance(node, ast.GeneratorExp):
+                c["generators"] += 1
+        elif isinstance(node, (ast.Yield, ast.YieldFrom)):
+            c["generators"] += 1
+        elif isinstance(node, (ast.Await, ast.AsyncWith)):
+            c["async_code"] += 1
+        elif isinstance(node, ast.Lambda):
+            c["lambdas"] += 1
+        elif isinstance(node, (ast.Try, getattr(ast, "TryStar", ast.Try))):
+            c["exception_handling"] += 1
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            c["imports"] += 1
+        elif isinstance(node, ast.Return):
+            c["returns"] += 1
+        elif isinstance(node, (ast.Assign, ast.AugAssign, ast.AnnAssign)):
+            c["assignments"] += 1
+        elif isinstance(node, ast.If):
+            c["conditionals"] += 1
+        elif isinstance(node, ast.Call):
+            c["calls"] += 1
+        elif isinstance(node, ast.ClassDef):
+            c["classes"] += 1
+            c["decorators"] += len(node.decorator_list)
+            if any(k.arg == "metaclass" for k in node.keywords):
+                c["metaclasses"] += 1
+        super().generic_visit(node)
+
+    def _visit_function(self, node: ast.AST) -> None:
+        c = self.counts
+        c["functions"] += 1
+        self.statements += 1
+        c["decorators"] += len(node.decorator_list)
+        if isinstance(node, ast.AsyncFunctionDef):
+            c["async_code"] += 1
+        if node.name.startswith("__") and node.name.endswith("__"):
+            c["dunder_methods"] += 1
+        self.complexity.append(1)
+        self.generic_visit(node)
+        self.max_complexity = max(self.max_complexity, self.complexity.pop())
+
+    visit_FunctionDef = _visit_function
+    visit_AsyncFunctionDef = _visit_function
+
+
+# Keyword stand-ins for each feature when the code does not parse.
+_TOKEN_FEATURES = {
+    "def": "functions", "class": "classes", "import": "imports", "return": "returns",
+    "for": "loops", "while": "loops", "yield": "generators", "async": "async_code",
+    "await": "async_code", "lambda": "lambdas", "try": "exception_handling", "if": "conditionals",
+}
+
+
+def _from_tokens(code: str) -> Dict[str, int]:
+    counts = dict.fromkeys(ADVANCED_FEATURES + INTERMEDIATE_FEATURES + BEGINNER_FEATURES, 0)
+    line_start = True
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(code).readline):
+            if tok.type == tokenize.NAME and keyword.iskeyword(tok.string) and tok.string in _TOKEN_FEATURES:
+                counts[_TOKEN_FEATURES[tok.string]] += 1
+            elif tok.type == tokenize.NAME and tok.string.startswith("__") and tok.string.endswith("__"):
+                counts["dunder_methods"] += 1
+            elif tok.type == tokenize.OP and tok.string == "@" and line_start:
+                counts["decorators"] += 1
+            elif tok.type == tokenize.OP and tok.string in ("=", "+=", "-="):
+                counts["assignments"] += 1
+            line_start = tok.type in (tokenize.NEWLINE, tokenize.NL, tokenize.INDENT, tokenize.DEDENT)
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        pass  # keep whatever was read before the bad token
+    return counts
+
+
+@lru_cache(maxsize=512)
+def analyze_code(code: str) -> CodeFeatures:
+    """Features of `code`; never raises. Cached, so treat the result as read-only."""
+    lines = code.count("\n") + 1 if code else 0
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError) as exc:
+        counts = _from_tokens(code)
+        line = getattr(exc, "lineno", None)
+        error = f"{getattr(exc, 'msg', exc)}" + (f" (line {line})" if line else "")
+        return CodeFeatures(counts, 1, lines, False, error, bool(_CODE_LINE_RE.search(code)))
+
+    walker = _Walker()
+    walker.visit(tree)
+    complexity = max(walker.max_complexity, walker.complexity[0])
+    return CodeFeatures(walker.counts, complexity, lines, True, None, walker.statements > 0)
+
+
+class CodeBlock(NamedTuple):
+    """Code found in a chat message, the words around it, and its analysis."""
+
+    code: str
+    prose: str
+    fenced: bool
+    features: CodeFeatures
+
+
+# A line that reads as a statement rather than a sentence: indented, a block
+# header or import, an assignment, a bare call, or a simple statement keyword.
+_STATEMENT_LINE_RE = re.compile(
+    r"^(?:[ \t]+\S"
+    r"|(?:def|class|for|while|if|elif|else|try|except|finally|with|async)\b.*:\s*(?:#.*)?$"
+    r"|(?:import|from)\s+[\w.]+"
+    r"|[\w.\[\]'\"]+(?:\s*,\s*[\w.]+)*\s*(?:[-+*/%]|//|\*\*)?=(?!=)\s*\S"
+    r"|[\w.]+\(.*\)\s*(?:#.*)?$"
+    r"|(?:return|print|pass|break|continue|raise|yield|assert|del|global)\b"
+    r"|@[\w.]+"
+    r"|#)"
+)
+
+
+@lru_cache(maxsize=256)
+def find_code(message: str) -> Optional[CodeBlock]:
+    """The code in a chat message, or None if it has none.
+
+    Fenced blocks (```) are taken as code outright. Without fences, the
+    longest run of lines that read as statements is a candidate when it has
+    at least two lines, and it counts only if `analyze_code` agrees it is
+    code. One pass over the lines; cached, so the router and the agent that
+    answers share both this and the analysis.
+    """
+    fenced: list = []
+    prose: list = []
+    run: list = []  # indices into prose
+    best: list = []
+    in_fence = False
+    for line in (message or "").splitlines():
+        if line.lstrip().startswith("```"):
+            in_fence = not in_fence
+            continue
+        if in_fence:
+            fenced.append(line)
+            continue
+        prose.append(line)
+        if line.strip() and _STATEMENT_LINE_RE.match(line):
+            run.append(len(prose) - 1)
+        elif line.strip():
+            if len(run) > len(best):
+                best = run
+            run = []
+    if len(run) > len(best):
+        best = run
+
+    if fenced:
+        code = "\n".join(fenced).strip("\n")
+        return CodeBlock(code, "\n".join(prose).strip(), True, analyze_code(code)) if code.strip() else None
+    if len(best) < 2:
+        return None
+    code = "\n".join(prose[i] for i in best)
+    features = analyze_code(code)
+    if not features.is_code:
+        return None
+    # By position: equal lines elsewhere in the prose ("}", "") are still prose.
+    taken = set(best)
+    words = "\n".join(line for i, line in enumerate(prose) if i not in taken).strip()
+    return CodeBlock(code, words, False, features)
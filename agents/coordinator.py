@@ -5,24 +5,35 @@ from dotenv import load_dotenv
 load_dotenv()  # ensures .env is loaded even if main.py didn't
 
 import asyncio
+import functools
+import itertools
 import logging
 import os
 import re
 import time
-from typing import Any, Dict, List, Optional
-
-from google import genai
+from typing import Any, Dict, Iterable, List, Optional
 
 # Optional persistent storage
 from storage import FirestoreStore
+from config.settings import AGENT_CONFIGS
 
+from .answer_bank import AnswerBank
 from .base_agent import AgentCallError, resolve_fallback_models, resolve_model_id
+from .code_analysis import analyze_code, find_code
+from .genai_clients import client_for, pool_stats
+from .grader import GradingUnavailable, create_grader
+from .live_updates import ContextFeed
+from .learner_context import LearnerContext, Turn
+from .prefetch import create_prefetcher
+from .response_cache import cacheable_question, create_response_cache
+from .retrieval import build_lesson_index
+from .scheduler import BACKGROUND_PRIORITY, CallScheduler
 
 # Import factory functions
 from .assessment_agent import create_assessment_agent
 from .curriculum_agent import create_curriculum_agent
 from .teaching_agent import create_teaching_agent
-from .practice_agent import create_practice_agent
+from .practice_agent import create_practice_agent, exercise_checks
 from .progress_agent import create_progress_agent
 
 logger = logging.getLogger(__name__)
@@ -39,6 +50,41 @@ MAX_RETRY_WAIT_S = 5.0
 BREAKER_THRESHOLD = 2
 BREAKER_COOLDOWN_S = 120.0
 
+# Gemini calls in flight per model per process, and how long a call may queue
+# for a slot before the learner gets local content instead. Both bound the
+# time a request can spend here well under gunicorn's 120 s worker timeout.
+MODEL_CONCURRENCY = int(os.getenv("MODEL_CONCURRENCY", 4))
+QUEUE_TIMEOUT_S = float(os.getenv("QUEUE_TIMEOUT_S", 10))
+
+# Recent Gemini answers kept for reuse while the API is unavailable. Only the
+# teaching agent's answers are generic enough to hand to another learner.
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 1000))
+CACHED_AGENTS = ("teaching",)
+
+# Model answers generated off-peak by tools/build_answer_bank.py.
+ANSWER_BANK_PATH = os.getenv("ANSWER_BANK_PATH", "data/answer_bank.json")
+
+# Speculative practice exercises generated in the background after a lesson or
+# exercise, so the learner's next practice request is answered at once. Each
+# one is a real model call that may go unused, hence a hard hourly cap; 0 (the
+# default) disables prefetching. A prepared exercise older than the TTL is
+# dropped rather than served.
+PREFETCH_CALLS_PER_HOUR = int(os.getenv("PREFETCH_CALLS_PER_HOUR", 0))
+PREFETCH_TTL_S = 6 * 3600
+PREFETCH_AFTER = ("teaching", "practice")
+
+# Sandbox interpreters kept started for grading submitted code (see
+# agents/grader.py); 0 turns grading off.
+GRADER_WORKERS = int(os.getenv("GRADER_WORKERS", 2))
+# How much of a graded submission's printed output the chat reply shows.
+GRADED_OUTPUT_CHARS = 400
+
+# Wording every degraded-mode notice uses for where the answer came from.
+_LIBRARY_SOURCE = "the built-in lesson library"
+
+# The label practice answers carry, per the practice prompt and local fallback.
+_EXERCISE_LABEL_RE = re.compile(r"Exercise:\s*\**\s*([a-z_]+)\s*\((easy|medium|hard)\)", re.IGNORECASE)
+
 _SKILL_LINE_RE = re.compile(
     r"skill\s*level\s*[:\-]\s*\**\s*(beginner|intermediate|advanced|unknown)",
     re.IGNORECASE,
@@ -94,7 +140,11 @@ class LearningCoachCoordinator:
     def __init__(self):
         self.client = None
         self.agents: Dict[str, Any] = {}
-        self.user_contexts: Dict[str, Dict[str, Any]] = {}
+        self.user_contexts: Dict[str, LearnerContext] = {}
+        # Bumped on every save, from one counter so a reset context never
+        # reuses an old number. /context/<user_id> uses it as its ETag.
+        self._context_versions: Dict[str, int] = {}
+        self._version_counter = itertools.count(1)
         self.store = None
         self.mode = "uninitialized"
         self.model_id = resolve_model_id()
@@ -103,9 +153,23 @@ class LearningCoachCoordinator:
         # Health/diagnostics. The original code hid API failures entirely, so
         # there was no way to tell a quota problem from a bad key.
         self.last_error: Optional[Dict[str, Any]] = None
+        self.status_changes = 0  # failures and recoveries; see status_version()
         self._consecutive_hard_failures = 0
         self._breaker_open_until = 0.0
 
+        # Search over the lesson library, so degraded-mode answers match the
+        # question rather than just the first topic keyword in it.
+        self.lesson_index = build_lesson_index()
+        # None when disabled or numpy is missing; then fallbacks use the library.
+        self.response_cache = create_response_cache(RESPONSE_CACHE_SIZE)
+        self.answer_bank = AnswerBank.load(ANSWER_BANK_PATH)
+        self.prefetcher = create_prefetcher(PREFETCH_CALLS_PER_HOUR)
+        self.scheduler = CallScheduler(MODEL_CONCURRENCY, QUEUE_TIMEOUT_S)
+        # No interpreters start until grader.start() (main.py) or a first grade.
+        self.grader = create_grader(GRADER_WORKERS)
+        # Open /events streams, sent each learner's changes as they are saved.
+        self.feed = ContextFeed()
+
         if os.getenv("FIRESTORE_ENABLED", "").lower() in ("1", "true", "yes"):
             try:
                 self.store = FirestoreStore()
@@ -117,18 +181,8 @@ class LearningCoachCoordinator:
         return ["assessment", "curriculum", "teaching", "practice", "progress"]
 
     @staticmethod
-    def _fresh_context() -> Dict[str, Any]:
-        return {
-            "skill_level": "unknown",
-            "learning_style": "adaptive",
-            "history": [],
-            "progress": {
-                "topics_learned": [],
-                "exercises_delivered": 0,
-                "exercises_completed": 0,
-                "interactions": 0,
-            },
-        }
+    def _fresh_context() -> LearnerContext:
+        return LearnerContext()
 
     # ==========================================
     # 1. INITIALIZE ALL AGENTS
@@ -151,10 +205,10 @@ class LearningCoachCoordinator:
                     "GOOGLE_CLOUD_PROJECT and GOOGLE_CLOUD_LOCATION must be set for Vertex AI."
                 )
             self.mode = "vertex_ai"
-            self.client = genai.Client(vertexai=True, project=project, location=location)
+            self.client = client_for(vertexai=True, project=project, location=location)
         elif api_key:
             self.mode = "gemini_api_key"
-            self.client = genai.Client(api_key=api_key)
+            self.client = client_for(api_key=api_key)
         else:
             self.mode = "local"
             logger.info("No Gemini credentials found; starting in local deterministic mode.")
@@ -167,6 +221,9 @@ class LearningCoachCoordinator:
                 "practice": create_practice_agent(self.client),
                 "progress": create_progress_agent(self.client),
             }
+            for name, agent in self.agents.items():
+                agent.scheduler = self.scheduler
+                agent.configure(AGENT_CONFIGS.get(name, {}))
         else:
             # Local mode still needs the five keys so routing and /health work.
             self.agents = {name: None for name in self._agent_names()}
@@ -177,7 +234,7 @@ class LearningCoachCoordinator:
     # ==========================================
     # 2. USER CONTEXT MANAGEMENT
     # ==========================================
-    def get_user_context(self, user_id: str) -> Dict[str, Any]:
+    def get_user_context(self, user_id: str) -> LearnerContext:
         """Retrieve or create a user's learning context."""
         if user_id not in self.user_contexts:
             stored = None
@@ -187,40 +244,95 @@ class LearningCoachCoordinator:
                 except Exception as e:
                     logger.warning("Firestore read failed: %s", e)
 
-            self.user_contexts[user_id] = self._normalize_context(stored) if stored else self._fresh_context()
+            # Two threads can miss together; the first to finish wins, so
+            # both callers hold the same context.
+            return self.user_contexts.setdefault(
+                user_id, self._normalize_context(stored) if stored else self._fresh_context()
+            )
         return self.user_contexts[user_id]
 
-    def _normalize_context(self, stored: Dict[str, Any]) -> Dict[str, Any]:
+    async def load_user_context(self, user_id: str) -> LearnerContext:
+        """get_user_context for code on an event loop; a store read runs on the executor."""
+        if user_id in self.user_contexts or not self.store:
+            return self.get_user_context(user_id)
+        return await asyncio.get_running_loop().run_in_executor(None, self.get_user_context, user_id)
+
+    async def _off_loop(self, fn, *args, **kwargs):
+        """Call `fn`, which may write to the store, without holding up the event loop.
+
+        Under the ASGI server every turn shares one loop, and a Firestore
+        write blocks for its round trip. The turn awaits the write, so
+        nothing else touches its context meanwhile.
+        """
+        if not self.store:
+            return fn(*args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args, **kwargs))
+
+    def prefetch_contexts(self, user_ids: Iterable[str]) -> int:
+        """Load several learners' contexts with one store read.
+
+        get_user_context() costs a Firestore round trip per cache miss, which a
+        batch of N learners would pay N times on the request path. Returns how
+        many contexts were loaded. On a failed read nothing is cached, so each
+        learner still gets the normal per-user read later rather than a blank
+        context shadowing their stored one.
+        """
+        missing = [uid for uid in dict.fromkeys(user_ids) if uid not in self.user_contexts]
+        if not missing or not self.store:
+            return 0
+        try:
+            stored = self.store.get_user_contexts(missing)
+        except Exception as e:
+            logger.warning("Firestore batch read failed: %s", e)
+            return 0
+
+        for uid in missing:
+            self._cache_stored_context(uid, stored.get(uid))
+        return len(missing)
+
+    def warm_up_contexts(self, limit: int) -> int:
+        """Preload the most recently active learners after a deploy.
+
+        Without this, the first request from every active learner on a new
+        instance pays a Firestore round trip. Runs off the request path, so a
+        learner who arrives first keeps the context their request loaded.
+        """
+        if not self.store or limit <= 0:
+            return 0
+        try:
+            stored = self.store.get_recent_user_contexts(limit)
+        except Exception as e:
+            logger.warning("Context warm-up failed: %s", e)
+            return 0
+
+        loaded = sum(1 for uid, data in stored.items() if self._cache_stored_context(uid, data))
+        logger.info("Warmed up %d of %d recent learner contexts", loaded, len(stored))
+        return loaded
+
+    def _cache_stored_context(self, user_id: str, stored: Optional[Dict[str, Any]]) -> bool:
+        """Cache a context read in bulk, unless one is already in memory."""
+        if user_id in self.user_contexts:
+            return False
+        context = self._normalize_context(stored) if stored else self._fresh_context()
+        return self.user_contexts.setdefault(user_id, context) is context
+
+    def _normalize_context(self, stored: Dict[str, Any]) -> LearnerContext:
         """Fill in keys added after a context was first persisted.
 
         Firestore documents written by older versions lack the newer progress
         counters and store history as {agent, message}. Reading one of those
-        must not crash or lose the transcript.
+        must not crash or lose the transcript; LearnerContext.from_dict handles
+        both.
+
+        The result is marked as saved: it came from the store, so the next save
+        only needs to send what this process changes.
         """
-        context = self._fresh_context()
-        context.update(stored or {})
-
-        progress = context.get("progress")
-        if not isinstance(progress, dict):
-            progress = {}
-        fresh_progress = self._fresh_context()["progress"]
-        fresh_progress.update(progress)
-        context["progress"] = fresh_progress
-
-        history = context.get("history")
-        if not isinstance(history, list):
-            history = []
-        migrated: List[Dict[str, Any]] = []
-        for turn in history:
-            if not isinstance(turn, dict):
-                continue
-            if "text" in turn:
-                migrated.append(turn)
-            elif "message" in turn:  # legacy shape: user turns only
-                migrated.append(
-                    {"role": "user", "text": str(turn.get("message", "")), "agent": turn.get("agent")}
-                )
-        context["history"] = migrated[-MAX_HISTORY_TURNS:]
+        context = LearnerContext.from_dict(stored or {})
+        del context.history[:-MAX_HISTORY_TURNS]
+        stored_history = (stored or {}).get("history")
+        context.mark_saved(
+            stored_history_len=len(stored_history) if isinstance(stored_history, list) else 0
+        )
         return context
 
     def update_context(self, user_id: str, updates: Dict[str, Any]):
@@ -238,7 +350,14 @@ class LearningCoachCoordinator:
 
     def get_public_context(self, user_id: str) -> Dict[str, Any]:
         """UI-safe learner state, without full response bodies."""
-        context = self.get_user_context(user_id)
+        return self._public_view(self.get_user_context(user_id))
+
+    def context_version(self, user_id: str) -> int:
+        """Changes whenever the learner's context is saved; 0 before the first save."""
+        return self._context_versions.get(user_id, 0)
+
+    @staticmethod
+    def _public_view(context: Dict[str, Any]) -> Dict[str, Any]:
         progress = context.get("progress", {})
         return {
             "skill_level": context.get("skill_level", "unknown"),
@@ -257,11 +376,41 @@ class LearningCoachCoordinator:
         }
 
     def _save_context(self, user_id: str, context: Dict[str, Any]) -> None:
-        if self.store:
-            try:
-                self.store.save_user_context(user_id, context)
-            except Exception as e:
-                logger.warning("Firestore write failed: %s", e)
+        """Persist what changed since the last save.
+
+        A turn usually changes a counter or two and appends two history turns,
+        so that is all that gets written. Contexts the store has not seen yet
+        get a full write, and so does any delta the store refuses (the document
+        was deleted underneath us, for example).
+        """
+        self._context_versions[user_id] = next(self._version_counter)
+        if self.feed.watching(user_id):
+            self.feed.publish(user_id, self._public_view(context))
+        if not self.store:
+            return
+        tracked = isinstance(context, LearnerContext)
+        delta = context.delta(MAX_HISTORY_TURNS) if tracked else None
+        if delta is not None and delta.empty:
+            return
+        try:
+            if delta is not None:
+                try:
+                    self.store.update_user_context(
+                        user_id, delta.updates, delta.deletes, delta.appends
+                    )
+                except Exception as e:
+                    logger.info("Delta write failed, writing full context: %s", e)
+                    delta = None
+            if delta is None:
+                self.store.save_user_context(
+                    user_id, context.to_dict() if tracked else context
+                )
+        except Exception as e:
+            # Snapshot left as it was, so the next save retries these changes.
+            logger.warning("Firestore write failed: %s", e)
+            return
+        if tracked:
+            context.mark_saved(delta)
 
     # ==========================================
     # 3. CONTEXT DERIVATION HELPERS
@@ -391,14 +540,16 @@ class LearningCoachCoordinator:
                 if topic not in topics:
                     topics.append(topic)
 
-        if agent_name == "practice" and response_text:
+        # A graded reply answers the open exercise rather than setting a new
+        # one, and `_grade` has already decided whether it was completed.
+        if agent_name == "practice" and response_text and source != "graded":
             context["last_exercise"] = response_text[:1200]
             progress["exercises_delivered"] = int(progress.get("exercises_delivered", 0)) + 1
 
         # An exercise counts as completed when the learner says they finished
         # it, not when the coach hands one out.
         low = (message or "").lower()
-        if context.get("last_exercise") and any(sig in low for sig in _COMPLETION_SIGNALS):
+        if source != "graded" and context.get("last_exercise") and any(sig in low for sig in _COMPLETION_SIGNALS):
             progress["exercises_completed"] = int(progress.get("exercises_completed", 0)) + 1
             context.pop("last_exercise", None)
 
@@ -410,7 +561,9 @@ class LearningCoachCoordinator:
         context: Dict[str, Any], role: str, text: str, agent_name: Optional[str] = None
     ) -> None:
         history = context.setdefault("history", [])
-        history.append({"role": role, "text": (text or "")[:4000], "agent": agent_name})
+        # "at" keeps turns distinct, which delta saves rely on: Firestore's
+        # ArrayUnion would silently drop a second identical "hi".
+        history.append(Turn(role, (text or "")[:4000], agent_name, round(time.time(), 3)))
         if len(history) > MAX_HISTORY_TURNS:
             del history[:-MAX_HISTORY_TURNS]
 
@@ -439,23 +592,56 @@ class LearningCoachCoordinator:
                     self._consecutive_hard_failures,
                     err.kind,
                 )
-        else:
+        elif err.kind != "queue_timeout":
+            # A full local queue says nothing about whether the quota is back.
             self._consecutive_hard_failures = 0
+        self.status_changes += 1
+        self.feed.publish_status(self.status_view())
 
     def _note_success(self) -> None:
+        was_degraded = self.last_error is not None or self._breaker_open_until
         self.last_error = None
         self._consecutive_hard_failures = 0
         self._breaker_open_until = 0.0
+        if was_degraded:
+            self.status_changes += 1
+            self.feed.publish_status(self.status_view())
+
+    def status_version(self) -> str:
+        """Changes whenever `status_view()` (and /status) can.
+
+        The breaker reopens the API by the clock, without a call to count.
+        """
+        return f"{self.status_changes}.{self.mode}.{int(self._breaker_open())}"
+
+    def status_view(self) -> Dict[str, Any]:
+        """What the UI badges and degraded banner show, pushed on /events."""
+        return {
+            "mode": self.mode,
+            "model": self.model_id,
+            "degraded": self._degraded(),
+            "degraded_reason": (self.last_error or {}).get("kind"),
+        }
+
+    def _degraded(self) -> bool:
+        return self.mode != "local" and (self._breaker_open() or self.last_error is not None)
 
     def health_snapshot(self) -> Dict[str, Any]:
         """Diagnostics for /health and /status."""
-        degraded = self.mode != "local" and (self._breaker_open() or self.last_error is not None)
+        degraded = self._degraded()
         return {
             "mode": self.mode,
             "model": self.model_id,
             "fallback_models": self.fallback_models,
             "agents_count": len(self.agents),
             "active_users": len(self.user_contexts),
+            "cached_answers": len(self.response_cache) if self.response_cache else 0,
+            "banked_answers": len(self.answer_bank),
+            "prefetch_calls_left": self.prefetcher.calls_left() if self.prefetcher else 0,
+            "call_queue": self.scheduler.snapshot(),
+            "grader": self.grader.snapshot() if self.grader else None,
+            "live_updates": self.feed.snapshot(),
+            "http_pool": pool_stats(),
             "degraded": degraded,
             "api_paused": self._breaker_open(),
             "last_error": self.last_error,
@@ -486,23 +672,50 @@ class LearningCoachCoordinator:
             return f"Unknown agent: {agent_name}"
 
         agent = self.agents[agent_name]
-        context = self.get_user_context(user_id)
+        context = await self.load_user_context(user_id)
+        self._collect_prefetched(user_id, context)
 
         self._append_history(context, "user", message, agent_name)
-        self._save_context(user_id, context)
+        await self._off_loop(self._save_context, user_id, context)
+
+        # Code pasted as the answer to the open exercise: the grader's verdict
+        # is the reply. Sending a large paste to the model would only
+        # approximate what running it tells us.
+        if agent_name == "practice":
+            graded = await self._answer_submission(message, user_id, context)
+            if graded is not None:
+                return graded
+
+        # A model-written exercise prepared in the background after the last
+        # turn is served even while the API is paused; it is already paid for.
+        ready = self._take_prefetched_exercise(agent_name, message, context)
+        if ready is not None:
+            await self._off_loop(
+                self._record_response_context,
+                user_id, context, agent_name, message, ready["text"], "prefetched",
+                model=ready.get("model"),
+            )
+            self._schedule_prefetch(user_id, context)
+            return ready["text"]
 
         if self.mode == "local" or agent is None:
             response_text = self._local_fallback(agent_name, message, user_id, context)
-            self._record_response_context(
+            await self._off_loop(
+                self._record_response_context,
                 user_id, context, agent_name, message, response_text, "local"
             )
             return response_text
 
+        answer_mode = AGENT_CONFIGS.get(agent_name, {}).get("answer_mode", "model")
+        if answer_mode in ("local", "hybrid"):
+            return await self._answer_from_local_content(agent, agent_name, message, user_id, context, answer_mode)
+
         if self._breaker_open():
             response_text = self._local_fallback(
                 agent_name, message, user_id, context, notice=self._degraded_notice()
             )
-            self._record_response_context(
+            await self._off_loop(
+                self._record_response_context,
                 user_id, context, agent_name, message, response_text, "fallback"
             )
             return response_text
@@ -510,6 +723,8 @@ class LearningCoachCoordinator:
         msg = self._rewrite_message(agent_name, message, context)
         history = self._history_for_model(context)
         profile_note = self._profile_note(context)
+        facts = self._pre_resolve(agent, agent_name, msg, context) if answer_mode == "resolved" else None
+        level = self._answer_level(context)
 
         last_err: Optional[AgentCallError] = None
         loop = asyncio.get_running_loop()
@@ -519,7 +734,10 @@ class LearningCoachCoordinator:
         for attempt in range(2):
             try:
                 response_text = await loop.run_in_executor(
-                    None, lambda: agent.query(msg, history=history, profile_note=profile_note)
+                    None,
+                    lambda: agent.query(
+                        msg, history=history, profile_note=profile_note, facts=facts, level=level
+                    ),
                 )
             except AgentCallError as err:
                 last_err = err
@@ -545,10 +763,17 @@ class LearningCoachCoordinator:
                 break
 
             self._note_success()
-            self._record_response_context(
+            # Only an answer to the learner's own words is reusable; a rewritten
+            # follow-up carries their topic or exercise into the question.
+            if msg == message:
+                self._remember_answer(agent_name, message, context, response_text)
+            await self._off_loop(
+                self._record_response_context,
                 user_id, context, agent_name, message, response_text, "gemini",
                 model=getattr(agent, "last_model_used", None),
             )
+            if agent_name in PREFETCH_AFTER:
+                self._schedule_prefetch(user_id, context)
             return response_text
 
         if last_err is not None:
@@ -556,11 +781,274 @@ class LearningCoachCoordinator:
         response_text = self._local_fallback(
             agent_name, message, user_id, context, notice=self._degraded_notice(last_err)
         )
-        self._record_response_context(
+        await self._off_loop(
+            self._record_response_context,
             user_id, context, agent_name, message, response_text, "fallback"
         )
         return response_text
 
+    def current_exercise(self, context: Dict[str, Any]) -> Optional[tuple]:
+        """(topic, difficulty) of the exercise the learner was last given, if any."""
+        exercise = context.get("last_exercise")
+        if not exercise:
+            return None
+        match = _EXERCISE_LABEL_RE.search(exercise)
+        if match:
+            return match.group(1).lower(), match.group(2).lower()
+        if context.get("last_topic"):
+            level = self._answer_level(context)
+            return context["last_topic"], self._pick_difficulty(level, context.get("progress", {}))
+        return None
+
+    def grade_submission(
+        self,
+        user_id: str,
+        code: str,
+        topic: Optional[str] = None,
+        difficulty: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Run the learner's code against an exercise's checks.
+
+        Grades the exercise named by `topic` and `difficulty`, or else the one
+        the learner was last given; None when there is neither. A pass counts
+        the exercise as completed. Unlike the completion phrases, this does
+        not depend on the learner saying so. The caller checks `self.grader`;
+        GradingUnavailable passes through when the sandbox cannot run here.
+        """
+        context = self.get_user_context(user_id)
+        key = (topic.lower(), (difficulty or "easy").lower()) if topic else self.current_exercise(context)
+        if key is None:
+            return None
+        result = self._grade(context, code, key)
+
+        passed = sum(c["passed"] for c in result["checks"])
+        summary = f"Graded {key[0]} ({key[1]}): {passed} of {len(result['checks'])} checks passed."
+        if result["error"]:
+            summary += f" Error: {result['error']}"
+        self._append_history(context, "user", code, "practice")
+        self._append_history(context, "coach", summary, "practice")
+        self._save_context(user_id, context)
+        return result
+
+    def _grade(self, context: Dict[str, Any], code: str, key: tuple) -> Dict[str, Any]:
+        """Grade `code` against exercise `key`; a pass completes the open exercise."""
+        result = self.grader.grade(code, exercise_checks(*key))
+        result["exercise"] = {"topic": key[0], "difficulty": key[1]}
+        if result["passed"] and context.get("last_exercise"):
+            progress = context.setdefault("progress", {})
+            progress["exercises_completed"] = int(progress.get("exercises_completed", 0)) + 1
+            context.pop("last_exercise", None)
+        return result
+
+    @staticmethod
+    def _graded_reply(result: Dict[str, Any]) -> str:
+        """The chat answer to a submission the grader has already judged."""
+        exercise = result["exercise"]
+        checks = result["checks"]
+        passed = sum(c["passed"] for c in checks)
+        lines = [
+            f"I ran your code against the {exercise['topic']} exercise ({exercise['difficulty']}): "
+            f"{passed} of {len(checks)} checks passed."
+        ]
+        lines += [f"- {'passed' if c['passed'] else 'failed'}: {c['name']}" for c in checks]
+        if result["error"]:
+            lines.append(f"\nYour code stopped with: {result['error']}")
+        elif result["output"].strip():
+            shown = result["output"].strip()[:GRADED_OUTPUT_CHARS]
+            lines.append(f"\nIt printed:\n```\n{shown}\n```")
+        if result["passed"]:
+            lines.append("\nThat one is done. Ask for another exercise when you are ready.")
+        else:
+            lines.append("\nFix what failed and paste it again, or say \"give me a hint\".")
+        return "\n".join(lines)
+
+    async def _answer_submission(
+        self, message: str, user_id: str, context: Dict[str, Any]
+    ) -> Optional[str]:
+        """Grade code pasted into chat against the open exercise, without the model.
+
+        None when there is nothing to grade this way: no grader (or one that
+        cannot sandbox on this host), no code in the message, or no open
+        exercise. The caller then answers as usual.
+        """
+        code = find_code(message) if self.grader and self.grader.unavailable is None else None
+        key = self.current_exercise(context) if code else None
+        if key is None:
+            return None
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(None, self._grade, context, code.code, key)
+        except GradingUnavailable:
+            return None
+        except Exception:
+            logger.exception("Grading a chat submission failed; answering it normally")
+            return None
+        response_text = self._graded_reply(result)
+        await self._off_loop(
+            self._record_response_context, user_id, context, "practice", message, response_text, "graded"
+        )
+        return response_text
+
+    def _next_exercise_key(self, context: Dict[str, Any], message: str = "") -> tuple:
+        """(topic, level, difficulty) the next practice turn would ask for."""
+        topic = self._extract_topic(message) or context.get("last_topic")
+        level = self._answer_level(context)
+        return topic, level, self._pick_difficulty(level, context.get("progress", {}))
+
+    def _take_prefetched_exercise(
+        self, agent_name: str, message: str, context: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """The prepared exercise, if this turn is the plain request it was made for."""
+        ready = context.get("next_exercise")
+        if agent_name != "practice" or not ready:
+            return None
+        # Submitted code or "I solved it" needs a reply to what they wrote;
+        # keep the exercise for the request that usually follows.
+        low = (message or "").lower()
+        if not cacheable_question(message) or any(sig in low for sig in _COMPLETION_SIGNALS):
+            return None
+        del context["next_exercise"]
+        key = (ready.get("topic"), ready.get("level"), ready.get("difficulty"))
+        if key != self._next_exercise_key(context, message):
+            return None
+        if time.time() - ready.get("at", 0) > PREFETCH_TTL_S:
+            return None
+        return ready
+
+    def _schedule_prefetch(self, user_id: str, context: Dict[str, Any]) -> None:
+        """Prepare the learner's likely next exercise in the background."""
+        agent = self.agents.get("practice")
+        if self.prefetcher is None or agent is None or self.last_error or self._breaker_open():
+            return
+        topic, level, difficulty = self._next_exercise_key(context)
+        if not topic:
+            return
+        self._collect_prefetched(user_id, context)
+        ready = context.get("next_exercise")
+        if ready and (ready.get("topic"), ready.get("level"), ready.get("difficulty")) == (topic, level, difficulty):
+            return
+
+        request = f"Give me a new {difficulty} practice exercise on {topic}."
+        history = list(context.get("history", []))
+        profile_note = self._profile_note(context)
+
+        def prefetch() -> None:
+            try:
+                text = agent.query(
+                    request, history=history, profile_note=profile_note,
+                    priority=BACKGROUND_PRIORITY, level=level,
+                )
+            except AgentCallError as err:
+                # Not recorded in last_error: a failed guess is not an outage
+                # the learner saw, and the next live call will find out anyway.
+                logger.info("Exercise prefetch for %s skipped (%s)", user_id, err.kind)
+                return
+            if text:
+                # Handed back, not written into the context: a request thread
+                # may be saving it right now. See _collect_prefetched.
+                self.prefetcher.deliver(user_id, (context, {
+                    "topic": topic,
+                    "level": level,
+                    "difficulty": difficulty,
+                    "text": text,
+                    "model": getattr(agent, "last_model_used", None),
+                    "at": round(time.time(), 3),
+                }))
+
+        self.prefetcher.submit(user_id, prefetch)
+
+    def _collect_prefetched(self, user_id: str, context: Dict[str, Any]) -> None:
+        """Move a finished background exercise into the context, on the turn's own thread."""
+        if self.prefetcher is None:
+            return
+        ready = self.prefetcher.collect(user_id)
+        # Dropped if the learner reset their session in the meantime.
+        if ready is not None and ready[0] is context:
+            context["next_exercise"] = ready[1]
+
+    def _pre_resolve(
+        self, agent: Any, agent_name: str, message: str, context: Dict[str, Any]
+    ) -> Optional[str]:
+        """Run the turn's obvious tool call locally; None leaves it to the model."""
+        topic = self._extract_topic(message)
+        if agent_name == "practice":
+            topic = topic or context.get("last_topic")
+        level = self._answer_level(context)
+        known = {
+            "topic": topic,
+            "level": level,
+            "learning_style": context.get("learning_style", "adaptive"),
+            "difficulty": self._pick_difficulty(level, context.get("progress", {})),
+        }
+        try:
+            return agent.pre_resolve(known)
+        except Exception:
+            # Only an optimisation; the model can still call the tool itself.
+            logger.exception("Pre-resolving %s tools failed", agent_name)
+            return None
+
+    async def _answer_from_local_content(
+        self,
+        agent: Any,
+        agent_name: str,
+        message: str,
+        user_id: str,
+        context: Dict[str, Any],
+        answer_mode: str,
+    ) -> str:
+        """Answer from the coach's own content; in hybrid mode, phrased by the agent's model."""
+        facts = self._local_fallback(agent_name, message, user_id, context)
+        response_text, source, model = facts, "local", None
+        if answer_mode == "hybrid" and not self._breaker_open():
+            history = self._history_for_model(context)
+            profile_note = self._profile_note(context)
+            loop = asyncio.get_running_loop()
+            try:
+                response_text = await loop.run_in_executor(
+                    None,
+                    lambda: agent.query(
+                        message, history=history, profile_note=profile_note,
+                        facts=facts, level=self._answer_level(context),
+                    ),
+                )
+                source, model = "gemini", getattr(agent, "last_model_used", None)
+            except Exception as err:
+                # The facts are the answer; phrasing them is a nicety, so a
+                # failure here is served as-is rather than treated as an outage.
+                logger.info("Phrasing %s answer failed, serving it unphrased: %s", agent_name, err)
+                response_text = facts
+        await self._off_loop(
+            self._record_response_context,
+            user_id, context, agent_name, message, response_text, source, model=model
+        )
+        return response_text
+
+    @staticmethod
+    def _answer_level(context: Dict[str, Any]) -> str:
+        level = context.get("skill_level", "unknown")
+        return "beginner" if level == "unknown" else level
+
+    def _remember_answer(
+        self, agent_name: str, message: str, context: Dict[str, Any], response_text: str
+    ) -> None:
+        if self.response_cache is None or agent_name not in CACHED_AGENTS:
+            return
+        if not response_text or not cacheable_question(message):
+            return
+        # The model saw the profile note. Level and style are the cache key;
+        # an answer written around this learner's topics or open exercise is
+        # theirs alone.
+        progress = context.get("progress", {})
+        if (
+            self._history_for_model(context)
+            or progress.get("topics_learned")
+            or context.get("last_topic")
+            or context.get("last_exercise")
+        ):
+            return
+        style = context.get("learning_style", "adaptive")
+        self.response_cache.add(agent_name, self._answer_level(context), style, message, response_text)
+
     def _degraded_notice(self, err: Optional[AgentCallError] = None) -> str:
         """Explain *why* the answer is local content instead of hiding it."""
         kind = err.kind if err else (self.last_error or {}).get("kind", "unknown")
@@ -582,6 +1070,10 @@ class LearningCoachCoordinator:
                 f"The configured model '{self.model_id}' is not available to this project, "
                 "so this answer comes from the built-in lesson library."
             ),
+            "queue_timeout": (
+                "The coach is very busy right now, so this answer comes from the built-in "
+                "lesson library. Try again in a moment."
+            ),
         }
         detail = reasons.get(
             kind,
@@ -608,9 +1100,7 @@ class LearningCoachCoordinator:
         """
         context = context if context is not None else self.get_user_context(user_id)
         progress = context.get("progress", {})
-        level = context.get("skill_level", "unknown")
-        if level == "unknown":
-            level = "beginner"
+        level = self._answer_level(context)
         style = context.get("learning_style", "adaptive")
         prefix = notice
 
@@ -618,11 +1108,22 @@ class LearningCoachCoordinator:
             from .assessment_agent import analyze_student_input, assess_learning_profile
 
             analysis = analyze_student_input(message)
-            detected = self._parse_skill_level("", message) or analysis["detected_experience"]
+            # The code the router already found and parsed, if any.
+            block = find_code(message)
+            code = block.features if block else analyze_code(message)
+            # What they say about themselves wins; otherwise what their code shows.
+            detected = self._parse_skill_level("", message) or (
+                code.level if code.is_code else analysis["detected_experience"]
+            )
             plan = assess_learning_profile(detected, analysis["detected_learning_style"], "python")
+            shown = ""
+            if code.is_code:
+                used = ", ".join(f.replace("_", " ") for f in code.present()) or "plain statements"
+                shown = f"Your code uses: {used} (complexity {code.complexity})\n"
             return (
                 prefix
                 + f"Detected level: {detected}\n"
+                f"{shown}"
                 f"Learning style: {analysis['detected_learning_style']}\n"
                 f"Recommended pace: {plan['recommended_pace']}\n"
                 f"Next steps: {plan['next_steps']}\n"
@@ -633,15 +1134,41 @@ class LearningCoachCoordinator:
         if agent_name == "teaching":
             from .teaching_agent import teach_python_concept
 
-            # Fall back to the topic already under discussion before defaulting,
-            # so "explain that again" does not silently become a variables lesson.
-            topic = self._extract_topic(message) or context.get("last_topic") or "variables"
+            # A real answer to (nearly) the same question beats a library lesson.
+            cached = self.response_cache.nearest(agent_name, level, style, message) if self.response_cache else None
+            if cached is not None:
+                source = "an earlier answer to a very similar question"
+                return prefix.replace(_LIBRARY_SOURCE, source) + cached.answer
+
+            # A named topic wins; otherwise search the library for the question
+            # ("I keep getting an index error" -> lists). Only then fall back to
+            # the topic already under discussion, so "explain that again" does
+            # not silently become a variables lesson.
+            topic = self._extract_topic(message)
+            match = self.lesson_index.best(message, topic=topic)
+            if topic is None:
+                topic = match.section.topic if match else context.get("last_topic") or "variables"
+
+            # Next best: the model's own answer to this kind of question,
+            # generated ahead of time for this topic, level and style.
+            banked = self.answer_bank.lookup(topic, level, style, message)
+            if banked is not None:
+                source = "answers the coach prepared in advance"
+                return prefix.replace(_LIBRARY_SOURCE, source) + banked.answer
+
             lesson = teach_python_concept(topic=topic, level=level, learning_style=style)
             examples = "\n".join(lesson["code_examples"])
             mistakes = ", ".join(lesson["common_mistakes"])
+            # The explanation leads the lesson anyway; anything else that
+            # matched goes first, since it is the answer to what was asked.
+            relevant = ""
+            if match and match.section.kind != "explanation":
+                label = "common mistake" if match.section.kind == "mistake" else match.section.kind
+                relevant = f"Most relevant to your question ({label}):\n{match.section.text}\n\n"
             return (
                 prefix
                 + f"Topic: {lesson['topic']}\n\n"
+                f"{relevant}"
                 f"{lesson['explanation']}\n\n"
                 f"Analogy: {lesson['real_world_analogy']}\n\n"
                 f"Example(s):\n{examples}\n\n"
@@ -683,7 +1210,7 @@ class LearningCoachCoordinator:
             )
 
         if agent_name == "progress":
-            from .progress_agent import generate_progress_report, track_learning_progress
+            from .progress_agent import generate_progress_report, suggest_next_steps, track_learning_progress
 
             topics = progress.get("topics_learned", []) or []
             completed = int(progress.get("exercises_completed", 0))
@@ -703,6 +1230,7 @@ class LearningCoachCoordinator:
                 days_active=max(1, int(progress.get("interactions", 1)) // 5 or 1),
             )
             recommendations = "\n- " + "\n- ".join(tracked["insights"]["recommendations"])
+            pathway = suggest_next_steps(current_level=level, topics_mastered=topics_csv)["pathway"]
             return (
                 prefix
                 + f"Report date: {rep['report_date']}\n"
@@ -713,6 +1241,7 @@ class LearningCoachCoordinator:
                 f"Badge: {tracked['gamification']['badge']} ({tracked['gamification']['achievement']})\n"
                 f"Pace: {rep['analysis']['pace']}\n"
                 f"Recommendations:{recommendations}\n"
+                f"Next steps ({pathway['focus']}): {', '.join(pathway['steps'])}\n"
             )
 
         return f"{prefix}Please try again."
@@ -1,12 +1,65 @@
 from google import genai
 from typing import Dict, Any
 
-from .base_agent import BaseGenAIAgent
+from .base_agent import BaseGenAIAgent, tool_facts
 from .prompts import AGENT_PROMPTS
 
 # ==========================================
 # 1. YOUR CURRICULUM LOGIC (The "Brain")
 # ==========================================
+# --- YOUR ORIGINAL CURRICULUM DATA ---
+# Module-level so a tool call is a lookup, not a rebuild of all three paths.
+PYTHON_CURRICULA: Dict[str, Dict[str, Any]] = {
+    "beginner": {
+        "title": "Python Fundamentals Path (6 Weeks)",
+        "description": "Perfect for absolute beginners starting their programming journey",
+        "weekly_plan": [
+            {"week": 1, "topic": "Python Basics & Setup", "lessons": ["Installing Python", "Variables"], "practice": "Create a simple calculator"},
+            {"week": 2, "topic": "Control Structures", "lessons": ["If/Else", "Boolean logic"], "practice": "Build a number guessing game"},
+            {"week": 3, "topic": "Loops & Iterations", "lessons": ["For/While loops"], "practice": "Multiplication tables"},
+            {"week": 4, "topic": "Functions", "lessons": ["Parameters, Scope"], "practice": "Temperature converter"},
+            {"week": 5, "topic": "Data Structures", "lessons": ["Lists, Dictionaries"], "practice": "Grade tracker"},
+            {"week": 6, "topic": "Final Project", "lessons": ["Debugging, Next Steps"], "practice": "Todo list app"}
+        ],
+        "resources": ["Python Docs", "Codecademy", "freeCodeCamp"],
+        "pace": "Slow and steady",
+        "milestones": ["Week 1: First program", "Week 3: First game", "Week 6: First app"]
+    },
+    "intermediate": {
+        "title": "Python Developer Path (8 Weeks)", 
+        "description": "For those with basic knowledge ready to build real apps",
+        "weekly_plan": [
+            {"week": 1, "topic": "OOP", "lessons": ["Classes, Inheritance"], "practice": "Banking system"},
+            {"week": 2, "topic": "Advanced Data Structures", "lessons": ["Comprehensions"], "practice": "Data processing"},
+            {"week": 3, "topic": "Error Handling", "lessons": ["Try/Except"], "practice": "Robust file processor"},
+            {"week": 4, "topic": "File Handling", "lessons": ["JSON, CSV, SQL"], "practice": "Contact manager"},
+            {"week": 5, "topic": "APIs", "lessons": ["REST, Requests"], "practice": "Weather app"},
+            {"week": 6, "topic": "Libraries", "lessons": ["Pandas, Matplotlib"], "practice": "Data analysis"},
+            {"week": 7, "topic": "Testing", "lessons": ["Pytest, Git"], "practice": "Write tests"},
+            {"week": 8, "topic": "Capstone", "lessons": ["Deployment"], "practice": "Web application"}
+        ],
+        "resources": ["Real Python", "Effective Python"],
+        "pace": "Moderate",
+        "milestones": ["Week 4: Database app", "Week 6: API integration", "Week 8: Portfolio"]
+    },
+    "advanced": {
+        "title": "Python Mastery Path (6 Weeks)",
+        "description": "Mastering advanced concepts",
+        "weekly_plan": [
+            {"week": 1, "topic": "Advanced OOP", "lessons": ["Design Patterns"], "practice": "Implement patterns"},
+            {"week": 2, "topic": "Concurrency", "lessons": ["Async/Await"], "practice": "Concurrent scraper"},
+            {"week": 3, "topic": "Performance", "lessons": ["Profiling, Caching"], "practice": "Optimize app"},
+            {"week": 4, "topic": "Frameworks", "lessons": ["Django/FastAPI/PyTorch"], "practice": "Build with framework"},
+            {"week": 5, "topic": "System Design", "lessons": ["Microservices"], "practice": "Design system"},
+            {"week": 6, "topic": "Open Source", "lessons": ["Contributing"], "practice": "Contribute to project"}
+        ],
+        "resources": ["Fluent Python", "Architecture Patterns"],
+        "pace": "Fast-paced",
+        "milestones": ["Week 3: Tuning", "Week 5: Architecture", "Week 6: Contribution"]
+    }
+}
+
+
 def generate_python_curriculum(
     experience_level: str, 
     learning_goals: str = "general Python proficiency", 
@@ -17,58 +70,7 @@ def generate_python_curriculum(
     # Parse focus_areas if provided
     focus_list = focus_areas.split(",") if focus_areas else ["core programming concepts"]
     
-    # --- YOUR ORIGINAL CURRICULUM DATA ---
-    python_curricula = {
-        "beginner": {
-            "title": "Python Fundamentals Path (6 Weeks)",
-            "description": "Perfect for absolute beginners starting their programming journey",
-            "weekly_plan": [
-                {"week": 1, "topic": "Python Basics & Setup", "lessons": ["Installing Python", "Variables"], "practice": "Create a simple calculator"},
-                {"week": 2, "topic": "Control Structures", "lessons": ["If/Else", "Boolean logic"], "practice": "Build a number guessing game"},
-                {"week": 3, "topic": "Loops & Iterations", "lessons": ["For/While loops"], "practice": "Multiplication tables"},
-                {"week": 4, "topic": "Functions", "lessons": ["Parameters, Scope"], "practice": "Temperature converter"},
-                {"week": 5, "topic": "Data Structures", "lessons": ["Lists, Dictionaries"], "practice": "Grade tracker"},
-                {"week": 6, "topic": "Final Project", "lessons": ["Debugging, Next Steps"], "practice": "Todo list app"}
-            ],
-            "resources": ["Python Docs", "Codecademy", "freeCodeCamp"],
-            "pace": "Slow and steady",
-            "milestones": ["Week 1: First program", "Week 3: First game", "Week 6: First app"]
-        },
-        "intermediate": {
-            "title": "Python Developer Path (8 Weeks)", 
-            "description": "For those with basic knowledge ready to build real apps",
-            "weekly_plan": [
-                {"week": 1, "topic": "OOP", "lessons": ["Classes, Inheritance"], "practice": "Banking system"},
-                {"week": 2, "topic": "Advanced Data Structures", "lessons": ["Comprehensions"], "practice": "Data processing"},
-                {"week": 3, "topic": "Error Handling", "lessons": ["Try/Except"], "practice": "Robust file processor"},
-                {"week": 4, "topic": "File Handling", "lessons": ["JSON, CSV, SQL"], "practice": "Contact manager"},
-                {"week": 5, "topic": "APIs", "lessons": ["REST, Requests"], "practice": "Weather app"},
-                {"week": 6, "topic": "Libraries", "lessons": ["Pandas, Matplotlib"], "practice": "Data analysis"},
-                {"week": 7, "topic": "Testing", "lessons": ["Pytest, Git"], "practice": "Write tests"},
-                {"week": 8, "topic": "Capstone", "lessons": ["Deployment"], "practice": "Web application"}
-            ],
-            "resources": ["Real Python", "Effective Python"],
-            "pace": "Moderate",
-            "milestones": ["Week 4: Database app", "Week 6: API integration", "Week 8: Portfolio"]
-        },
-        "advanced": {
-            "title": "Python Mastery Path (6 Weeks)",
-            "description": "Mastering advanced concepts",
-            "weekly_plan": [
-                {"week": 1, "topic": "Advanced OOP", "lessons": ["Design Patterns"], "practice": "Implement patterns"},
-                {"week": 2, "topic": "Concurrency", "lessons": ["Async/Await"], "practice": "Concurrent scraper"},
-                {"week": 3, "topic": "Performance", "lessons": ["Profiling, Caching"], "practice": "Optimize app"},
-                {"week": 4, "topic": "Frameworks", "lessons": ["Django/FastAPI/PyTorch"], "practice": "Build with framework"},
-                {"week": 5, "topic": "System Design", "lessons": ["Microservices"], "practice": "Design system"},
-                {"week": 6, "topic": "Open Source", "lessons": ["Contributing"], "practice": "Contribute to project"}
-            ],
-            "resources": ["Fluent Python", "Architecture Patterns"],
-            "pace": "Fast-paced",
-            "milestones": ["Week 3: Tuning", "Week 5: Architecture", "Week 6: Contribution"]
-        }
-    }
-    
-    curriculum = python_curricula.get(experience_level.lower(), python_curricula["beginner"])
+    curriculum = PYTHON_CURRICULA.get(experience_level.lower(), PYTHON_CURRICULA["beginner"])
     
     return {
         "curriculum_title": curriculum["title"],
@@ -76,10 +78,10 @@ def generate_python_curriculum(
         "experience_level": experience_level,
         "learning_goals": learning_goals,
         "focus_areas": focus_list,
-        "weekly_plan": curriculum["weekly_plan"],
-        "recommended_resources": curriculum["resources"],
+        "weekly_plan": [dict(week) for week in curriculum["weekly_plan"]],
+        "recommended_resources": list(curriculum["resources"]),
         "recommended_pace": curriculum["pace"],
-        "key_milestones": curriculum["milestones"]
+        "key_milestones": list(curriculum["milestones"])
     }
 
 # ==========================================
@@ -90,6 +92,9 @@ class GenAICurriculumAgent(BaseGenAIAgent):
     tools = [generate_python_curriculum]
     system_instruction = AGENT_PROMPTS["curriculum"]
 
+    def pre_resolve(self, known):
+        return tool_facts(generate_python_curriculum, experience_level=known["level"])
+
 
 # ==========================================
 # 3. THE FACTORY
@@ -0,0 +1,116 @@
+# agents/genai_clients.py
+"""One google-genai client per set of credentials, for the whole process.
+
+The coordinator built its client once, but `api/google_client` built a new
+one (and re-read `.env`) on every helper call, so each call opened a fresh
+connection and paid the TLS handshake again. Every client now comes from
+`client_for`, keyed by its credentials, and they all share the same HTTP
+settings:
+
+- a bounded connection pool (`GENAI_MAX_CONNECTIONS`) whose idle connections
+  are kept alive for `GENAI_KEEPALIVE_S`, so back-to-back calls reuse one;
+- HTTP/2 when the `h2` package is installed, so concurrent calls share a
+  connection instead of each needing their own;
+- a per-call timeout (`GENAI_TIMEOUT_S`). Without one the SDK waits forever,
+  and a stalled call would hold its scheduler slot and thread until the
+  server's own request timeout. A timed-out call is an `AgentCallError`
+  of kind "timeout", which the coordinator retries once and then answers
+  locally.
+
+`pool_stats()` reports the pool for /status and /health. Open and idle
+connections come from `connection_stats()`, which reads httpx's pool through
+attributes that are not public API. If a future httpx moves them, it returns
+{} and the counts are simply left out.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from google import genai
+from google.genai import types
+
+try:
+    import h2  # noqa: F401 - httpx needs it for HTTP/2
+except Exception:  # pragma: no cover - optional dependency
+    h2 = None
+
+GENAI_TIMEOUT_S = float(os.getenv("GENAI_TIMEOUT_S", 60))
+GENAI_MAX_CONNECTIONS = int(os.getenv("GENAI_MAX_CONNECTIONS", 64))
+GENAI_KEEPALIVE_S = float(os.getenv("GENAI_KEEPALIVE_S", 120))
+HTTP2 = h2 is not None
+
+_clients: Dict[Tuple[Tuple[str, Any], ...], genai.Client] = {}
+_lock = threading.Lock()
+_requests = 0
+
+
+def _count_request(request: httpx.Request) -> None:
+    global _requests
+    with _lock:
+        _requests += 1
+
+
+def http_options() -> types.HttpOptions:
+    """The pool, keep-alive and timeout settings every client gets."""
+    limits = httpx.Limits(
+        max_connections=GENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=GENAI_MAX_CONNECTIONS,
+        keepalive_expiry=GENAI_KEEPALIVE_S,
+    )
+    return types.HttpOptions(
+        timeout=int(GENAI_TIMEOUT_S * 1000),  # milliseconds
+        client_args={"limits": limits, "http2": HTTP2, "event_hooks": {"request": [_count_request]}},
+        async_client_args={"limits": limits, "http2": HTTP2},
+    )
+
+
+def client_for(**credentials: Any) -> genai.Client:
+    """The process's client for these `genai.Client` arguments, made on first use."""
+    key = tuple(sorted(credentials.items()))
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = genai.Client(http_options=http_options(), **credentials)
+        return client
+
+
+def _pool(client: genai.Client) -> Optional[Any]:
+    httpx_client = getattr(getattr(client, "_api_client", None), "_httpx_client", None)
+    return getattr(getattr(httpx_client, "_transport", None), "_pool", None)
+
+
+def connection_stats() -> Dict[str, int]:
+    """Open and idle pooled connections, or {} if httpx's internals moved."""
+    with _lock:
+        pools = [_pool(client) for client in _clients.values()]
+    open_, idle = 0, 0
+    try:
+        for pool in pools:
+            connections = getattr(pool, "connections", None)
+            if not isinstance(connections, list):
+                return {}
+            for connection in connections:
+                open_ += 1
+                idle += bool(connection.is_idle())
+    except Exception:  # pool internals moved; the settings still apply
+        return {}
+    return {"open_connections": open_, "idle_connections": idle}
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Clients, settings and connections, for /status and /health."""
+    with _lock:
+        clients = len(_clients)
+    return {
+        "clients": clients,
+        "http2": HTTP2,
+        "max_connections": GENAI_MAX_CONNECTIONS,
+        "keepalive_s": GENAI_KEEPALIVE_S,
+        "timeout_s": GENAI_TIMEOUT_S,
+        **connection_stats(),
+        "requests": _requests,
+    }
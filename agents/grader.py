@@ -0,0 +1,241 @@
+# agents/grader.py
+"""Runs learner submissions against an exercise's checks, in a sandbox.
+
+Every practice exercise in `PRACTICE_EXERCISES` comes with `checks`: named
+Python expressions evaluated after the learner's code has run, against its
+output and the names it defined (see agents/sandbox_worker.py for what a check
+can use). A submission passes when it runs without an exception and every
+check holds.
+
+Each submission runs in its own single-use interpreter (`sandbox_worker.py`),
+chrooted into an empty directory with no network and no privileges, under
+CPU, memory, file and process limits. Where the kernel will not allow that
+isolation (no root, and unprivileged user namespaces turned off) submissions
+are not run at all: `grade` raises `GradingUnavailable`, and callers answer
+without a grade rather than report correct code as failing. Starting Python
+takes longer than grading a beginner exercise does, so the `Grader` keeps
+`workers` interpreters already started and waiting. A submission takes a warm
+one and a replacement starts in the background. During a classroom burst that
+outruns the pool, the extra submissions pay the start-up cost themselves
+rather than waiting for another learner's to finish.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import queue
+import selectors
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+WORKER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_worker.py")
+
+# Characters of a submission's output (and of its error) sent back.
+OUTPUT_CHARS = 2000
+
+# Most a worker may send back. Its result line holds the output and the
+# error, each cut to OUTPUT_CHARS and at most 6 bytes a character as JSON,
+# and the checks; code writing to fd 1 directly may add OUTPUT_CHARS more.
+# Past this the worker is killed, not buffered in the server's memory.
+MAX_REPLY_BYTES = 2 * 6 * OUTPUT_CHARS + OUTPUT_CHARS + 4096
+
+
+class GradingUnavailable(RuntimeError):
+    """The sandbox cannot isolate itself on this host, so nothing is run."""
+
+
+class Grader:
+    """A pool of pre-started sandbox interpreters, one submission each."""
+
+    def __init__(self, workers: int, timeout_s: float = 2.0, cpu_s: int = 1, memory_mb: int = 256):
+        self.workers = max(1, workers)
+        self.timeout_s = timeout_s
+        self.cpu_s = cpu_s
+        self.memory_mb = memory_mb
+        self.graded = 0
+        self.cold_starts = 0
+        self.timeouts = 0
+        self.unavailable: Optional[str] = None
+        self._warm: "queue.Queue[subprocess.Popen]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._refill: Optional[ThreadPoolExecutor] = None
+        self.root: Optional[str] = None
+        self._remove_root: Optional[weakref.finalize] = None
+
+    def _chroot(self) -> str:
+        """The workers' chroot, made on first use: empty, and read-only even to its owner.
+
+        Removed by `close`, or when the grader is collected or the process
+        exits, whichever comes first.
+        """
+        with self._lock:
+            if self.root is None:
+                self.root = tempfile.mkdtemp(prefix="sandbox-root-")
+                os.chmod(self.root, 0o555)
+                self._remove_root = weakref.finalize(self, shutil.rmtree, self.root, True)
+            return self.root
+
+    def _spawn(self) -> subprocess.Popen:
+        # -I: no env vars, user site or cwd on sys.path; -S: no site import,
+        # which also halves start-up time. The empty env keeps API keys out.
+        return subprocess.Popen(
+            [
+                sys.executable, "-I", "-S", WORKER_PATH,
+                str(self.cpu_s), str(self.memory_mb), self._chroot(), str(OUTPUT_CHARS),
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env={},
+            cwd="/",
+            start_new_session=True,
+        )
+
+    def _top_up(self) -> None:
+        while self._warm.qsize() < self.workers and self.unavailable is None:
+            try:
+                self._warm.put(self._spawn())
+            except OSError:
+                logger.exception("Could not start a grading sandbox")
+                return
+
+    def start(self) -> None:
+        """Start the warm pool in the background (idempotent)."""
+        with self._lock:
+            if self._refill is None:
+                self._refill = ThreadPoolExecutor(max_workers=1, thread_name_prefix="grader")
+            self._refill.submit(self._top_up)
+
+    def _take(self) -> subprocess.Popen:
+        while True:
+            try:
+                proc = self._warm.get_nowait()
+            except queue.Empty:
+                self.cold_starts += 1
+                return self._spawn()
+            if proc.poll() is None:
+                return proc
+
+    def grade(self, code: str, checks: Mapping[str, str]) -> Dict[str, Any]:
+        """Run `code`, then `checks`; returns passed, checks, output, error, seconds.
+
+        Raises GradingUnavailable when the sandbox cannot isolate itself.
+        """
+        if self.unavailable is not None:
+            raise GradingUnavailable(self.unavailable)
+        started = time.perf_counter()
+        proc = self._take()
+        self.start()
+        job = json.dumps({"code": code, "checks": dict(checks)}) + "\n"
+        out, ended = self._exchange(proc, job.encode())
+        if ended == "timeout":
+            self.timeouts += 1
+            result = {"error": f"Timed out after {self.timeout_s:g}s", "output": "", "checks": []}
+        elif ended == "overflow":
+            result = {"error": "The code printed too much output", "output": "", "checks": []}
+        else:
+            result = self._parse(out, proc.returncode)
+        reason = result.pop("unavailable", None)
+        if reason:
+            logger.error("Grading sandbox cannot isolate itself, not running submissions: %s", reason)
+            self.unavailable = reason
+            raise GradingUnavailable(reason)
+        self.graded += 1
+        if not result["checks"]:
+            result["checks"] = [{"name": name, "passed": False} for name in checks]
+        result["passed"] = result["error"] is None and all(c["passed"] for c in result["checks"])
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        return result
+
+    def _exchange(self, proc: subprocess.Popen, job: bytes) -> Tuple[bytes, str]:
+        """Send the job and read the reply: (bytes, "exited" | "timeout" | "overflow").
+
+        Like `communicate`, but it stops reading at MAX_REPLY_BYTES and kills
+        the worker there or at the timeout.
+        """
+        deadline = time.monotonic() + self.timeout_s
+        chunks, size, ended = [], 0, "exited"
+        try:
+            proc.stdin.write(job)
+            proc.stdin.close()
+        except OSError:  # it died before reading; its exit status tells why
+            pass
+        with selectors.DefaultSelector() as selector:
+            selector.register(proc.stdout, selectors.EVENT_READ)
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not selector.select(remaining):
+                    ended = "timeout"
+                    break
+                chunk = os.read(proc.stdout.fileno(), 65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > MAX_REPLY_BYTES:
+                    ended = "overflow"
+                    break
+        if ended != "exited":
+            proc.kill()
+        proc.stdout.close()
+        proc.wait()
+        return b"".join(chunks), ended
+
+    @staticmethod
+    def _parse(out: bytes, returncode: int) -> Dict[str, Any]:
+        lines = out.decode("utf-8", "replace").strip().splitlines()
+        try:
+            result = json.loads(lines[-1])
+        except (IndexError, ValueError):
+            # Killed by an rlimit (SIGXCPU, or MemoryError past recovery).
+            reason = "used too much CPU time" if returncode == -24 else "ran out of memory or crashed"
+            return {"error": f"The code {reason}", "output": "", "checks": []}
+        return {
+            "error": result.get("error"),
+            "output": result.get("output", ""),
+            "checks": result.get("checks", []),
+            "unavailable": result.get("unavailable"),
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Pool state for /health."""
+        return {
+            "workers": self.workers,
+            "warm": self._warm.qsize(),
+            "graded": self.graded,
+            "cold_starts": self.cold_starts,
+            "timeouts": self.timeouts,
+            "unavailable": self.unavailable,
+        }
+
+    def close(self) -> None:
+        """Stop every waiting interpreter (tests, shutdown)."""
+        if self._refill is not None:
+            self._refill.shutdown(wait=True)
+        while True:
+            try:
+                proc = self._warm.get_nowait()
+            except queue.Empty:
+                break
+            proc.kill()
+            proc.wait()
+        if self._remove_root is not None:
+            self._remove_root()
+
+
+def create_grader(workers: int) -> Optional[Grader]:
+    """A grader, or None when grading is turned off or the OS cannot sandbox."""
+    if workers <= 0 or os.name != "posix":
+        return None
+    return Grader(workers)
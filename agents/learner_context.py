@@ -0,0 +1,436 @@
+# agents/learner_context.py
+"""Compact learner context that knows what changed since it was last persisted.
+
+Two jobs live here.
+
+Memory. A worker holds every active learner's context, each with up to 50
+history turns. As plain dicts, every turn and every context pays a dict's
+per-object overhead, which dominates worker memory once thousands of learners
+are active. `Turn`, `Progress` and `LearnerContext` are `__slots__` classes
+with interned strings for the small closed vocabularies (role, agent, level,
+style). They keep mapping-style access - `context["progress"]["interactions"]`,
+`turn["text"]`, `.get()`, `.setdefault()` - so the coordinator, the router and
+the tests read them exactly as they read the dicts. `from_dict()` and
+`to_dict()` convert losslessly to and from the Firestore document shape,
+including keys this version does not know about. Long turn text stays
+compressed in both places and is only expanded when a turn is replayed.
+
+Persistence. The coordinator mutates a context in many places and used to ship
+the whole document to Firestore after each of them. `LearnerContext` keeps a
+snapshot of what the store holds, so a save can send only the changed field
+paths plus the new history turns. Changes are found by comparing against the
+snapshot at save time rather than by intercepting writes, because nested edits
+such as `context["progress"]["topics_learned"].append(topic)` never pass
+through the outer object.
+"""
+
+from __future__ import annotations
+
+import sys
+from collections.abc import Mapping, MutableMapping
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from . import text_codec
+
+# Stored turn key for compressed text; it replaces "text" in the document.
+COMPRESSED_KEY = "z"
+
+# The stored history may run this many turns past the in-memory cap before a
+# save rewrites it. Appending is the cheap write, so the trim is amortised over
+# many turns instead of rewriting all 50 turns on every exchange.
+HISTORY_SLACK = 20
+
+# Fields diffed on their own rather than as one value.
+_NESTED = ("history", "progress")
+
+
+def _intern(value: Any) -> Any:
+    """Share one copy of short repeated strings ("coach", "teaching", ...).
+
+    Strings read back from Firestore are fresh objects, so without this every
+    stored turn carries its own copy of its role and agent name.
+    """
+    return sys.intern(value) if isinstance(value, str) and len(value) <= 32 else value
+
+
+class _SlotRecord:
+    """Mapping access over a fixed set of slots plus an overflow dict.
+
+    A field that was never set is simply an unset slot, so "key absent" and
+    "key set to None" stay distinct - which is what makes the conversion back
+    to the stored dict lossless.
+    """
+
+    __slots__ = ()
+    _FIELDS: Tuple[str, ...] = ()
+    _INTERNED: frozenset = frozenset()
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._FIELDS:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for name in self._FIELDS:
+            if hasattr(self, name):
+                yield name
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def _set(self, key: str, value: Any) -> None:
+        if key in self._FIELDS:
+            object.__setattr__(self, key, _intern(value) if key in self._INTERNED else value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self.items())!r})"
+
+
+class Turn(_SlotRecord, Mapping):
+    """One history entry: `{"role", "text", "agent", "at"}`.
+
+    Long text is held compressed (see `text_codec`) and only decompressed when
+    something reads `turn["text"]` - in practice `build_contents` replaying the
+    turn to the model. The stored document carries the blob under `"z"` in
+    place of `"text"`, so a load does not decompress anything either.
+    """
+
+    __slots__ = ("role", "_text", "agent", "at", "_extra")
+    _FIELDS = ("role", "text", "agent", "at")
+    _INTERNED = frozenset(("role", "agent"))
+
+    def __init__(self, role: str, text: str, agent: Optional[str] = None, at: Optional[float] = None):
+        self._extra = None
+        self._set("role", role)
+        self._set("text", text)
+        self._set("agent", agent)
+        if at is not None:
+            self._set("at", at)
+
+    @property
+    def text(self) -> str:
+        return text_codec.decompress(self._text)
+
+    @property
+    def compressed(self) -> bool:
+        return isinstance(getattr(self, "_text", None), bytes)
+
+    def _set(self, key: str, value: Any) -> None:
+        if key == "text":
+            self._text = text_codec.compress(value) if isinstance(value, str) else value
+        elif key == COMPRESSED_KEY and isinstance(value, bytes):
+            self._text = value
+        else:
+            super()._set(key, value)
+
+    def __iter__(self) -> Iterator[str]:
+        # hasattr() on the `text` property would decompress just to list keys.
+        for name in self._FIELDS:
+            if hasattr(self, "_text" if name == "text" else name):
+                yield name
+        if self._extra:
+            yield from self._extra
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> "Turn":
+        turn = cls.__new__(cls)
+        turn._extra = None
+        for key, value in data.items():
+            turn._set(key, value)
+        return turn
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        for key in self:
+            if key == "text" and self.compressed:
+                data[COMPRESSED_KEY] = self._text
+            else:
+                data[key] = self[key]
+        return data
+
+
+class Progress(_SlotRecord, MutableMapping):
+    """Learner counters: topics studied and exercise/turn counts."""
+
+    __slots__ = ("topics_learned", "exercises_delivered", "exercises_completed", "interactions", "_extra")
+    _FIELDS = ("topics_learned", "exercises_delivered", "exercises_completed", "interactions")
+
+    def __init__(self):
+        self._extra = None
+        self.topics_learned: List[str] = []
+        self.exercises_delivered = 0
+        self.exercises_completed = 0
+        self.interactions = 0
+
+    @classmethod
+    def from_dict(cls, data: Any) -> "Progress":
+        """Fresh counters overlaid with whatever `data` holds.
+
+        A stored null (or a non-list `topics_learned`) keeps the fresh
+        default; callers append to the list and add to the counters.
+        """
+        progress = cls()
+        if isinstance(data, Mapping):
+            for key, value in data.items():
+                if key in cls._FIELDS and (value is None or (key == "topics_learned") != isinstance(value, list)):
+                    continue
+                progress[key] = value
+        return progress
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        # Same as LearnerContext.setdefault: return what is stored, which for
+        # topics_learned is a re-interned copy rather than `default` itself.
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key == "topics_learned" and isinstance(value, list):
+            value = [_intern(topic) for topic in value]
+        self._set(key, value)
+
+    def __delitem__(self, key: str) -> None:
+        if key in self._FIELDS:
+            try:
+                object.__delattr__(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: list(v) if isinstance(v, list) else v for k, v in self.items()}
+
+
+class ContextDelta(NamedTuple):
+    """Minimal Firestore update for one save.
+
+    `updates` maps dotted field paths to new values, `deletes` lists paths to
+    remove, and `appends` maps array fields to elements to union in.
+    `history_len` is how many turns the stored array holds afterwards.
+    """
+
+    updates: Dict[str, Any]
+    deletes: List[str]
+    appends: Dict[str, List[Any]]
+    history_len: int
+
+    @property
+    def empty(self) -> bool:
+        return not (self.updates or self.deletes or self.appends)
+
+
+def _stored(value: Any) -> Any:
+    """A context value in the plain shape Firestore can serialise."""
+    if isinstance(value, (Turn, Progress)):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [_stored(v) for v in value]
+    if isinstance(value, Mapping):
+        return dict(value)
+    return value
+
+
+class LearnerContext(_SlotRecord, MutableMapping):
+    """One learner's state, plus a snapshot of its last persisted form."""
+
+    __slots__ = (
+        "skill_level",
+        "learning_style",
+        "history",
+        "progress",
+        "last_agent",
+        "last_topic",
+        "last_exercise",
+        "last_response_source",
+        "last_model",
+        "next_exercise",
+        "_extra",
+        "_saved",
+        "_saved_progress",
+        "_saved_tail",
+        "_stored_history_len",
+    )
+    _FIELDS = (
+        "skill_level",
+        "learning_style",
+        "history",
+        "progress",
+        "last_agent",
+        "last_topic",
+        "last_exercise",
+        "last_response_source",
+        "last_model",
+        "next_exercise",
+    )
+    _INTERNED = frozenset(
+        ("skill_level", "learning_style", "last_agent", "last_topic", "last_response_source", "last_model")
+    )
+
+    def __init__(self):
+        """A fresh learner: unknown level, adaptive style, nothing studied."""
+        self._extra = None
+        self._saved: Optional[Dict[str, Any]] = None
+        self._saved_progress: Dict[str, Any] = {}
+        self._saved_tail: Optional[Any] = None
+        self._stored_history_len = 0
+        self._set("skill_level", "unknown")
+        self._set("learning_style", "adaptive")
+        self.history: List[Turn] = []
+        self.progress = Progress()
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> "LearnerContext":
+        """Build a context from a stored document, filling in newer keys.
+
+        Documents written by older versions lack the newer progress counters
+        and store history as {agent, message}. Reading one of those must not
+        crash or lose the transcript. Unrecognised keys are kept as-is.
+        """
+        context = cls()
+        for key, value in (data or {}).items():
+            context[key] = value
+        return context
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The Firestore document shape."""
+        return {key: _stored(value) for key, value in self.items()}
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key == "progress":
+            value = value if isinstance(value, Progress) else Progress.from_dict(value)
+        elif key == "history":
+            value = self._coerce_history(value)
+        self._set(key, value)
+
+    def __delitem__(self, key: str) -> None:
+        if key in self._FIELDS:
+            try:
+                object.__delattr__(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        # The mixin returns `default` itself, but a stored value may have been
+        # converted (a dict into Progress), and callers mutate what they get.
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    @staticmethod
+    def _coerce_history(value: Any) -> List[Any]:
+        if not isinstance(value, list):
+            return []
+        turns: List[Any] = []
+        for turn in value:
+            if isinstance(turn, Turn):
+                turns.append(turn)
+            elif not isinstance(turn, Mapping):
+                continue
+            elif "text" in turn or COMPRESSED_KEY in turn:
+                turns.append(Turn.from_dict(turn))
+            elif "message" in turn:  # legacy shape: user turns only
+                turns.append(Turn("user", str(turn.get("message", "")), turn.get("agent")))
+        return turns
+
+    # ------------------------------------------
+    # Change tracking
+    # ------------------------------------------
+    @property
+    def is_saved(self) -> bool:
+        """False until the store is known to hold this context."""
+        return self._saved is not None
+
+    def mark_saved(self, delta: Optional[ContextDelta] = None, stored_history_len: Optional[int] = None) -> None:
+        """Record the current state as what the store now holds.
+
+        After a full write pass nothing, after a delta write pass the delta.
+        `stored_history_len` is for contexts read from the store, whose stored
+        array can be longer than the trimmed in-memory history.
+        """
+        self._saved = {k: v for k, v in self.items() if k not in _NESTED}
+        progress = self.get("progress")
+        self._saved_progress = progress.to_dict() if isinstance(progress, Progress) else {}
+        history = self.get("history") or []
+        self._saved_tail = history[-1] if history else None
+        if stored_history_len is not None:
+            self._stored_history_len = stored_history_len
+        elif delta is not None:
+            self._stored_history_len = delta.history_len
+        else:
+            self._stored_history_len = len(history)
+
+    def delta(self, max_history: int) -> Optional[ContextDelta]:
+        """Changes since the last save, or None when a full write is needed."""
+        if self._saved is None:
+            return None
+
+        updates: Dict[str, Any] = {}
+        deletes: List[str] = []
+        appends: Dict[str, List[Any]] = {}
+
+        for key in set(self._saved) | set(self):
+            if key in _NESTED:
+                continue
+            if key not in self:
+                deletes.append(key)
+            elif key not in self._saved or self[key] != self._saved[key]:
+                updates[key] = _stored(self[key])
+
+        progress = self.get("progress")
+        if isinstance(progress, Progress):
+            for key in set(self._saved_progress) | set(progress):
+                path = f"progress.{key}"
+                if key not in progress:
+                    deletes.append(path)
+                elif key not in self._saved_progress or progress[key] != self._saved_progress[key]:
+                    updates[path] = _stored(progress[key])
+        elif self._saved_progress:
+            deletes.append("progress")
+
+        history = self.get("history")
+        history_len = self._stored_history_len
+        new_turns = self._turns_since_save(history)
+        if new_turns is None:
+            # The list was replaced or trimmed past the last saved turn, so
+            # there is nothing to append to.
+            updates["history"] = _stored(list(history or []))
+            history_len = len(updates["history"])
+        elif new_turns:
+            if history_len + len(new_turns) > max_history + HISTORY_SLACK:
+                updates["history"] = _stored(list(history[-max_history:]))
+                history_len = len(updates["history"])
+            else:
+                appends["history"] = _stored(new_turns)
+                history_len += len(new_turns)
+
+        return ContextDelta(updates, sorted(deletes), appends, history_len)
+
+    def _turns_since_save(self, history: Any) -> Optional[List[Any]]:
+        if not isinstance(history, list):
+            return None
+        if self._saved_tail is None:
+            return list(history) if self._stored_history_len == 0 else None
+        # Identity, not equality: the saved tail is that exact turn object, and
+        # an equal earlier turn ("hi" twice) must not be mistaken for it.
+        for index in range(len(history) - 1, -1, -1):
+            if history[index] is self._saved_tail:
+                return history[index + 1 :]
+        return None
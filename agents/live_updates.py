@@ -0,0 +1,175 @@
+# agents/live_updates.py
+"""Learner-state changes pushed to open browser sessions.
+
+The UI used to fetch `/status` and `/context/<user_id>` on load, and every
+`/chat` reply carried the learner's whole public context as well. Now a page
+opens one Server-Sent Events stream (`GET /events/<user_id>`). It gets the
+full state once, then only what changed: a topic added, a counter bumped, the
+API paused or back.
+
+The coordinator calls `publish` whenever it saves a learner's context, and
+`publish_status` whenever the API health changes. Each subscription remembers
+what it last sent, so every event is a delta against what that page already
+has. A learner with no page open costs one dictionary lookup per save.
+
+Under gunicorn a stream waits in `next_event` and holds a request thread, so
+`subscribe` takes a `limit` past which it opens none; the page then polls.
+Under the ASGI server it waits in `next_event_async` instead, which holds
+no thread: `offer` wakes the waiting task through its loop.
+
+Subscriptions live in this process. A page only sees turns answered by the
+process that holds its stream, so the service runs one worker per instance;
+the UI re-reads `/context` after a reply if no update arrived.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+# Events a slow page may fall behind by before it is sent a fresh snapshot.
+MAX_QUEUED_EVENTS = 32
+
+
+def diff(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Keys of `new` that differ from `old`; nested dicts are diffed too."""
+    changed = {}
+    for key, value in new.items():
+        before = old.get(key)
+        if isinstance(value, dict) and isinstance(before, dict):
+            inner = diff(before, value)
+            if inner:
+                changed[key] = inner
+        elif key not in old or before != value:
+            changed[key] = value
+    return changed
+
+
+def format_event(name: str, data: Dict[str, Any]) -> str:
+    """One Server-Sent Events message."""
+    return f"event: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class Subscription:
+    """One open stream: its queue and the state its page already has."""
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.sent: Dict[str, Dict[str, Any]] = {"context": {}, "status": {}}
+        self._events: "queue.Queue[str]" = queue.Queue(MAX_QUEUED_EVENTS)
+        self._lock = threading.Lock()
+        self._wake: Optional[Callable[[], None]] = None
+
+    def offer(self, name: str, view: Dict[str, Any]) -> None:
+        """Queue what changed in `view` since the last `name` event."""
+        with self._lock:
+            changed = diff(self.sent[name], view)
+            if not changed:
+                return
+            self.sent[name] = view
+            try:
+                self._events.put_nowait(format_event(name, changed))
+            except queue.Full:
+                # The page stopped reading. Replace the backlog with a snapshot
+                # of both, since the dropped events may have held either.
+                while True:
+                    try:
+                        self._events.get_nowait()
+                    except queue.Empty:
+                        break
+                for kind, last in self.sent.items():
+                    self._events.put_nowait(format_event(kind, last))
+            if self._wake is not None:
+                self._wake()
+
+    def next_event(self, timeout: float) -> Optional[str]:
+        """The next message to send, or None after `timeout` seconds."""
+        try:
+            return self._events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def next_event_async(self, timeout: float) -> Optional[str]:
+        """`next_event` for a stream served on an event loop, waiting without a thread."""
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        with self._lock:
+            try:
+                return self._events.get_nowait()
+            except queue.Empty:
+                # offer() runs on any thread, the loop's own included.
+                self._wake = lambda: loop.call_soon_threadsafe(ready.set)
+        try:
+            await asyncio.wait_for(ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                self._wake = None
+        try:
+            return self._events.get_nowait()
+        except queue.Empty:
+            return None
+
+
+class ContextFeed:
+    """Open streams by learner, and the deltas each one is owed."""
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Subscription]] = {}
+        self._streams = 0
+        self._lock = threading.Lock()
+
+    def subscribe(
+        self, user_id: str, context: Dict[str, Any], status: Dict[str, Any], limit: Optional[int] = None
+    ) -> Optional[Subscription]:
+        """Open a stream; its first events are the full context and status.
+
+        None when `limit` streams are already open.
+        """
+        subscription = Subscription(user_id)
+        subscription.offer("context", context)
+        subscription.offer("status", status)
+        with self._lock:
+            if limit is not None and self._streams >= limit:
+                return None
+            self._subscribers.setdefault(user_id, []).append(subscription)
+            self._streams += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            streams = self._subscribers.get(subscription.user_id, [])
+            if subscription in streams:
+                streams.remove(subscription)
+                self._streams -= 1
+            if not streams:
+                self._subscribers.pop(subscription.user_id, None)
+
+    def watching(self, user_id: str) -> bool:
+        return user_id in self._subscribers
+
+    def publish(self, user_id: str, context: Dict[str, Any]) -> None:
+        """Send a learner's open pages what changed in their context."""
+        with self._lock:
+            streams = list(self._subscribers.get(user_id, ()))
+        for subscription in streams:
+            subscription.offer("context", context)
+
+    def publish_status(self, status: Dict[str, Any]) -> None:
+        """Send every open page what changed in the service status."""
+        with self._lock:
+            streams = [s for group in self._subscribers.values() for s in group]
+        for subscription in streams:
+            subscription.offer("status", status)
+
+    def snapshot(self) -> Dict[str, int]:
+        """Open streams for /health."""
+        with self._lock:
+            return {
+                "learners": len(self._subscribers),
+                "streams": self._streams,
+            }
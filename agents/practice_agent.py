@@ -1,125 +1,199 @@
 from google import genai
 from typing import Dict, Any
 
-from .base_agent import BaseGenAIAgent
+from .base_agent import BaseGenAIAgent, tool_facts
 from .prompts import AGENT_PROMPTS
 
 # ==========================================
 # 1. YOUR PRACTICE LOGIC (The "Brain")
 # ==========================================
-def generate_python_exercise(
-    topic: str, 
-    level: str = "beginner", 
-    difficulty: str = "easy"
-) -> Dict[str, Any]:
-    """Generate Python practice exercises with solutions and hints"""
-    
-    # --- YOUR ORIGINAL EXERCISE DATA ---
-    exercises = {
-        "variables": {
-            "easy": {
-                "problem": "Create variables for your name, age, and favorite programming language. Then print them in a sentence.",
-                "solution": "name = 'Alex'\nage = 25\nlanguage = 'Python'\nprint(f'My name is {name}, I am {age} years old, and I love {language}')",
-                "hints": ["Use the assignment operator =", "Use f-strings for formatting", "Make sure variable names are descriptive"],
-                "test_cases": ["Should print a complete sentence", "Should include all three variables"]
-            },
-            "medium": {
-                "problem": "Swap the values of two variables without using a third variable. Start with a=5 and b=10.",
-                "solution": "a = 5\nb = 10\nprint(f'Before: a={a}, b={b}')\na, b = b, a\nprint(f'After: a={a}, b={b}')",
-                "hints": ["Use tuple unpacking", "Python allows multiple assignment in one line"],
-                "test_cases": ["a should become 10", "b should become 5"]
-            },
-            "hard": {
-                "problem": "Create a program that checks if a variable's type changes after different operations.",
-                "solution": "x = 5\nprint(type(x))  # int\nx = str(x)\nprint(type(x))  # str\nx = float(x)\nprint(type(x))  # float",
-                "hints": ["Use type() function", "Try different type conversions", "Print the type after each change"],
-                "test_cases": ["Should show type changing", "Should handle conversions properly"]
+# --- YOUR ORIGINAL EXERCISE DATA ---
+# Module-level so a tool call is a lookup, not a rebuild of every exercise.
+# `checks` are what agents/grader.py runs a submission against: a name and a
+# Python expression over the code's output and the names it defined. They are
+# not part of the tool result, so the model never sees them.
+PRACTICE_EXERCISES: Dict[str, Dict[str, Dict[str, Any]]] = {
+    "variables": {
+        "easy": {
+            "problem": "Create variables for your name, age, and favorite programming language. Then print them in a sentence.",
+            "solution": "name = 'Alex'\nage = 25\nlanguage = 'Python'\nprint(f'My name is {name}, I am {age} years old, and I love {language}')",
+            "hints": ["Use the assignment operator =", "Use f-strings for formatting", "Make sure variable names are descriptive"],
+            "test_cases": ["Should print a complete sentence", "Should include all three variables"],
+            "checks": {
+                "Prints one sentence": "len(lines) >= 1 and len(lines[0].split()) >= 4",
+                "Uses at least three variables": "len(names) >= 3"
+            }
+        },
+        "medium": {
+            "problem": "Swap the values of two variables without using a third variable. Start with a=5 and b=10.",
+            "solution": "a = 5\nb = 10\nprint(f'Before: a={a}, b={b}')\na, b = b, a\nprint(f'After: a={a}, b={b}')",
+            "hints": ["Use tuple unpacking", "Python allows multiple assignment in one line"],
+            "test_cases": ["a should become 10", "b should become 5"],
+            "checks": {
+                "a ends up as 10": "a == 10",
+                "b ends up as 5": "b == 5"
+            }
+        },
+        "hard": {
+            "problem": "Create a program that checks if a variable's type changes after different operations.",
+            "solution": "x = 5\nprint(type(x))  # int\nx = str(x)\nprint(type(x))  # str\nx = float(x)\nprint(type(x))  # float",
+            "hints": ["Use type() function", "Try different type conversions", "Print the type after each change"],
+            "test_cases": ["Should show type changing", "Should handle conversions properly"],
+            "checks": {
+                "Shows at least two different types": "len({l for l in lines if l.startswith('<class')}) >= 2",
+                "Converts between types": "uses('type') and uses('str', 'int', 'float')"
+            }
+        }
+    },
+    "functions": {
+        "easy": {
+            "problem": "Write a function that takes a name and returns a greeting message.",
+            "solution": "def greet(name):\n    return f'Hello, {name}!'\n\nprint(greet('Alice'))\nprint(greet('Bob'))",
+            "hints": ["Use the def keyword", "Remember the return statement", "Test with different names"],
+            "test_cases": ["Should return greeting with any name", "Should use proper string formatting"],
+            "checks": {
+                "Returns a greeting with the name": "'Sam' in func('Sam')",
+                "Greets different names differently": "func('Sam') != func('Jo')"
             }
         },
-        "functions": {
-            "easy": {
-                "problem": "Write a function that takes a name and returns a greeting message.",
-                "solution": "def greet(name):\n    return f'Hello, {name}!'\n\nprint(greet('Alice'))\nprint(greet('Bob'))",
-                "hints": ["Use the def keyword", "Remember the return statement", "Test with different names"],
-                "test_cases": ["Should return greeting with any name", "Should use proper string formatting"]
-            },
-            "medium": {
-                "problem": "Create a function that calculates the factorial of a number using recursion.",
-                "solution": "def factorial(n):\n    if n == 0 or n == 1:\n        return 1\n    else:\n        return n * factorial(n-1)\n\nprint(factorial(5))  # 120\nprint(factorial(0))  # 1",
-                "hints": ["Use recursion", "Handle base cases (0 and 1)", "Test with small numbers first"],
-                "test_cases": ["factorial(5) should return 120", "factorial(0) should return 1"]
-            },
-            "hard": {
-                "problem": "Write a function that takes any number of arguments and returns their sum.",
-                "solution": "def sum_all(*args):\n    return sum(args)\n\nprint(sum_all(1, 2, 3))  # 6\nprint(sum_all(10, 20, 30, 40))  # 100",
-                "hints": ["Use *args for variable arguments", "Use the built-in sum() function", "Test with different numbers of arguments"],
-                "test_cases": ["Should work with any number of arguments", "Should return correct sum"]
+        "medium": {
+            "problem": "Create a function that calculates the factorial of a number using recursion.",
+            "solution": "def factorial(n):\n    if n == 0 or n == 1:\n        return 1\n    else:\n        return n * factorial(n-1)\n\nprint(factorial(5))  # 120\nprint(factorial(0))  # 1",
+            "hints": ["Use recursion", "Handle base cases (0 and 1)", "Test with small numbers first"],
+            "test_cases": ["factorial(5) should return 120", "factorial(0) should return 1"],
+            "checks": {
+                "factorial(5) is 120": "func(5) == 120",
+                "factorial(0) is 1": "func(0) == 1"
             }
         },
-        "loops": {
-            "easy": {
-                "problem": "Print all even numbers from 1 to 20 using a for loop.",
-                "solution": "for i in range(1, 21):\n    if i % 2 == 0:\n        print(i)",
-                "hints": ["Use range() function", "Check remainder with modulo operator %", "range(1,21) goes from 1 to 20"],
-                "test_cases": ["Should print 2, 4, 6... 20", "Should use a loop"]
-            },
-            "medium": {
-                "problem": "Find the sum of all numbers in a list using a loop.",
-                "solution": "numbers = [1, 2, 3, 4, 5]\ntotal = 0\nfor num in numbers:\n    total += num\nprint(f'Sum: {total}')",
-                "hints": ["Initialize a variable to store the sum", "Use += operator to add each number", "Print the final total"],
-                "test_cases": ["Sum should be 15 for [1,2,3,4,5]", "Should work with any list of numbers"]
-            },
-            "hard": {
-                "problem": "Create a nested loop that prints a multiplication table from 1 to 5.",
-                "solution": "for i in range(1, 6):\n    for j in range(1, 6):\n        print(f'{i} x {j} = {i*j}')\n    print()  # Blank line after each number",
-                "hints": ["Use nested loops", "Outer loop for first number, inner for second", "Format output nicely"],
-                "test_cases": ["Should print 5x5 multiplication table", "Should be properly formatted"]
+        "hard": {
+            "problem": "Write a function that takes any number of arguments and returns their sum.",
+            "solution": "def sum_all(*args):\n    return sum(args)\n\nprint(sum_all(1, 2, 3))  # 6\nprint(sum_all(10, 20, 30, 40))  # 100",
+            "hints": ["Use *args for variable arguments", "Use the built-in sum() function", "Test with different numbers of arguments"],
+            "test_cases": ["Should work with any number of arguments", "Should return correct sum"],
+            "checks": {
+                "Accepts any number of arguments": "func(1) == 1 and func() == 0",
+                "Returns the correct sum": "func(10, 20, 30, 40) == 100"
+            }
+        }
+    },
+    "loops": {
+        "easy": {
+            "problem": "Print all even numbers from 1 to 20 using a for loop.",
+            "solution": "for i in range(1, 21):\n    if i % 2 == 0:\n        print(i)",
+            "hints": ["Use range() function", "Check remainder with modulo operator %", "range(1,21) goes from 1 to 20"],
+            "test_cases": ["Should print 2, 4, 6... 20", "Should use a loop"],
+            "checks": {
+                "Prints 2, 4, 6 ... 20": "lines == [str(n) for n in range(2, 21, 2)]",
+                "Uses a loop": "uses('For', 'While')"
             }
         },
-        "lists": {
-            "easy": {
-                "problem": "Create a list of 5 fruits and print each fruit using a loop.",
-                "solution": "fruits = ['apple', 'banana', 'cherry', 'date', 'elderberry']\nfor fruit in fruits:\n    print(fruit)",
-                "hints": ["Use square brackets to create a list", "Use a for loop to iterate", "Print each item"],
-                "test_cases": ["Should create a list with 5 items", "Should print all items"]
-            },
-            "medium": {
-                "problem": "Create a list of numbers, then create a new list with only the even numbers.",
-                "solution": "numbers = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]\neven_numbers = [num for num in numbers if num % 2 == 0]\nprint(even_numbers)",
-                "hints": ["Use list comprehension", "Use modulo to check for even numbers", "Filter the original list"],
-                "test_cases": ["Should return [2, 4, 6, 8, 10]", "Should use list comprehension"]
-            },
-            "hard": {
-                "problem": "Write code to find the second largest number in a list without using sort().",
-                "solution": "numbers = [10, 5, 8, 12, 3, 7]\nlargest = max(numbers)\nnumbers_copy = [n for n in numbers if n != largest]\nsecond_largest = max(numbers_copy)\nprint(f'Second largest: {second_largest}')",
-                "hints": ["Find the largest first", "Remove largest from consideration", "Find max of remaining numbers"],
-                "test_cases": ["Should find correct second largest", "Should not use sort()"]
+        "medium": {
+            "problem": "Find the sum of all numbers in a list using a loop.",
+            "solution": "numbers = [1, 2, 3, 4, 5]\ntotal = 0\nfor num in numbers:\n    total += num\nprint(f'Sum: {total}')",
+            "hints": ["Initialize a variable to store the sum", "Use += operator to add each number", "Print the final total"],
+            "test_cases": ["Sum should be 15 for [1,2,3,4,5]", "Should work with any list of numbers"],
+            "checks": {
+                "Prints the sum of the list": "any(str(sum(v)) in output for v in of_type(list))",
+                "Adds the numbers up in a loop": "uses('For', 'While') and not uses('sum')"
             }
         },
-        "dictionaries": {
-            "easy": {
-                "problem": "Create a dictionary for a student with name, age, and grade. Print each key-value pair.",
-                "solution": "student = {'name': 'Alice', 'age': 20, 'grade': 'A'}\nfor key, value in student.items():\n    print(f'{key}: {value}')",
-                "hints": ["Use curly braces for dictionaries", "Use .items() to get key-value pairs", "Format output nicely"],
-                "test_cases": ["Should create a dictionary", "Should print all key-value pairs"]
-            },
-            "medium": {
-                "problem": "Count the frequency of each character in a string using a dictionary.",
-                "solution": "text = 'hello'\nfreq = {}\nfor char in text:\n    freq[char] = freq.get(char, 0) + 1\nprint(freq)",
-                "hints": ["Initialize empty dictionary", "Use .get() method with default value", "Increment count for each character"],
-                "test_cases": ["Should count each character", "Should handle repeated characters"]
-            },
-            "hard": {
-                "problem": "Merge two dictionaries and sum the values for common keys.",
-                "solution": "dict1 = {'a': 1, 'b': 2, 'c': 3}\ndict2 = {'b': 3, 'c': 4, 'd': 5}\nresult = dict1.copy()\nfor key, value in dict2.items():\n    result[key] = result.get(key, 0) + value\nprint(result)",
-                "hints": ["Copy first dictionary", "Iterate through second dictionary", "Add or update values"],
-                "test_cases": ["Should merge both dictionaries", "Should sum values for common keys"]
+        "hard": {
+            "problem": "Create a nested loop that prints a multiplication table from 1 to 5.",
+            "solution": "for i in range(1, 6):\n    for j in range(1, 6):\n        print(f'{i} x {j} = {i*j}')\n    print()  # Blank line after each number",
+            "hints": ["Use nested loops", "Outer loop for first number, inner for second", "Format output nicely"],
+            "test_cases": ["Should print 5x5 multiplication table", "Should be properly formatted"],
+            "checks": {
+                "Prints all 25 products": "all(str(i * j) in output for i in range(1, 6) for j in range(1, 6))",
+                "Uses a nested loop": "loop_depth >= 2"
+            }
+        }
+    },
+    "lists": {
+        "easy": {
+            "problem": "Create a list of 5 fruits and print each fruit using a loop.",
+            "solution": "fruits = ['apple', 'banana', 'cherry', 'date', 'elderberry']\nfor fruit in fruits:\n    print(fruit)",
+            "hints": ["Use square brackets to create a list", "Use a for loop to iterate", "Print each item"],
+            "test_cases": ["Should create a list with 5 items", "Should print all items"],
+            "checks": {
+                "Makes a list of 5 items": "any(len(v) == 5 for v in of_type(list))",
+                "Prints every item": "any(len(v) == 5 and all(str(x) in output for x in v) for v in of_type(list))"
+            }
+        },
+        "medium": {
+            "problem": "Create a list of numbers, then create a new list with only the even numbers.",
+            "solution": "numbers = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]\neven_numbers = [num for num in numbers if num % 2 == 0]\nprint(even_numbers)",
+            "hints": ["Use list comprehension", "Use modulo to check for even numbers", "Filter the original list"],
+            "test_cases": ["Should return [2, 4, 6, 8, 10]", "Should use list comprehension"],
+            "checks": {
+                "Keeps exactly the even numbers": "any(a != b and b == [x for x in a if isinstance(x, int) and x % 2 == 0] for a in of_type(list) for b in of_type(list))",
+                "Uses a list comprehension": "uses('ListComp')"
+            }
+        },
+        "hard": {
+            "problem": "Write code to find the second largest number in a list without using sort().",
+            "solution": "numbers = [10, 5, 8, 12, 3, 7]\nlargest = max(numbers)\nnumbers_copy = [n for n in numbers if n != largest]\nsecond_largest = max(numbers_copy)\nprint(f'Second largest: {second_largest}')",
+            "hints": ["Find the largest first", "Remove largest from consideration", "Find max of remaining numbers"],
+            "test_cases": ["Should find correct second largest", "Should not use sort()"],
+            "checks": {
+                "Prints the second largest number": "any(len(set(v)) > 1 and str(sorted(set(v))[-2]) in output for v in of_type(list))",
+                "Does not sort": "not uses('sort', 'sorted')"
+            }
+        }
+    },
+    "dictionaries": {
+        "easy": {
+            "problem": "Create a dictionary for a student with name, age, and grade. Print each key-value pair.",
+            "solution": "student = {'name': 'Alice', 'age': 20, 'grade': 'A'}\nfor key, value in student.items():\n    print(f'{key}: {value}')",
+            "hints": ["Use curly braces for dictionaries", "Use .items() to get key-value pairs", "Format output nicely"],
+            "test_cases": ["Should create a dictionary", "Should print all key-value pairs"],
+            "checks": {
+                "Makes a dictionary with 3 entries": "any(len(v) >= 3 for v in of_type(dict))",
+                "Prints every key and value": "any(v and all(str(k) in output and str(x) in output for k, x in v.items()) for v in of_type(dict))"
+            }
+        },
+        "medium": {
+            "problem": "Count the frequency of each character in a string using a dictionary.",
+            "solution": "text = 'hello'\nfreq = {}\nfor char in text:\n    freq[char] = freq.get(char, 0) + 1\nprint(freq)",
+            "hints": ["Initialize empty dictionary", "Use .get() method with default value", "Increment count for each character"],
+            "test_cases": ["Should count each character", "Should handle repeated characters"],
+            "checks": {
+                "Counts every character": "any(d and any(d == {c: s.count(c) for c in s} for s in of_type(str)) for d in of_type(dict))",
+                "Prints the counts": "any(d and str(d) in output for d in of_type(dict))"
+            }
+        },
+        "hard": {
+            "problem": "Merge two dictionaries and sum the values for common keys.",
+            "solution": "dict1 = {'a': 1, 'b': 2, 'c': 3}\ndict2 = {'b': 3, 'c': 4, 'd': 5}\nresult = dict1.copy()\nfor key, value in dict2.items():\n    result[key] = result.get(key, 0) + value\nprint(result)",
+            "hints": ["Copy first dictionary", "Iterate through second dictionary", "Add or update values"],
+            "test_cases": ["Should merge both dictionaries", "Should sum values for common keys"],
+            "checks": {
+                "Merges both dictionaries, summing common keys": "any(r is not a and r is not b and a != b and r == {k: a.get(k, 0) + b.get(k, 0) for k in {**a, **b}} for a in of_type(dict) for b in of_type(dict) for r in of_type(dict))",
+                "Prints the result": "any(str(r) in output for r in of_type(dict))"
             }
         }
     }
+}
+
+# Exercises without their own checks pass when the code simply runs.
+DEFAULT_CHECKS: Dict[str, str] = {"Runs without errors": "True"}
+
+
+def exercise_checks(topic: str, difficulty: str) -> Dict[str, str]:
+    """The grader's checks for one exercise."""
+    exercise = PRACTICE_EXERCISES.get((topic or "").lower(), {}).get((difficulty or "").lower(), {})
+    return dict(exercise.get("checks") or DEFAULT_CHECKS)
+
+
+def generate_python_exercise(
+    topic: str, 
+    level: str = "beginner", 
+    difficulty: str = "easy"
+) -> Dict[str, Any]:
+    """Generate Python practice exercises with solutions and hints"""
     
     # Logic to fetch the exercise
-    topic_exercises = exercises.get(topic.lower(), {})
+    topic_exercises = PRACTICE_EXERCISES.get(topic.lower(), {})
     difficulty_exercise = topic_exercises.get(difficulty.lower(), {
         "problem": f"Write a Python program that demonstrates {topic} at {difficulty} level.",
         "solution": f"# Solution for {topic} exercise\n# Implement your solution here\nprint('Practice {topic}')",
@@ -132,9 +206,9 @@ def generate_python_exercise(
         "level": level,
         "difficulty": difficulty,
         "problem_statement": difficulty_exercise["problem"],
-        "hints": difficulty_exercise["hints"],
+        "hints": list(difficulty_exercise["hints"]),
         "solution_code": difficulty_exercise["solution"],
-        "test_cases": difficulty_exercise.get("test_cases", []),
+        "test_cases": list(difficulty_exercise.get("test_cases", [])),
         "learning_objective": f"Practice {topic} concepts at {level} level with {difficulty} difficulty",
         "estimated_time": "10-15 minutes" if difficulty == "easy" else "15-25 minutes" if difficulty == "medium" else "25-40 minutes",
         "success_criteria": ["Code runs without errors", "Output matches expected result", "Uses proper syntax"],
@@ -149,6 +223,16 @@ class GenAIPracticeAgent(BaseGenAIAgent):
     tools = [generate_python_exercise]
     system_instruction = AGENT_PROMPTS["practice"]
 
+    def pre_resolve(self, known):
+        if not known.get("topic"):
+            return None
+        return tool_facts(
+            generate_python_exercise,
+            topic=known["topic"],
+            level=known["level"],
+            difficulty=known["difficulty"],
+        )
+
 
 # ==========================================
 # 3. THE FACTORY
@@ -0,0 +1,109 @@
+# agents/prefetch.py
+"""Speculative background calls for the turn a learner is likely to ask next.
+
+Practice is the slowest thing the coach does: an exercise with hints and
+success criteria is the longest reply any agent writes. It is also the most
+predictable one. After a lesson or an exercise on a topic the next request is
+usually "give me an exercise" on that topic, at the difficulty
+`_pick_difficulty` would choose anyway. The coordinator hands such a call to
+a `Prefetcher`, which runs it on a background thread. The call hands its
+result back with `deliver()` rather than writing the learner's context: a
+request may be diffing, saving or editing that context at the same moment.
+The learner's next turn `collect()`s it on its own thread and finds it ready.
+
+Every speculative call spends real quota that may be wasted, so they are
+capped: at most `calls_per_hour` across the process, one at a time (a
+prefetch never holds more than one connection a live request could use), and
+at most one in flight per learner.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+WINDOW_S = 3600.0
+
+
+class Prefetcher:
+    """Runs speculative calls one at a time within an hourly call budget."""
+
+    def __init__(self, calls_per_hour: int):
+        self.calls_per_hour = calls_per_hour
+        self._calls: Deque[float] = deque()
+        self._pending: Dict[str, Future] = {}
+        self._ready: Dict[str, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def calls_left(self) -> int:
+        """Calls still allowed in the current hour."""
+        with self._lock:
+            self._expire(time.monotonic())
+            return max(0, self.calls_per_hour - len(self._calls))
+
+    def _expire(self, now: float) -> None:
+        while self._calls and now - self._calls[0] >= WINDOW_S:
+            self._calls.popleft()
+
+    def submit(self, key: str, call: Callable[[], None]) -> Optional[Future]:
+        """Run `call` in the background, unless `key` is busy or the budget is spent."""
+        with self._lock:
+            if key in self._pending:
+                return None
+            now = time.monotonic()
+            self._expire(now)
+            if len(self._calls) >= self.calls_per_hour:
+                return None
+            self._calls.append(now)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+            future = self._executor.submit(self._run, call)
+            self._pending[key] = future
+        future.add_done_callback(lambda _: self._done(key, future))
+        return future
+
+    @staticmethod
+    def _run(call: Callable[[], None]) -> None:
+        try:
+            call()
+        except Exception:  # a failed guess must never surface anywhere
+            logger.exception("Prefetch failed")
+
+    def _done(self, key: str, future: Future) -> None:
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+    def deliver(self, key: str, result: Any) -> None:
+        """Leave a finished call's result for `key`'s next `collect()`."""
+        now = time.monotonic()
+        with self._lock:
+            # Results nobody came back for within the hour are dropped.
+            for stale in [k for k, (at, _) in self._ready.items() if now - at >= WINDOW_S]:
+                del self._ready[stale]
+            self._ready[key] = (now, result)
+
+    def collect(self, key: str) -> Optional[Any]:
+        """The result delivered for `key`, once; None if there is none."""
+        with self._lock:
+            ready = self._ready.pop(key, None)
+        return ready[1] if ready is not None else None
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Block until every submitted call has finished (tests, shutdown)."""
+        with self._lock:
+            futures = list(self._pending.values())
+        for future in futures:
+            future.exception(timeout=timeout)
+
+
+def create_prefetcher(calls_per_hour: int) -> Optional[Prefetcher]:
+    """A prefetcher, or None when the budget is zero (the default)."""
+    return Prefetcher(calls_per_hour) if calls_per_hour > 0 else None
@@ -53,6 +53,10 @@ AGENT_PROMPTS = {
         Use clear explanations, a real-world analogy, and multiple examples.
         Offer a small practice task at the end.
 
+        Match the length to the learner's level. For a beginner, cover one idea
+        with one short example; save edge cases and extra examples for
+        intermediate and advanced learners, or for when they ask.
+
         The conversation so far is provided. When the student says things like
         "explain that again", "simpler", or "I don't get it", they mean the topic
         from the previous turns - do not switch topics or start over from
@@ -73,6 +77,9 @@ AGENT_PROMPTS = {
         they already solved an easy exercise on it, step the difficulty up
         instead of repeating the same problem.
 
+        Keep beginner exercises short: a few sentences of problem, two hints,
+        and small inputs.
+
         Label the exercise with a line of the form:
         Exercise: <topic> (<easy|medium|hard>)
     """,
@@ -0,0 +1,101 @@
+# agents/response_cache.py
+"""Recent Gemini answers, found again by question similarity.
+
+When the API is out (quota, breaker open) the teaching fallback can only offer
+a library lesson. But the coach has very likely answered the same question
+for someone else already, and that answer - in the model's own words, often
+with the exact example asked for - is better than the generic lesson. This
+keeps the most recent answers in a `TfidfIndex` keyed by question, so the
+fallback can serve the nearest one.
+
+Answers are shared across learners, so only answers to self-contained
+questions are kept: no code, no follow-up that leans on the learner's own
+history. The answer must not lean on it either: the coordinator only keeps
+answers the model wrote without the learner's history, topics or open
+exercise, and files them under the level and learning style it was told.
+Set RESPONSE_CACHE_SIZE=0 where even that is too much sharing.
+"""
+
+from __future__ import annotations
+
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from .vector_index import TfidfIndex, np
+
+# Cosine similarity between questions needed to reuse an answer. High on
+# purpose: a near miss ("for loops" for "while loops") is a wrong answer.
+MIN_SIMILARITY = 0.8
+
+# Questions longer than this are usually specific to one learner's situation.
+MAX_QUESTION_CHARS = 300
+
+_CODE_MARKERS = ("```", "def ", "print(", "import ", "\n    ", " = ")
+
+
+class CachedAnswer(NamedTuple):
+    agent: str
+    level: str
+    style: str
+    question: str
+    answer: str
+    similarity: float = 1.0
+
+
+def cacheable_question(question: str) -> bool:
+    """Short, code-free, self-contained - safe to answer the same way for anyone."""
+    q = question or ""
+    return 0 < len(q) <= MAX_QUESTION_CHARS and not any(m in q for m in _CODE_MARKERS)
+
+
+class ResponseCache:
+    """Bounded LRU of answers with nearest-question lookup.
+
+    Each (agent, level, style) has its own index, so a lookup ranks only the
+    answers it may serve. Ranking everything and filtering afterwards would
+    lose a good match behind closer questions asked for other learners.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._indexes: Dict[Tuple[str, str, str], TfidfIndex] = {}
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, agent: str, level: str, style: str, question: str, answer: str) -> None:
+        key = next(self._ids)
+        with self._lock:
+            self._entries[key] = CachedAnswer(agent, level, style, question, answer)
+            evicted = []
+            while len(self._entries) > self.capacity:
+                evicted.append(self._entries.popitem(last=False))
+            index = self._indexes.get((agent, level, style))
+            if index is None:
+                index = self._indexes[(agent, level, style)] = TfidfIndex()
+        index.add(key, question)
+        for old, entry in evicted:
+            self._indexes[(entry.agent, entry.level, entry.style)].discard(old)
+
+    def nearest(self, agent: str, level: str, style: str, question: str) -> Optional[CachedAnswer]:
+        """Closest cached answer for the same agent, level and style, if close enough."""
+        index = self._indexes.get((agent, level, style))
+        if index is None:
+            return None
+        for key, score in index.search([question])[0]:
+            entry = self._entries.get(key)
+            if score >= MIN_SIMILARITY and entry is not None:
+                return entry._replace(similarity=score)
+        return None
+
+
+def create_response_cache(capacity: int) -> Optional[ResponseCache]:
+    """A cache, or None when disabled or numpy is missing."""
+    if capacity <= 0 or np is None:
+        return None
+    return ResponseCache(capacity)
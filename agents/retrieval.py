@@ -0,0 +1,155 @@
+# agents/retrieval.py
+"""BM25 search over the built-in lesson library.
+
+Degraded mode answers from local content, and used to pick that content by
+topic keyword alone: a question that named none of the `TOPIC_ALIASES` got a
+variables lesson whatever it asked ("I keep getting an index error"). This
+indexes every lesson section - explanation, each example, the analogy, each
+common mistake, the practice task and every exercise - so the fallback can
+find the part of the library that actually answers the question.
+
+The library is a few dozen short sections, so the index is a plain inverted
+index built once at startup; a query touches only the postings of its own
+terms and takes microseconds.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .practice_agent import PRACTICE_EXERCISES
+from .teaching_agent import TEACHING_MATERIALS
+
+# Standard BM25 constants; the library is too small to be worth tuning them.
+K1 = 1.2
+B = 0.75
+
+# Below this a "match" is usually one common word shared by chance, and the
+# caller is better off with the topic already under discussion.
+MIN_SCORE = 3.0
+
+_WORD_RE = re.compile(r"[a-z0-9_]{2,}")
+# "KeyError" -> "Key Error", so exception names meet the prose about them.
+_CAMEL_RE = re.compile(r"([a-z])([A-Z])")
+
+# Question words and filler. Python keywords that carry meaning in a question
+# ("for", "if", "while", "return", "self") stay searchable; "in", "is", "as"
+# and "not" are dropped because in English prose they match everything.
+_STOPWORDS = frozenset(
+    """an and are as at be but by can could do does did how in is it its me my
+    not of on or so that the their them then there these this to was what when
+    where which who why will with would you your please explain tell show about
+    again help understand get got don doesn isn im ive""".split()
+)
+
+
+class Section(NamedTuple):
+    """One retrievable piece of the library."""
+
+    topic: str
+    kind: str  # explanation | example | analogy | mistake | practice | exercise
+    text: str
+
+
+class Match(NamedTuple):
+    score: float
+    section: Section
+
+
+def _stem(word: str) -> str:
+    """Fold the plural and verb forms learners actually type onto one term."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("sses", "xes", "ches", "shes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    if len(word) > 5 and word.endswith("ing"):
+        return word[:-3]
+    if len(word) > 4 and word.endswith("ed"):
+        return word[:-2]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    words = _WORD_RE.findall(_CAMEL_RE.sub(r"\1 \2", text).lower())
+    return [_stem(w) for w in words if w not in _STOPWORDS]
+
+
+def library_sections() -> List[Section]:
+    """Every section of the lesson and exercise tables."""
+    sections: List[Section] = []
+    for topic, lesson in TEACHING_MATERIALS.items():
+        sections.append(Section(topic, "explanation", lesson["explanation"]))
+        sections.extend(Section(topic, "example", code) for code in lesson["examples"])
+        sections.append(Section(topic, "analogy", lesson["analogy"]))
+        sections.extend(Section(topic, "mistake", m) for m in lesson["common_mistakes"])
+        sections.append(Section(topic, "practice", lesson["practice_exercise"]))
+    for topic, levels in PRACTICE_EXERCISES.items():
+        for exercise in levels.values():
+            text = exercise["problem"] + "\n" + "\n".join(exercise["hints"])
+            sections.append(Section(topic, "exercise", text))
+    return sections
+
+
+class LessonIndex:
+    """Inverted index with BM25 scoring over library sections."""
+
+    def __init__(self, sections: Iterable[Section]):
+        self.sections: List[Section] = list(sections)
+        self._postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._lengths: List[int] = []
+        for doc_id, section in enumerate(self.sections):
+            # The topic name is indexed with every section, so "loops" pulls
+            # in the loops lesson even from a section that never says it.
+            terms = Counter(tokenize(section.topic + " " + section.text))
+            for term, tf in terms.items():
+                self._postings[term].append((doc_id, tf))
+            self._lengths.append(sum(terms.values()))
+        self._postings = dict(self._postings)
+        n = len(self.sections)
+        self._avg_length = (sum(self._lengths) / n) if n else 0.0
+        self._idf = {
+            term: math.log(1 + (n - len(posts) + 0.5) / (len(posts) + 0.5))
+            for term, posts in self._postings.items()
+        }
+
+    def search(self, query: str, limit: int = 3, topic: Optional[str] = None) -> List[Match]:
+        """Best sections for `query`, highest first, optionally within one topic.
+
+        Within a topic its own name says nothing about which section fits, so
+        those terms are ignored: "explain dictionaries" matches no section in
+        particular, "KeyError in my dictionary" matches the key-error mistake.
+        """
+        terms = set(tokenize(query))
+        if topic is not None:
+            terms -= set(tokenize(topic))
+        scores: Dict[int, float] = defaultdict(float)
+        for term in terms:
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self._postings[term]:
+                norm = K1 * (1 - B + B * self._lengths[doc_id] / self._avg_length)
+                scores[doc_id] += idf * tf * (K1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        matches = []
+        for doc_id, score in ranked:
+            section = self.sections[doc_id]
+            if topic is None or section.topic == topic:
+                matches.append(Match(score, section))
+                if len(matches) == limit:
+                    break
+        return matches
+
+    def best(self, query: str, topic: Optional[str] = None) -> Optional[Match]:
+        """The single best section, or None when nothing clears MIN_SCORE."""
+        matches = self.search(query, limit=1, topic=topic)
+        return matches[0] if matches and matches[0].score >= MIN_SCORE else None
+
+
+def build_lesson_index() -> LessonIndex:
+    return LessonIndex(library_sections())
@@ -0,0 +1,263 @@
+# agents/sandbox_worker.py
+"""Runs one learner submission in a locked-down interpreter, then exits.
+
+Started by agents/grader.py as `python -I -S sandbox_worker.py <cpu_s>
+<memory_mb> <root>` before any submission arrives. This file is run by path,
+not imported, and imports nothing from the app. The grader also starts it
+with an empty environment.
+
+The boundary is the kernel, not Python. Before it reads a job the worker
+imports the modules a submission may use, then isolates itself:
+
+- new mount, network and IPC namespaces: no network interfaces at all;
+- `chroot` into `<root>`, an empty directory: no `/proc` (so no
+  `/proc/<ppid>/environ` and its API keys), no app files, nothing to write;
+- no privileges left. Started as root it switches to `nobody`. Otherwise it
+  enters a new user namespace first, for the rights to do the above, then
+  drops every capability. `no_new_privs` is set either way.
+
+If any step fails, the worker answers the job with an error and never runs
+the code: grading fails closed. The grader logs why.
+
+Once it has the job it locks itself down further, and nothing can be undone:
+
+- rlimits: CPU seconds, address space, no file writes, no new processes;
+- an audit hook refusing sockets, subprocesses, exec, fork, ctypes, opening
+  files for writing (by mode string or `os.open` flags) and truncating them.
+
+The hook is defence in depth and a clear error message, not the boundary.
+Then it runs the code with stdout captured and evaluates each check. One
+JSON line goes to stdout and the process exits. The next submission gets a
+fresh process, so nothing one learner's code does can leak into another's.
+
+The sandbox protects the server, not the grade: code that wants to can fake
+its own result.
+"""
+
+import ast
+import builtins
+import contextlib
+import ctypes
+import io
+import json
+import os
+import resource
+import sys
+import traceback
+import types
+
+OUTPUT_CHARS = 2000  # the grader passes its own
+
+# Imported before the chroot, after which nothing more can be loaded.
+PRELOADED = (
+    "bisect", "collections", "copy", "dataclasses", "datetime", "decimal", "enum",
+    "fractions", "functools", "heapq", "itertools", "math", "operator", "random",
+    "re", "statistics", "string", "textwrap", "time", "typing",
+    "encodings.ascii", "encodings.idna", "encodings.latin_1",
+    "socket",  # so a connection attempt meets the audit hook's clear refusal
+)
+
+NOBODY = 65534
+
+_CLONE_NEWNS = 0x00020000
+_CLONE_NEWIPC = 0x08000000
+_CLONE_NEWUSER = 0x10000000
+_CLONE_NEWNET = 0x40000000
+_PR_SET_NO_NEW_PRIVS = 38
+_CAPABILITY_VERSION_3 = 0x20080522
+
+_WRITE_FLAGS = os.O_WRONLY | os.O_RDWR | os.O_CREAT | os.O_TRUNC | os.O_APPEND
+
+_BLOCKED_EVENTS = (
+    "socket.",
+    "subprocess.",
+    "os.system",
+    "os.exec",
+    "os.fork",
+    "os.forkpty",
+    "os.posix_spawn",
+    "os.spawn",
+    "os.kill",
+    "os.putenv",
+    "os.remove",
+    "os.rename",
+    "os.rmdir",
+    "os.mkdir",
+    "os.chmod",
+    "os.chown",
+    "os.link",
+    "os.symlink",
+    "os.truncate",  # os.truncate and os.ftruncate
+    "os.utime",
+    "os.setxattr",
+    "os.removexattr",
+    "os.killpg",
+    "signal.pthread_kill",
+    "shutil.",
+    "ctypes.",
+    "pty.",
+    "webbrowser.",
+)
+
+
+def _audit(event, args):
+    if event.startswith(_BLOCKED_EVENTS):
+        raise PermissionError(f"{event} is not allowed when grading")
+    if event == "open":
+        # open() passes its mode string, os.open() only its flags.
+        _, mode, flags = (tuple(args) + (None, None))[:3]
+        if (isinstance(mode, str) and any(c in mode for c in "wax+")) or (
+            isinstance(flags, int) and flags & _WRITE_FLAGS
+        ):
+            raise PermissionError("Writing files is not allowed when grading")
+
+
+class _CapHeader(ctypes.Structure):
+    _fields_ = [("version", ctypes.c_uint32), ("pid", ctypes.c_int)]
+
+
+class _CapData(ctypes.Structure):
+    _fields_ = [("effective", ctypes.c_uint32), ("permitted", ctypes.c_uint32), ("inheritable", ctypes.c_uint32)]
+
+
+def _check(result, what):
+    if result != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, f"{what}: {os.strerror(err)}")
+
+
+def _write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def _isolate(root):
+    """Leave the server's filesystem, network and identity behind (see above)."""
+    libc = ctypes.CDLL(None, use_errno=True)
+    uid, gid = os.getuid(), os.getgid()
+    rootless = os.geteuid() != 0
+    flags = _CLONE_NEWNS | _CLONE_NEWNET | _CLONE_NEWIPC | (_CLONE_NEWUSER if rootless else 0)
+    _check(libc.unshare(flags), "unshare")
+    if rootless:
+        _write("/proc/self/setgroups", "deny")
+        _write("/proc/self/uid_map", f"{NOBODY} {uid} 1")
+        _write("/proc/self/gid_map", f"{NOBODY} {gid} 1")
+    os.chroot(root)
+    os.chdir("/")
+    if rootless:
+        # Every capability, CAP_SYS_CHROOT included: root in the namespace
+        # could otherwise chroot again to climb back out.
+        _check(libc.capset(ctypes.byref(_CapHeader(_CAPABILITY_VERSION_3, 0)), (_CapData * 2)()), "capset")
+    else:
+        os.setgroups([])
+        os.setresgid(NOBODY, NOBODY, NOBODY)
+        os.setresuid(NOBODY, NOBODY, NOBODY)
+    _check(libc.prctl(_PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0), "prctl")
+    # Submissions reach sys.modules; ctypes has no business there.
+    for name in [m for m in sys.modules if m == "ctypes" or m.startswith(("ctypes.", "_ctypes"))]:
+        del sys.modules[name]
+
+
+def _lock_down(cpu_s, memory_mb):
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_s, cpu_s + 1))
+    memory = memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+    sys.addaudithook(_audit)
+
+
+def _helpers(code, tree, namespace, output):
+    """Names each check expression can use."""
+    nodes = list(ast.walk(tree)) if tree is not None else []
+    kinds = {type(node).__name__ for node in nodes}
+    called = set()
+    for node in nodes:
+        if isinstance(node, ast.Call):
+            target = node.func
+            called.add(getattr(target, "id", None) or getattr(target, "attr", None))
+
+    def uses(*names):
+        """True if the code has any of these node types (For, ListComp...) or calls."""
+        return any(name in kinds or name in called for name in names)
+
+    def loop_depth(node=tree, depth=0):
+        inner = depth + isinstance(node, (ast.For, ast.While))
+        return max([inner] + [loop_depth(child, inner) for child in ast.iter_child_nodes(node)])
+
+    names = {k: v for k, v in namespace.items() if not k.startswith("__")}
+    functions = [
+        v for v in names.values()
+        if isinstance(v, types.FunctionType) and v.__code__.co_filename == "<submission>"
+    ]
+    return {
+        "__builtins__": builtins,
+        "source": code,
+        "output": output,
+        "lines": [line.strip() for line in output.splitlines() if line.strip()],
+        "names": names,
+        "func": functions[0] if functions else None,
+        "of_type": lambda kind: [v for v in names.values() if isinstance(v, kind)],
+        "uses": uses,
+        "loop_depth": loop_depth(tree) if tree is not None else 0,
+        **names,
+    }
+
+
+def run(job):
+    code = job["code"]
+    namespace = {"__name__": "__main__", "__builtins__": builtins}
+    stdout = io.StringIO()
+    error = None
+    tree = None
+    try:
+        tree = ast.parse(code, "<submission>")
+        with contextlib.redirect_stdout(stdout):
+            exec(compile(tree, "<submission>", "exec"), namespace)
+    except BaseException as exc:  # SystemExit and friends are the learner's too
+        frames = traceback.extract_tb(exc.__traceback__)
+        line = next((f.lineno for f in reversed(frames) if f.filename == "<submission>"), None)
+        line = line or getattr(exc, "lineno", None)
+        error = f"{type(exc).__name__}: {exc}" if str(exc) else type(exc).__name__
+        error = error[:OUTPUT_CHARS] + (f" (line {line})" if line else "")
+    output = stdout.getvalue()
+
+    checks = []
+    if error is None:
+        scope = _helpers(code, tree, namespace, output)
+        for name, expression in job["checks"].items():
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    passed = bool(eval(expression, dict(scope)))
+            except Exception:
+                passed = False
+            checks.append({"name": name, "passed": passed})
+    else:
+        checks = [{"name": name, "passed": False} for name in job["checks"]]
+    return {"error": error, "output": output[:OUTPUT_CHARS], "checks": checks}
+
+
+def main():
+    global OUTPUT_CHARS
+    cpu_s, memory_mb, root = int(sys.argv[1]), int(sys.argv[2]), sys.argv[3]
+    OUTPUT_CHARS = int(sys.argv[4])
+    for name in PRELOADED:
+        __import__(name)
+    try:
+        _isolate(root)
+    except Exception as exc:
+        isolated = f"{type(exc).__name__}: {exc}"
+    else:
+        isolated = None
+    job = json.loads(sys.stdin.readline())
+    if isolated is not None:
+        result = {"error": None, "output": "", "checks": [], "unavailable": isolated}
+    else:
+        _lock_down(cpu_s, memory_mb)
+        result = run(job)
+    sys.__stdout__.write("\n" + json.dumps(result) + "\n")
+    sys.__stdout__.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# agents/scheduler.py
+"""Admission control for Gemini calls: a bounded, prioritised pool per model.
+
+Without it, every request thread calls the API the moment it gets there. A
+burst of progress reports then competes on equal terms with a new learner's
+first assessment, calls pile up on a throttled model, and the slowest of them
+run into gunicorn's 120 s worker timeout. Here each model gets at most
+`concurrency` calls in flight per process. Waiting callers are admitted
+lowest priority number first, in arrival order within a priority, and a
+caller that cannot get a slot before its deadline gets
+`AgentCallError("queue_timeout")` - which the coordinator answers with local
+content at once, instead of leaving the learner in a queue.
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+
+from .base_agent import AgentCallError
+
+# Speculative work (agents/prefetch.py) yields to every learner-facing call.
+BACKGROUND_PRIORITY = 100
+
+
+class CallScheduler:
+    """Per-model concurrency slots, handed out by priority."""
+
+    def __init__(self, concurrency: int, queue_timeout_s: float):
+        self.concurrency = max(1, concurrency)
+        self.queue_timeout_s = queue_timeout_s
+        self.timeouts = 0
+        self._cond = threading.Condition()
+        self._active: Dict[str, int] = {}
+        self._waiting: Dict[str, List[Tuple[int, int]]] = {}
+        self._seq = itertools.count()
+
+    def deadline(self) -> float:
+        """Deadline for a call queued now; one per query, across its models."""
+        return time.monotonic() + self.queue_timeout_s
+
+    @contextmanager
+    def slot(self, model: str, priority: int, deadline: float) -> Iterator[None]:
+        """Hold one of `model`'s slots; raise queue_timeout at `deadline` (monotonic)."""
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            queue = self._waiting.setdefault(model, [])
+            heapq.heappush(queue, ticket)
+            while queue[0] != ticket or self._active.get(model, 0) >= self.concurrency:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    queue.remove(ticket)
+                    heapq.heapify(queue)
+                    self.timeouts += 1
+                    # This caller may have been at the head, holding up others.
+                    self._cond.notify_all()
+                    raise AgentCallError(
+                        "queue_timeout", f"No {model} slot free within the queue deadline"
+                    )
+                self._cond.wait(remaining)
+            heapq.heappop(queue)
+            self._active[model] = self._active.get(model, 0) + 1
+            # The next in line may fit too, if more than one slot is free.
+            self._cond.notify_all()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active[model] -= 1
+                self._cond.notify_all()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Queue depth and in-flight calls per model, for /health."""
+        with self._cond:
+            models = sorted(set(self._active) | set(self._waiting))
+            return {
+                "concurrency": self.concurrency,
+                "queued": sum(len(q) for q in self._waiting.values()),
+                "timeouts": self.timeouts,
+                "models": {
+                    m: {"active": self._active.get(m, 0), "queued": len(self._waiting.get(m, ()))}
+                    for m in models
+                },
+            }
@@ -0,0 +1,198 @@
+# agents/vector_index.py
+"""TF-IDF cosine similarity over a growing set of texts, vectorised with NumPy.
+
+`retrieval.LessonIndex` scores in a Python loop, which is fine for the few
+dozen library sections but not for thousands of cached answers. Here the
+documents are a sparse term-major matrix (per term: the rows containing it and
+their weights), so scoring a query is one gather over its terms' postings and
+one `np.bincount`, and a batch of queries is the same two calls with the rows
+offset per query.
+
+Documents arrive one at a time (every new Gemini answer), which a packed matrix
+cannot absorb cheaply. New rows go to a small tail segment that is rebuilt
+when it changes; once the tail reaches `MERGE_AT` rows everything is rebuilt
+into the main segment, with fresh IDF weights and removed rows dropped. The
+tail is scored with the main segment's IDF, so between merges new terms count
+as rare - close enough for nearest-answer lookup.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from collections import Counter
+from itertools import chain
+from typing import Dict, Hashable, List, Optional, Sequence, Set, Tuple
+
+try:
+    import numpy as np
+except Exception:  # pragma: no cover - optional dependency
+    np = None
+
+from .retrieval import tokenize
+
+# Tail rows at which the tail is merged into the main segment.
+MERGE_AT = 256
+
+# Scores per chunk of a batched search (512 KB of float64).
+BLOCK_CELLS = 1 << 16
+
+
+class _Segment:
+    """A run of index rows as a term-major sparse matrix."""
+
+    def __init__(self, rows: Sequence[Optional[Counter]], idf: "np.ndarray"):
+        self.size = len(rows)
+        lengths = np.fromiter((len(c) if c else 0 for c in rows), dtype=np.int64, count=len(rows))
+        total = int(lengths.sum())
+        present = (c for c in rows if c)
+        terms = np.fromiter(chain.from_iterable(c.keys() for c in present), dtype=np.int64, count=total)
+        present = (c for c in rows if c)
+        tf = np.fromiter(chain.from_iterable(c.values() for c in present), dtype=np.float64, count=total)
+        owners = np.repeat(np.arange(self.size, dtype=np.int64), lengths)
+
+        weights = (1.0 + np.log(tf)) * idf[terms]
+        norms = np.sqrt(np.bincount(owners, weights=weights * weights, minlength=self.size))
+        weights /= norms[owners]
+
+        order = np.argsort(terms, kind="stable")
+        self.rows = owners[order]
+        self.weights = weights[order]
+        self.ptr = np.zeros(len(idf) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(idf)), out=self.ptr[1:])
+
+    def scores(self, queries: List[Tuple["np.ndarray", "np.ndarray"]]) -> "np.ndarray":
+        """Cosine scores, shape (len(queries), size), for normalised query vectors."""
+        picks, owners, weights = [], [], []
+        for qi, (ids, qw) in enumerate(queries):
+            known = ids < len(self.ptr) - 1  # terms first seen after this segment
+            ids, qw = ids[known], qw[known]
+            starts, ends = self.ptr[ids], self.ptr[ids + 1]
+            lengths = ends - starts
+            total = int(lengths.sum())
+            if not total:
+                continue
+            # Concatenated ranges starts[i]:ends[i] without a Python loop.
+            idx = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+            picks.append(idx)
+            owners.append(np.full(total, qi * self.size, dtype=np.int64))
+            weights.append(np.repeat(qw, lengths))
+        if not picks:
+            return np.zeros((len(queries), self.size))
+        idx = np.concatenate(picks)
+        flat = np.bincount(
+            np.concatenate(owners) + self.rows[idx],
+            weights=self.weights[idx] * np.concatenate(weights),
+            minlength=len(queries) * self.size,
+        )
+        return flat.reshape(len(queries), self.size)
+
+
+class TfidfIndex:
+    """Keyed texts, searchable by TF-IDF cosine similarity. Thread-safe."""
+
+    def __init__(self):
+        if np is None:
+            raise RuntimeError("numpy is not installed")
+        self._vocab: Dict[str, int] = {}
+        self._rows: List[Optional[Counter]] = []  # term-id counts; None once removed
+        self._keys: List[Hashable] = []
+        self._row_of: Dict[Hashable, int] = {}
+        self._dead: Set[int] = set()  # removed rows still in a segment
+        self._idf = np.zeros(0)
+        self._main: Optional[_Segment] = None
+        self._tail: Optional[_Segment] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def add(self, key: Hashable, text: str) -> None:
+        with self._lock:
+            if key in self._row_of:
+                row = self._row_of.pop(key)
+                self._rows[row] = None
+                self._dead.add(row)
+            counts = Counter(self._vocab.setdefault(t, len(self._vocab)) for t in tokenize(text))
+            self._row_of[key] = len(self._rows)
+            self._rows.append(counts)
+            self._keys.append(key)
+            self._tail = None
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            row = self._row_of.pop(key, None)
+            if row is not None:
+                # Masked out at search time; the row itself goes at the next merge.
+                self._rows[row] = None
+                self._dead.add(row)
+
+    def search(self, queries: Sequence[str], k: int = 1) -> List[List[Tuple[Hashable, float]]]:
+        """Top-`k` (key, cosine) per query, best first; zero-similarity rows omitted."""
+        with self._lock:
+            self._refresh()
+            vectors = [self._vector(q) for q in queries]
+            # Segments are replaced, never mutated, so scoring needs no lock.
+            segments = [seg for seg in (self._main, self._tail) if seg is not None and seg.size]
+            dead = list(self._dead)
+            keys = self._keys
+        size = sum(seg.size for seg in segments)
+        if not size:
+            return [[] for _ in queries]
+
+        # Queries in a chunk share one bincount. On a large index the dense
+        # (queries x rows) output stops fitting in cache and the scatter gets
+        # slower than scoring queries one by one, so chunks are capped.
+        chunk = max(1, BLOCK_CELLS // size)
+        results = []
+        for at in range(0, len(vectors), chunk):
+            part = vectors[at : at + chunk]
+            blocks = [seg.scores(part) for seg in segments]
+            scores = np.hstack(blocks) if len(blocks) > 1 else blocks[0]
+            if dead:
+                scores[:, dead] = 0.0
+            kk = min(k, size)
+            top = np.argpartition(-scores, kk - 1, axis=1)[:, :kk] if size > kk else np.tile(np.arange(size), (len(part), 1))
+            for row, cols in zip(scores, top):
+                cols = cols[np.argsort(-row[cols])]
+                results.append([(keys[i], float(row[i])) for i in cols if row[i] > 0])
+        return results
+
+    def _vector(self, text: str) -> Tuple["np.ndarray", "np.ndarray"]:
+        counts = Counter(self._vocab[t] for t in tokenize(text) if t in self._vocab)
+        if not counts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        ids = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        tf = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        w = (1.0 + np.log(tf)) * self._idf_for(ids)
+        return ids, w / np.sqrt(np.dot(w, w))
+
+    def _idf_for(self, ids: "np.ndarray") -> "np.ndarray":
+        # Terms newer than the last merge have no IDF yet; treat them as rare.
+        rare = math.log((1 + len(self._rows)) / 1.0) + 1.0
+        out = np.full(len(ids), rare)
+        known = ids < len(self._idf)
+        out[known] = self._idf[ids[known]]
+        return out
+
+    def _refresh(self) -> None:
+        main_size = self._main.size if self._main is not None else 0
+        if len(self._rows) - main_size >= MERGE_AT or (self._main is None and self._rows):
+            self._merge()
+        elif self._tail is None and len(self._rows) > main_size:
+            idf = self._idf_for(np.arange(len(self._vocab)))
+            self._tail = _Segment(self._rows[main_size:], idf)
+
+    def _merge(self) -> None:
+        live = [(key, counts) for key, counts in zip(self._keys, self._rows) if counts is not None]
+        self._keys = [key for key, _ in live]
+        self._rows = [counts for _, counts in live]
+        self._row_of = {key: row for row, key in enumerate(self._keys)}
+        self._dead = set()
+        df = np.zeros(len(self._vocab))
+        for counts in self._rows:
+            df[list(counts)] += 1
+        # Smoothed IDF, as scikit-learn computes it.
+        self._idf = np.log((1 + len(self._rows)) / (1 + df)) + 1.0
+        self._main = _Segment(self._rows, self._idf)
+        self._tail = None
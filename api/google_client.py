@@ -2,17 +2,21 @@
 import os
 
 from dotenv import load_dotenv
-from google import genai
 
 from agents.base_agent import resolve_model_id
+from agents.genai_clients import client_for
+
+load_dotenv()
+
 
 def get_gemini_client():
-    """Create a Gemini client using the same environment options as the app.
+    """The process's Gemini client for the same environment options as the app.
 
     Vertex is checked before the API key, matching the coordinator, so a stale
     GEMINI_API_KEY in a developer's .env cannot silently override a deployment.
+    Clients come from the shared registry, so repeated helper calls reuse one
+    connection pool instead of paying a new TLS handshake each time.
     """
-    load_dotenv()
     use_vertex = os.getenv("GOOGLE_GENAI_USE_VERTEXAI", "").lower() in ("1", "true", "yes")
 
     if use_vertex:
@@ -22,11 +26,11 @@ def get_gemini_client():
             raise RuntimeError(
                 "GOOGLE_CLOUD_PROJECT and GOOGLE_CLOUD_LOCATION are required for Vertex AI."
             )
-        return genai.Client(vertexai=True, project=project, location=location)
+        return client_for(vertexai=True, project=project, location=location)
 
     api_key = os.getenv("GEMINI_API_KEY")
     if api_key:
-        return genai.Client(api_key=api_key)
+        return client_for(api_key=api_key)
 
     raise RuntimeError("Set GEMINI_API_KEY or Vertex AI environment variables.")
 
@@ -0,0 +1,147 @@
+"""Cost and latency per agent: one shared profile vs the AGENT_CONFIGS profiles.
+
+Usage:
+    python -m benchmarks.agent_profiles [--live]
+
+"shared" is every agent on GEMINI_MODEL with no output cap and the model's
+own (dynamic) thinking, which is how all five agents used to run. "profile"
+is each agent with its AGENT_CONFIGS profile applied. Both use the agents'
+current answer modes, so only the profile differs.
+
+By default this is an estimate. Prompt tokens are counted from the real
+system instructions and the facts the coordinator would send, at ~4 chars per
+token. Answer and thinking lengths, prices and model speeds are the
+assumptions in the tables below, so read the ratios rather than the absolute
+numbers. With --live and Gemini credentials, it instead makes one real call
+per agent and profile and reports the token counts and wall time the API
+returned. Each call spends quota.
+"""
+
+import argparse
+import time
+
+from agents.base_agent import resolve_model_id, supports_thinking
+from agents.coordinator import LearningCoachCoordinator
+from config.settings import AGENT_CONFIGS
+
+SAMPLES = {
+    "assessment": "hi! I've written a little JavaScript but I'm new to Python",
+    "curriculum": "what should I learn next?",
+    "teaching": "explain loops",
+    "practice": "give me an exercise on lists",
+    "progress": "how am I doing?",
+}
+
+# USD per 1M tokens (input, output including thinking), paid tier.
+PRICES = {
+    "gemini-2.5-pro": (1.25, 10.00),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+}
+# Seconds to first token, output tokens per second.
+SPEED = {
+    "gemini-2.5-pro": (1.5, 90),
+    "gemini-2.5-flash": (0.6, 200),
+    "gemini-2.5-flash-lite": (0.35, 350),
+    "gemini-2.0-flash-lite": (0.3, 350),
+}
+# Answer tokens each agent writes when nothing caps it, and thinking tokens
+# the 2.5 Flash/Pro models spend when left to decide (flash-lite does not
+# think unless asked).
+TYPICAL_ANSWER = {"assessment": 350, "curriculum": 700, "teaching": 900, "practice": 600, "progress": 300}
+DYNAMIC_THINKING = 800
+CHARS_PER_TOKEN = 4
+
+
+def prompt_for(coord, agent, name):
+    """The message (with facts, if any) and round trips the coordinator would use."""
+    message = SAMPLES[name]
+    context = coord.get_user_context("profile_bench")
+    mode = AGENT_CONFIGS[name].get("answer_mode", "model")
+    facts = None
+    if mode == "resolved":
+        facts = coord._pre_resolve(agent, name, message, context)
+    elif mode in ("hybrid", "local"):
+        facts = coord._local_fallback(name, message, "profile_bench", context)
+    return message, facts, 1 if facts else 2
+
+
+def estimate(agent, name, message, facts, trips):
+    model = agent.model_id
+    thinks = supports_thinking(model) and not model.endswith("-lite")
+    thinking = DYNAMIC_THINKING if thinks and agent.thinking_budget is None else 0
+    if agent.thinking_budget and supports_thinking(model):
+        thinking = min(DYNAMIC_THINKING, agent.thinking_budget)
+    answer = min(TYPICAL_ANSWER[name], agent.max_output_tokens or TYPICAL_ANSWER[name])
+    prompt_chars = len(agent.system_instruction) + len(message) + len(facts or "")
+    # A tool round trip resends the prompt plus the tool result.
+    prompt = trips * prompt_chars // CHARS_PER_TOKEN
+    price_in, price_out = PRICES.get(model, PRICES["gemini-2.5-flash"])
+    ttft, tps = SPEED.get(model, SPEED["gemini-2.5-flash"])
+    cost = (prompt * price_in + (answer + thinking) * price_out) / 1e6
+    return model, prompt, answer + thinking, cost, trips * ttft + (answer + thinking) / tps
+
+
+def live(agent, name, message, facts):
+    started = time.perf_counter()
+    agent.query(message, facts=facts)
+    elapsed = time.perf_counter() - started
+    usage = agent.last_usage
+    prompt = getattr(usage, "prompt_token_count", 0) or 0
+    output = (getattr(usage, "candidates_token_count", 0) or 0) + (getattr(usage, "thoughts_token_count", 0) or 0)
+    price_in, price_out = PRICES.get(agent.last_model_used, PRICES["gemini-2.5-flash"])
+    return agent.last_model_used, prompt, output, (prompt * price_in + output * price_out) / 1e6, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--live", action="store_true", help="make real calls (spends quota)")
+    args = parser.parse_args()
+
+    coord = LearningCoachCoordinator()
+    coord.initialize_agents()
+    if args.live and coord.mode == "local":
+        raise SystemExit("--live needs GEMINI_API_KEY or Vertex AI credentials")
+    factories = {name: type(agent) for name, agent in coord.agents.items() if agent is not None}
+    if not factories:
+        from agents.assessment_agent import GenAIAssessmentAgent
+        from agents.curriculum_agent import GenAICurriculumAgent
+        from agents.practice_agent import GenAIPracticeAgent
+        from agents.progress_agent import GenAIProgressAgent
+        from agents.teaching_agent import GenAITeachingAgent
+
+        factories = {
+            "assessment": GenAIAssessmentAgent,
+            "curriculum": GenAICurriculumAgent,
+            "teaching": GenAITeachingAgent,
+            "practice": GenAIPracticeAgent,
+            "progress": GenAIProgressAgent,
+        }
+
+    print(f"{'agent':<11} {'profile':<8} {'model':<22} {'in tok':>7} {'out tok':>8} {'$/1k req':>9} {'latency':>8}")
+    totals = {"shared": 0.0, "profile": 0.0}
+    for name, cls in factories.items():
+        for label in ("shared", "profile"):
+            agent = cls(coord.client, resolve_model_id())
+            if label == "profile":
+                agent.configure(AGENT_CONFIGS[name])
+            message, facts, trips = prompt_for(coord, agent, name)
+            if args.live:
+                row = live(agent, name, message, facts)
+            else:
+                row = estimate(agent, name, message, facts, trips)
+            model, prompt, output, cost, seconds = row
+            totals[label] += cost
+            print(
+                f"{name:<11} {label:<8} {model:<22} {prompt:>7} {output:>8} "
+                f"{cost * 1000:>9.3f} {seconds:>7.1f}s"
+            )
+    print(
+        f"\nOne request to each agent, per 1k: shared ${totals['shared'] * 1000:.2f}, "
+        f"profiles ${totals['profile'] * 1000:.2f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
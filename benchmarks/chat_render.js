@@ -0,0 +1,297 @@
+/*
+Per-message cost of the chat log in static/app.js, over a long session.
+
+Usage:
+    node benchmarks/chat_render.js [--messages 1000]
+    NODE_PATH=$(npm root -g) node benchmarks/chat_render.js   # jsdom, if installed
+
+No browser needed. The real static/app.js runs against templates/index.html
+in a DOM without a browser: jsdom when it can be required, otherwise the small
+DOM defined below. Either way this measures the script side of adding a
+message: building and moving nodes, and serializing history. Layout and paint
+are not measured; they scale with the same row counts, and rows outside the
+viewport skip them (`content-visibility: auto`).
+
+"rebuild" is the old `addMessage`, reproduced here for comparison: push, write
+the last 100 messages to localStorage, clear the log and rebuild every row.
+"incremental" is the current one: append one row, keep RENDER_WINDOW rows and
+queue the message for the next batched write. Neither DOM has IndexedDB, so
+the batch goes to the localStorage fallback. That is timed separately as
+"save", once per batch, since it runs after the message is on screen.
+*/
+"use strict";
+
+const fs = require("fs");
+const path = require("path");
+const vm = require("vm");
+const { performance } = require("perf_hooks");
+
+const ROOT = path.join(__dirname, "..");
+const PAGE = fs.readFileSync(path.join(ROOT, "templates", "index.html"), "utf8");
+const APP = fs.readFileSync(path.join(ROOT, "static", "app.js"), "utf8");
+
+const QUESTION = "Can you explain how a for loop works with a list?";
+const ANSWER =
+  "A for loop visits each item in a list in turn and runs its body once per item. ".repeat(8) +
+  "\n\n```python\nfor name in names:\n    print(name)\n```\n\n" +
+  "Try changing the list and predicting the output before you run it. ".repeat(4);
+
+const REBUILD = `
+function addMessage(role, text, meta = "") {
+  state.history.push({ role, text, meta });
+  localStorage.setItem(storageKey(), JSON.stringify(state.history.slice(-100)));
+  els.chatLog.innerHTML = "";
+  for (const item of state.history) {
+    const row = document.createElement("div");
+    row.className = \`message-row \${item.role}\`;
+    const bubble = document.createElement("div");
+    bubble.className = "message";
+    bubble.textContent = item.text;
+    if (item.meta) {
+      const meta = document.createElement("div");
+      meta.className = "message-meta";
+      meta.textContent = item.meta;
+      bubble.appendChild(meta);
+    }
+    row.appendChild(bubble);
+    els.chatLog.appendChild(row);
+  }
+  els.chatLog.scrollTop = els.chatLog.scrollHeight;
+}
+`;
+
+// ---- A small DOM: just what app.js touches ---------------------------------
+
+class Node {
+  constructor(doc, tagName) {
+    this.ownerDocument = doc;
+    this.tagName = tagName;
+    this.childNodes = [];
+    this.parentNode = null;
+    this.className = "";
+    this.dataset = {};
+    this.value = "";
+    this.disabled = false;
+    this.scrollTop = 0;
+    this.classList = { toggle() {}, add() {}, remove() {} };
+    doc.created += 1;
+  }
+
+  get firstChild() {
+    return this.childNodes[0] || null;
+  }
+
+  get nextSibling() {
+    if (!this.parentNode) {
+      return null;
+    }
+    const siblings = this.parentNode.childNodes;
+    return siblings[siblings.indexOf(this) + 1] || null;
+  }
+
+  get isConnected() {
+    return this.parentNode !== null;
+  }
+
+  get scrollHeight() {
+    return this.childNodes.length * 96;
+  }
+
+  get textContent() {
+    return this.childNodes.map((child) => child.textContent).join("");
+  }
+
+  set textContent(text) {
+    this.replaceChildren({ textContent: String(text), parentNode: this });
+  }
+
+  set innerHTML(html) {
+    this.replaceChildren();
+  }
+
+  _adopt(nodes) {
+    const flat = [];
+    for (const node of nodes) {
+      if (node.tagName === "#fragment") {
+        flat.push(...node.childNodes.splice(0));
+      } else {
+        if (node.parentNode && node.parentNode.childNodes) {
+          node.parentNode.removeChild(node);
+        }
+        flat.push(node);
+      }
+    }
+    flat.forEach((node) => (node.parentNode = this));
+    return flat;
+  }
+
+  appendChild(node) {
+    this.childNodes.push(...this._adopt([node]));
+    return node;
+  }
+
+  insertBefore(node, reference) {
+    const adopted = this._adopt([node]);
+    const at = reference ? this.childNodes.indexOf(reference) : this.childNodes.length;
+    this.childNodes.splice(at, 0, ...adopted);
+    return node;
+  }
+
+  removeChild(node) {
+    this.childNodes.splice(this.childNodes.indexOf(node), 1);
+    node.parentNode = null;
+    return node;
+  }
+
+  remove() {
+    if (this.parentNode) {
+      this.parentNode.removeChild(this);
+    }
+  }
+
+  replaceChildren(...nodes) {
+    this.childNodes.forEach((child) => (child.parentNode = null));
+    this.childNodes = this._adopt(nodes);
+  }
+
+  addEventListener() {}
+}
+
+function smallDom() {
+  const doc = { created: 0, visibilityState: "visible" };
+  const byId = {};
+  for (const [, id] of PAGE.matchAll(/id="([\w-]+)"/g)) {
+    byId[id] = new Node(doc, "div");
+  }
+  byId.userId.value = "bench";
+  Object.assign(doc, {
+    getElementById: (id) => byId[id] || null,
+    createElement: (tag) => new Node(doc, tag),
+    createDocumentFragment: () => new Node(doc, "#fragment"),
+    querySelectorAll: () => [],
+    addEventListener() {},
+  });
+  const store = new Map();
+  const localStorage = {
+    getItem: (key) => (store.has(key) ? store.get(key) : null),
+    setItem: (key, value) => store.set(key, String(value)),
+    removeItem: (key) => store.delete(key),
+  };
+  const window = { document: doc, localStorage };
+  return { window, document: doc, count: () => doc.created };
+}
+
+function jsdomOrNull() {
+  try {
+    const { JSDOM } = require("jsdom");
+    const dom = new JSDOM(PAGE, { url: "http://localhost/", runScripts: "outside-only" });
+    dom.window.document.getElementById("userId").value = "bench";
+    return { window: dom.window, document: dom.window.document, count: () => NaN };
+  } catch {
+    return null;
+  }
+}
+
+// ---- Harness ---------------------------------------------------------------
+
+async function fetchStub(url) {
+  const body = url.startsWith("/context") ? { context: {} } : { mode: "local", model: null };
+  return { ok: true, status: 200, json: async () => body };
+}
+
+async function loadApp(useJsdom, extra = "") {
+  const dom = (useJsdom && jsdomOrNull()) || smallDom();
+  const { window } = dom;
+  const context = vm.createContext({
+    window,
+    document: dom.document,
+    localStorage: window.localStorage,
+    fetch: fetchStub,
+    console: { warn() {}, log: console.log },
+    setTimeout: () => 0, // the benchmark flushes the batch itself
+    clearTimeout: () => {},
+    Promise,
+    Map,
+    Set,
+  });
+  vm.runInContext(APP + extra, context);
+  for (let i = 0; i < 5; i += 1) {
+    await new Promise((resolve) => setImmediate(resolve)); // initial loads
+  }
+  return { ...dom, context };
+}
+
+function mean(values) {
+  return values.reduce((a, b) => a + b, 0) / values.length;
+}
+
+function p95(values) {
+  return [...values].sort((a, b) => a - b)[Math.floor(values.length * 0.95)];
+}
+
+async function run(label, useJsdom, messages) {
+  const { context, count } = await loadApp(useJsdom, label === "rebuild" ? REBUILD : "");
+  const add = vm.runInContext("addMessage", context);
+  const flush = vm.runInContext("typeof flushHistory === 'function' ? flushHistory : null", context);
+  const timings = [];
+  const nodes = [];
+  let save = 0;
+  let batches = 0;
+  for (let i = 0; i < messages; i += 1) {
+    const before = count();
+    const started = performance.now();
+    if (i % 2) {
+      add("coach", ANSWER, "teaching - gemini - gemini-2.5-flash");
+    } else {
+      add("user", QUESTION, "You");
+    }
+    timings.push(performance.now() - started);
+    nodes.push(count() - before);
+    // One batch per question and answer pair, as a real session sends them.
+    if (flush && i % 2) {
+      const saveStarted = performance.now();
+      await flush();
+      save += performance.now() - saveStarted;
+      batches += 1;
+    }
+  }
+  const rows = vm.runInContext("els.chatLog.childNodes.length", context);
+  return { label, timings, nodes, rows, save: batches ? save / batches : null };
+}
+
+async function main() {
+  const at = process.argv.indexOf("--messages");
+  const messages = at > 0 ? Number(process.argv[at + 1]) : 1000;
+  const useJsdom = jsdomOrNull() !== null;
+  console.log(`${messages} messages; DOM: ${useJsdom ? "jsdom" : "built-in (jsdom not found)"}\n`);
+
+  const results = [await run("rebuild", useJsdom, messages), await run("incremental", useJsdom, messages)];
+  const buckets = [
+    [0, 100],
+    [messages / 2 - 100, messages / 2],
+    [messages - 100, messages],
+  ];
+  console.log(
+    `${"run".padEnd(12)} ${"messages".padStart(11)} ${"mean".padStart(9)} ${"p95".padStart(9)} ` +
+      `${"nodes/msg".padStart(10)} ${"rows".padStart(6)}`
+  );
+  for (const result of results) {
+    for (const [lo, hi] of buckets) {
+      const slice = result.timings.slice(lo, hi);
+      const nodes = mean(result.nodes.slice(lo, hi));
+      console.log(
+        `${result.label.padEnd(12)} ${`${lo + 1}-${hi}`.padStart(11)} ` +
+          `${mean(slice).toFixed(3).padStart(7)}ms ${p95(slice).toFixed(3).padStart(7)}ms ` +
+          `${(Number.isNaN(nodes) ? "-" : nodes.toFixed(0)).padStart(10)} ${String(result.rows).padStart(6)}`
+      );
+    }
+  }
+  const [rebuild, incremental] = results;
+  console.log(
+    `\nAt ${messages} messages: ${mean(rebuild.timings.slice(-100)).toFixed(3)}ms -> ` +
+      `${mean(incremental.timings.slice(-100)).toFixed(3)}ms per message; ` +
+      `batched save ${incremental.save.toFixed(3)}ms per question and answer`
+  );
+}
+
+main();
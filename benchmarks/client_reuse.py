@@ -0,0 +1,147 @@
+"""Per-call overhead of a fresh genai client vs the process-wide one.
+
+Usage:
+    python -m benchmarks.client_reuse [--calls 50]
+
+A local HTTPS server with a self-signed certificate stands in for the API
+and answers every `generate_content` at once, so the time measured is all
+client-side: building the client, the TCP connect and TLS handshake, and
+the request itself. It counts the connections it accepts.
+
+"fresh" is what `api/google_client.generate_content` did before: load `.env`,
+build a `genai.Client`, make one call. "registry" makes every call on one
+client configured by `agents.genai_clients.http_options()`, as both the
+coordinator and `api/google_client` now do. On localhost a handshake costs
+well under a millisecond. Over the internet each new connection also costs
+its round trips to Google (TCP plus TLS 1.3: two), which this cannot show;
+multiply the connection count by your RTT.
+"""
+
+import argparse
+import datetime
+import http.server
+import ipaddress
+import json
+import os
+import socket
+import ssl
+import statistics
+import tempfile
+import threading
+import time
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+from dotenv import load_dotenv
+
+ANSWER = json.dumps(
+    {"candidates": [{"content": {"role": "model", "parts": [{"text": "Hi!"}]}, "finishReason": "STOP"}]}
+).encode()
+
+
+def self_signed(folder):
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=1))
+        .not_valid_after(now + datetime.timedelta(hours=1))
+        .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), True)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path, key_path = os.path.join(folder, "cert.pem"), os.path.join(folder, "key.pem")
+    with open(cert_path, "wb") as fh:
+        fh.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as fh:
+        fh.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                   serialization.NoEncryption()))
+    return cert_path, key_path
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(ANSWER)))
+        self.end_headers()
+        self.wfile.write(ANSWER)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    accepted = 0
+
+    def get_request(self):
+        self.accepted += 1
+        sock, address = super().get_request()
+        # headers and body go out as two writes; without this, delayed ACKs
+        # add ~40ms to every call and hide everything else
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock, address
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        cert, key = self_signed(folder)
+        os.environ["SSL_CERT_FILE"] = cert  # the SDK trusts this bundle
+        server = Server(("127.0.0.1", 0), Handler)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"https://127.0.0.1:{server.server_port}/"
+
+        from google import genai
+        from google.genai import types
+
+        from agents import genai_clients
+
+        def fresh():
+            load_dotenv()
+            client = genai.Client(api_key="benchmark", http_options=types.HttpOptions(base_url=base_url))
+            return client.models.generate_content(model="gemini-2.5-flash", contents="hi")
+
+        options = genai_clients.http_options()
+        options.base_url = base_url
+        shared = genai.Client(api_key="benchmark", http_options=options)
+
+        def registry():
+            return shared.models.generate_content(model="gemini-2.5-flash", contents="hi")
+
+        print(f"{'client':<9} {'calls':>6} {'mean':>9} {'p95':>9} {'connections':>12}")
+        for label, call in (("fresh", fresh), ("registry", registry)):
+            call()  # warm imports and the first connection
+            server.accepted = 0
+            timings = []
+            for _ in range(args.calls):
+                started = time.perf_counter()
+                call()
+                timings.append((time.perf_counter() - started) * 1e3)
+            timings.sort()
+            print(
+                f"{label:<9} {args.calls:>6} {statistics.mean(timings):>7.2f}ms "
+                f"{timings[int(len(timings) * 0.95) - 1]:>7.2f}ms {server.accepted:>12}"
+            )
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
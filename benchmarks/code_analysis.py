@@ -0,0 +1,74 @@
+"""Time to assess a pasted code sample, up to the MAX_MESSAGE_CHARS cap.
+
+Usage:
+    python -m benchmarks.code_analysis [--repeat 200]
+
+"substring" is the old `assess_with_code_sample`: 16 substring scans of the
+lowercased paste, reproduced here for comparison. "ast" is one parse plus
+one tree walk, and "cached" is the same paste analysed again. Samples are
+whole copies of a small realistic function up to each size. The last row
+is the largest cut mid-line, which does not parse and takes the tokenizer
+fallback.
+"""
+
+import argparse
+import time
+
+from agents.code_analysis import analyze_code
+from config.settings import MAX_MESSAGE_CHARS
+
+UNIT = '''def average(scores):
+    """Mean of the non-negative scores."""
+    total = 0
+    count = 0
+    for s in scores:
+        if s >= 0 and s <= 100:
+            total += s
+            count += 1
+    return total / count if count else 0.0
+
+'''
+
+INDICATORS = (
+    ["def __", "async def", "yield", "@", "metaclass", "lambda"],
+    ["def ", "class ", "import ", "return", "self.", "for ", "while "],
+    ["print(", "input(", "if ", "else:", "="],
+)
+
+
+def substring(code):
+    low = code.lower()
+    return [sum(1 for ind in group if ind in low) for group in INDICATORS]
+
+
+def timed(fn, code, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(code)
+    return (time.perf_counter() - started) / repeat * 1e3
+
+
+def cold(code):
+    analyze_code.cache_clear()
+    return analyze_code(code)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'chars':>6} {'parsed':>7} {'substring':>10} {'ast':>9} {'cached':>9}")
+    samples = [UNIT * max(1, size // len(UNIT)) for size in (250, 1000, 2000, MAX_MESSAGE_CHARS)]
+    samples.append((UNIT * (MAX_MESSAGE_CHARS // len(UNIT) + 1))[:MAX_MESSAGE_CHARS])
+    for code in samples:
+        cold_ms = timed(cold, code, args.repeat)
+        cached_ms = timed(analyze_code, code, args.repeat)
+        print(
+            f"{len(code):>6} {str(analyze_code(code).parsed):>7} {timed(substring, code, args.repeat):>8.3f}ms "
+            f"{cold_ms:>7.3f}ms {cached_ms:>7.4f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Learners one instance can serve at once: gunicorn threads vs the ASGI mode.
+
+Usage:
+    python -m benchmarks.concurrent_learners [--latency-ms 1000] [--learners 32,128,256,512]
+
+Runs the real app (main.py) in live mode against the real google-genai SDK,
+with a fake transport in place of the API that answers every call after
+--latency-ms. Every learner sends one `/chat` turn ("Explain loops", one
+model round trip) at the same moment.
+
+"gunicorn" is the container's default: 32 threads, each running a request
+through Flask's WSGI app to the end, so request 33 waits for a free thread
+(as it would in gunicorn's backlog). "asgi" sends the same requests to
+`main:asgi_app` as ASGI messages on one event loop, as uvicorn would, with
+ASGI_CALL_THREADS threads for the blocking model calls. Sockets are left
+out on both sides; this measures how many turns overlap, not HTTP parsing.
+
+MODEL_CONCURRENCY is raised to the learner count for both, so the scheduler
+is not what limits them. In production it still caps calls per model, for
+quota; raise it along with ASGI_CALL_THREADS to use this capacity.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+GUNICORN_THREADS = 32
+
+
+class FakeTransport:
+    """Stands in for the HTTP layer under `client.models.generate_content`."""
+
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+        self.in_flight = 0
+        self.peak = 0
+        self.peak_threads = 0
+        self._lock = threading.Lock()
+
+    def request(self, method, path, request_dict, http_options=None):
+        from google.genai import types
+
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+        try:
+            time.sleep(self.latency_s)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        part = {"text": "A for loop runs its body once for each item in a sequence."}
+        body = {"candidates": [{"content": {"role": "model", "parts": [part]}, "finishReason": "STOP"}]}
+        return types.HttpResponse(headers={}, body=json.dumps(body))
+
+
+def turn(n):
+    return json.dumps({"message": "Explain loops", "user_id": f"learner-{n}"}).encode()
+
+
+def run_gunicorn(app, learners):
+    client = app.test_client()
+    started = time.perf_counter()
+
+    def one(n):
+        response = client.post("/chat", data=turn(n), content_type="application/json")
+        return response.status_code, time.perf_counter() - started
+
+    with ThreadPoolExecutor(GUNICORN_THREADS) as pool:
+        return list(pool.map(one, range(learners)))
+
+
+async def asgi_request(asgi_app, body, started):
+    inbox = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return inbox.pop() if inbox else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/chat", "query_string": b"",
+             "headers": [(b"content-type", b"application/json")]}
+    await asgi_app(scope, receive, send)
+    return sent[0]["status"], time.perf_counter() - started
+
+
+def run_asgi(asgi_app, learners):
+    async def everyone():
+        started = time.perf_counter()
+        return await asyncio.gather(*(asgi_request(asgi_app, turn(n), started) for n in range(learners)))
+
+    return asyncio.run(everyone())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency-ms", type=float, default=1000)
+    parser.add_argument("--learners", default="32,128,256,512")
+    args = parser.parse_args()
+    counts = [int(n) for n in args.learners.split(",")]
+
+    os.environ.pop("LOCAL_ONLY", None)
+    os.environ.pop("GOOGLE_GENAI_USE_VERTEXAI", None)
+    os.environ["GEMINI_API_KEY"] = "benchmark"
+    os.environ["MODEL_CONCURRENCY"] = str(max(counts))
+    os.environ["QUEUE_TIMEOUT_S"] = "600"
+    os.environ["COMPRESS_RESPONSES"] = "false"
+    import main as service  # reads the environment above
+
+    transport = FakeTransport(args.latency_ms / 1000)
+    service.coordinator.client._api_client.request = transport.request
+
+    print(f"Model latency {args.latency_ms:.0f}ms; gunicorn threads {GUNICORN_THREADS}, "
+          f"ASGI call threads {service.settings.ASGI_CALL_THREADS}\n")
+    print(f"{'mode':<9} {'learners':>8} {'ok':>5} {'wall':>8} {'turns/s':>8} {'p50':>8} {'p95':>8} "
+          f"{'peak calls':>11} {'threads':>8}")
+    for learners in counts:
+        for mode in ("gunicorn", "asgi"):
+            transport.peak = transport.peak_threads = 0
+            for n in range(learners):
+                service.coordinator.reset_user_context(f"learner-{n}")
+            started = time.perf_counter()
+            if mode == "gunicorn":
+                results = run_gunicorn(service.app, learners)
+            else:
+                results = run_asgi(service.asgi_app, learners)
+            wall = time.perf_counter() - started
+            latencies = sorted(seconds for _, seconds in results)
+            ok = sum(1 for status, _ in results if status == 200)
+            print(
+                f"{mode:<9} {learners:>8} {ok:>5} {wall:>7.2f}s {learners / wall:>8.1f} "
+                f"{statistics.median(latencies):>7.2f}s {latencies[int(len(latencies) * 0.95) - 1]:>7.2f}s "
+                f"{transport.peak:>11} {transport.peak_threads:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Worker memory held by learner contexts: plain dicts vs the compact classes.
+
+Usage:
+    python -m benchmarks.context_memory [--learners 10000] [--turns 50]
+
+Each synthetic learner is serialised to JSON and read back, the way a context
+arrives from Firestore: every document brings its own copies of its strings.
+The same documents are then held once as plain dicts (the old in-memory shape)
+and once as `LearnerContext` objects, and tracemalloc reports what each costs.
+"""
+
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+
+from agents.learner_context import LearnerContext
+
+AGENTS = ["assessment", "curriculum", "teaching", "practice", "progress"]
+TOPICS = ["variables", "loops", "lists", "functions", "dictionaries", "classes"]
+
+
+def synthetic_document(rng: random.Random, turns: int) -> str:
+    history = []
+    for i in range(turns):
+        agent = rng.choice(AGENTS)
+        if i % 2 == 0:
+            text = f"explain {rng.choice(TOPICS)} please, example {rng.randrange(10**6)}"
+            history.append({"role": "user", "text": text, "agent": agent, "at": 1.7e9 + i})
+        else:
+            body = " ".join(rng.choice(TOPICS) for _ in range(rng.randint(40, 200)))
+            history.append({"role": "coach", "text": body, "agent": agent, "at": 1.7e9 + i})
+    return json.dumps(
+        {
+            "skill_level": rng.choice(["beginner", "intermediate", "advanced"]),
+            "learning_style": "adaptive",
+            "last_agent": rng.choice(AGENTS),
+            "last_topic": rng.choice(TOPICS),
+            "last_response_source": "gemini",
+            "last_model": "gemini-2.5-flash",
+            "history": history,
+            "progress": {
+                "topics_learned": rng.sample(TOPICS, 3),
+                "exercises_delivered": rng.randrange(10),
+                "exercises_completed": rng.randrange(5),
+                "interactions": turns // 2,
+            },
+        }
+    )
+
+
+def measure(documents, build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    held = [build(json.loads(doc)) for doc in documents]
+    gc.collect()
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+    return current
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--learners", type=int, default=10_000)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    documents = [synthetic_document(rng, args.turns) for _ in range(args.learners)]
+
+    as_dicts = measure(documents, lambda d: d)
+    compact = measure(documents, LearnerContext.from_dict)
+
+    print(f"{args.learners} learners x {args.turns} turns")
+    for label, total in (("dict contexts", as_dicts), ("LearnerContext", compact)):
+        print(f"  {label:<15} {total / 2**20:8.1f} MiB  {total / args.learners:9.0f} B/learner")
+    print(f"  saved           {(as_dicts - compact) / 2**20:8.1f} MiB  ({1 - compact / as_dicts:.0%})")
+
+
+if __name__ == "__main__":
+    main()
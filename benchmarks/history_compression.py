@@ -0,0 +1,185 @@
+"""Bytes per learner with history text stored plain vs compressed.
+
+Usage:
+    python -m benchmarks.history_compression [--learners 2000] [--turns 50] [--held-out loops,classes]
+
+Coach replies are synthesised in the shape Gemini answers take - an opener,
+the lesson explanation, a fenced example, an analogy, a practice task - from
+the built-in lesson library, with varied phrasing and learner-specific
+numbers.
+
+The shipped dictionary was trained on sessions over that same library, so
+the first figures are in-sample: they show the codec's costs, not how well
+the dictionary generalises. For that, the held-out section trains a
+dictionary the same way without the `--held-out` lessons and compresses
+replies about only those, next to plain deflate. Neither is a measurement on
+real model output, which has not been made; export replies from Firestore
+and pass them to the trainer with `--corpus` to get one.
+
+Reports the history text payload written to Firestore, the worker memory
+held by `LearnerContext` objects (tracemalloc), the cost of reading back the
+turns one model call replays, and the held-out ratios.
+"""
+
+import argparse
+import gc
+import importlib.util
+import json
+import random
+import time
+import tracemalloc
+import zlib
+from pathlib import Path
+
+from agents import text_codec
+from agents.base_agent import build_contents
+from agents.learner_context import LearnerContext
+from agents.practice_agent import PRACTICE_EXERCISES
+from agents.teaching_agent import TEACHING_MATERIALS
+
+AGENTS = ["teaching", "practice", "assessment", "progress"]
+OPENERS = [
+    "Great question! Let's look at {topic}.",
+    "Sure - here's {topic} explained step by step.",
+    "Good thinking. {topic} trips a lot of people up at first.",
+    "Let's break {topic} down with a small example.",
+    "You're making good progress! Now for {topic}.",
+]
+CLOSERS = [
+    "Try it yourself and tell me what you get.",
+    "Want me to go over that again with a different example?",
+    "Once that works, try changing the values and see what happens.",
+    "When you're ready, ask me for a practice exercise on {topic}.",
+]
+QUESTIONS = [
+    "explain {topic}",
+    "can you explain {topic} again but simpler",
+    "I don't get {topic}",
+    "give me a practice exercise on {topic}",
+    "what is the difference between {topic} and {other}?",
+]
+
+
+def coach_reply(rng: random.Random, topic: str) -> str:
+    lesson = TEACHING_MATERIALS[topic]
+    exercise = rng.choice(list(PRACTICE_EXERCISES.get(topic, PRACTICE_EXERCISES["variables"]).values()))
+    parts = [
+        rng.choice(OPENERS).format(topic=topic),
+        lesson["explanation"],
+        f"**Analogy:** {lesson['analogy']}",
+        "```python\n" + rng.choice(lesson["examples"]) + "\n```",
+        "**Common mistakes:**\n" + "\n".join(f"- {m}" for m in lesson["common_mistakes"]),
+        f"**Practice ({rng.randint(5, 30)} minutes):** {exercise['problem']}",
+        "Hints:\n" + "\n".join(f"- {h}" for h in exercise["hints"]),
+        rng.choice(CLOSERS).format(topic=topic),
+    ]
+    return "\n\n".join(parts[: rng.randint(4, len(parts))])
+
+
+def synthetic_document(rng: random.Random, turns: int) -> str:
+    topics = list(TEACHING_MATERIALS)
+    history = []
+    for i in range(turns):
+        topic = rng.choice(topics)
+        agent = rng.choice(AGENTS)
+        if i % 2 == 0:
+            text = rng.choice(QUESTIONS).format(topic=topic, other=rng.choice(topics))
+            history.append({"role": "user", "text": text, "agent": agent, "at": 1.7e9 + i})
+        else:
+            history.append({"role": "coach", "text": coach_reply(rng, topic), "agent": agent, "at": 1.7e9 + i})
+    return json.dumps({"skill_level": "beginner", "learning_style": "adaptive", "history": history})
+
+
+def stored_text_bytes(context: LearnerContext) -> int:
+    total = 0
+    for turn in context.to_dict()["history"]:
+        value = turn.get("z", turn.get("text", ""))
+        total += len(value) if isinstance(value, bytes) else len(value.encode("utf-8"))
+    return total
+
+
+def build(documents):
+    gc.collect()
+    tracemalloc.start()
+    held = [LearnerContext.from_dict(json.loads(doc)) for doc in documents]
+    gc.collect()
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return held, current
+
+
+def load_trainer():
+    """tools/train_history_dictionary.py, which is a script, not a package module."""
+    path = Path(__file__).resolve().parent.parent / "tools" / "train_history_dictionary.py"
+    spec = importlib.util.spec_from_file_location("train_history_dictionary", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def deflated(texts, zdict=None) -> int:
+    """Raw deflate bytes for `texts`, each compressed on its own as a turn is."""
+    total = 0
+    for text in texts:
+        packer = zlib.compressobj(6, zlib.DEFLATED, -15, **({"zdict": zdict} if zdict else {}))
+        total += len(packer.compress(text.encode("utf-8")) + packer.flush())
+    return total
+
+
+def held_out(rng: random.Random, held: list, samples: int) -> None:
+    trainer = load_trainer()
+    seen = [topic for topic in TEACHING_MATERIALS if topic not in held]
+    dictionary = trainer.train(trainer.builtin_corpus(seen), 16 * 1024)
+    replies = [coach_reply(rng, rng.choice(held)) for _ in range(samples)]
+    raw = sum(len(text.encode("utf-8")) for text in replies)
+    print(f"held out: {', '.join(held)} ({samples} replies, dictionary trained on {', '.join(seen)})")
+    print(f"  plain deflate          {1 - deflated(replies) / raw:.0%} smaller")
+    print(f"  held-out dictionary    {1 - deflated(replies, dictionary) / raw:.0%} smaller")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--learners", type=int, default=2_000)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--held-out", default="loops,classes")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    documents = [synthetic_document(rng, args.turns) for _ in range(args.learners)]
+
+    threshold = text_codec.MIN_CHARS
+    text_codec.MIN_CHARS = 0
+    plain, plain_mem = build(documents)
+    plain_bytes = sum(stored_text_bytes(c) for c in plain)
+    del plain
+
+    text_codec.MIN_CHARS = threshold
+    packed, packed_mem = build(documents)
+    packed_bytes = sum(stored_text_bytes(c) for c in packed)
+
+    # Outside tracemalloc, which slows allocation-heavy code severalfold.
+    started = time.perf_counter()
+    for doc in documents:
+        LearnerContext.from_dict(json.loads(doc))
+    load_s = time.perf_counter() - started
+
+    # What one model call pays: build_contents over the replayed window.
+    started = time.perf_counter()
+    for context in packed:
+        build_contents("next question", context["history"][-16:])
+    replay_s = time.perf_counter() - started
+
+    n = args.learners
+    print(f"{n} learners x {args.turns} turns (compress >= {threshold} chars, dictionary v{text_codec.CURRENT_VERSION}, in-sample)")
+    print(f"  stored text     plain {plain_bytes / n:9.0f} B/learner   compressed {packed_bytes / n:9.0f} B/learner"
+          f"   ({1 - packed_bytes / plain_bytes:.0%} smaller)")
+    print(f"  worker memory   plain {plain_mem / n:9.0f} B/learner   compressed {packed_mem / n:9.0f} B/learner"
+          f"   ({1 - packed_mem / plain_mem:.0%} smaller)")
+    print(f"  load            {load_s / n * 1e3:.2f} ms/learner (JSON parse + compressing {args.turns} plain turns)")
+    print(f"  replay 16 turns {replay_s / n * 1e3:.3f} ms/call")
+    held_out(rng, args.held_out.split(","), 1000)
+
+
+if __name__ == "__main__":
+    main()
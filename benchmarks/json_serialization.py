@@ -0,0 +1,125 @@
+"""Cost of turning a response body into bytes: Flask's default provider vs orjson.
+
+Usage:
+    python -m benchmarks.json_serialization [--repeat 5000]
+
+Each payload is built the way main.py builds it: `_chat_payload` fields, with
+the learner's state from the coordinator's real `_public_view`. "typical" is
+a ~900-character answer without the context, as the web UI asks for it;
+"with context" adds the learner's state (4 topics); "large" is a reply at
+the 4000-character cap with 15 topics learned and the context included;
+"batch" is a `/chat/batch` body of 8 typical results. Answers carry a code
+block and a little non-ASCII, as model answers do.
+
+"default" is `app.json.response()` from Flask's `DefaultJSONProvider`, which
+the app used before. "orjson" is `FastJSONProvider` from
+web/json_provider.py. Both run inside an app context on a bare Flask app, so
+this is the whole serialization step of a response and nothing else.
+"""
+
+import argparse
+import time
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from agents.coordinator import LearningCoachCoordinator
+from web.json_provider import BACKEND, FastJSONProvider
+
+TOPICS = [
+    "variables", "strings", "numbers", "lists", "dictionaries", "loops", "conditionals", "functions",
+    "tuples", "sets", "classes", "exceptions", "files", "modules", "comprehensions",
+]
+
+PARAGRAPH = (
+    "A for loop visits each item in a list in turn and runs its body once per item — "
+    "you don't manage an index yourself. "
+)
+CODE = "\n\n```python\nscores = [72, 88, 95]\nfor score in scores:\n    print(f\"Score: {score}\")\n```\n\n"
+
+
+def answer(chars):
+    text = PARAGRAPH * 3 + CODE
+    while len(text) < chars:
+        text += PARAGRAPH
+    return text[:chars]
+
+
+def payload(reply_chars, topics, include_context):
+    context = LearningCoachCoordinator._public_view(
+        {
+            "skill_level": "intermediate",
+            "learning_style": "hands_on",
+            "last_agent": "teaching",
+            "last_topic": topics[-1] if topics else None,
+            "last_response_source": "gemini",
+            "last_model": "gemini-2.5-flash",
+            "history": [{}] * 40,
+            "progress": {
+                "topics_learned": list(topics),
+                "exercises_delivered": 12,
+                "exercises_completed": 9,
+                "interactions": 40,
+            },
+        }
+    )
+    body = {
+        "response": answer(reply_chars),
+        "agent_used": "teaching",
+        "source": "gemini",
+        "model": "gemini-2.5-flash",
+        "user_id": "learner-42",
+        "status": "success",
+    }
+    if include_context:
+        body["context"] = context
+    return body
+
+
+def payloads():
+    typical = payload(900, TOPICS[:4], False)
+    return {
+        "typical": typical,
+        "with context": payload(900, TOPICS[:4], True),
+        "large": payload(4000, TOPICS, True),
+        "batch": {
+            "status": "success",
+            "succeeded": 8,
+            "failed": 0,
+            "results": [{"index": i, **typical} for i in range(8)],
+        },
+    }
+
+
+def timed(provider, body, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        provider.response(body)
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5000)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    default, fast = DefaultJSONProvider(app), FastJSONProvider(app)
+    if BACKEND != "orjson":
+        print("orjson is not installed; both columns use the standard library.\n")
+
+    print(f"{'payload':<13} {'bytes':>12} {'default':>10} {'orjson':>10} {'speedup':>8}")
+    with app.app_context():
+        for name, body in payloads().items():
+            before = len(default.response(body).get_data())
+            after = len(fast.response(body).get_data())
+            default_us = timed(default, body, args.repeat)
+            fast_us = timed(fast, body, args.repeat)
+            print(
+                f"{name:<13} {before:>5} -> {after:<5} {default_us:>8.1f}us {fast_us:>8.1f}us "
+                f"{default_us / fast_us:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
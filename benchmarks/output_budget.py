@@ -0,0 +1,191 @@
+"""Answer length and latency: uncapped answers vs per-level output budgets.
+
+Usage:
+    python -m benchmarks.output_budget [--log requests.jsonl] [--requests 200]
+
+Replays a request log through the real teaching and practice agents and the
+real google-genai SDK, against a fake transport in place of the API. Each log
+line is a JSON object:
+
+    {"agent": "teaching", "level": "beginner", "message": "explain loops",
+     "answer_tokens": 840}
+
+`answer_tokens` is how long the answer ran with no cap (the
+`candidates_token_count` a live call logged). Without --log, or for lines
+without it, lengths are drawn from the synthetic distribution below, which is
+an assumption, not a measurement.
+
+The fake model writes that many tokens of alternating prose and code and
+stops at maxOutputTokens with finish reason MAX_TOKENS. Asked to continue, it
+finishes the open code block and stops, as CONTINUE_PROMPT tells it to. "uncapped" runs each agent with no output budget;
+"budget" runs it with its AGENT_CONFIGS profile, including
+`output_tokens_by_level`, trimming and continuation. Latency is modelled from
+the token counts with the speeds in benchmarks.agent_profiles, not measured.
+"""
+
+import argparse
+import json
+import random
+import statistics
+
+from google import genai
+from google.genai import types
+
+from agents.base_agent import CONTINUE_PROMPT
+from agents.practice_agent import create_practice_agent
+from agents.teaching_agent import create_teaching_agent
+from benchmarks.agent_profiles import SPEED
+from config.settings import AGENT_CONFIGS
+
+FACTORIES = {"teaching": create_teaching_agent, "practice": create_practice_agent}
+MESSAGES = {
+    "teaching": ["explain loops", "what are functions?", "how do dictionaries work", "explain classes"],
+    "practice": ["give me an exercise on lists", "practice on loops", "exercise on functions"],
+}
+# Uncapped answer length (mean, spread) per agent; a shorter-for-beginners
+# prompt is not assumed to hold, which is what the budget is for.
+SYNTHETIC_TOKENS = {"teaching": (780, 260), "practice": (620, 200)}
+SYNTHETIC_LEVELS = (("beginner", 0.5), ("intermediate", 0.3), ("advanced", 0.2))
+THINKING_TOKENS = 300
+CHARS_PER_TOKEN = 4
+SENTENCE = "Each item in the list is visited once and the loop body runs for it. "
+CODE_LINE = "    total = total + value  # add it up\n"
+
+
+def synthetic_log(count, seed=7):
+    rng = random.Random(seed)
+    levels, weights = zip(*SYNTHETIC_LEVELS)
+    for _ in range(count):
+        agent = "teaching" if rng.random() < 0.6 else "practice"
+        mean, spread = SYNTHETIC_TOKENS[agent]
+        yield {
+            "agent": agent,
+            "level": rng.choices(levels, weights)[0],
+            "message": rng.choice(MESSAGES[agent]),
+            "answer_tokens": int(min(1800, max(150, rng.gauss(mean, spread)))),
+        }
+
+
+def read_log(path, count):
+    with open(path, encoding="utf-8") as fh:
+        rows = [json.loads(line) for line in fh if line.strip()]
+    fill = synthetic_log(len(rows))
+    for row, synthetic in zip(rows[:count], fill):
+        if row.get("agent") in FACTORIES:
+            yield {**synthetic, **row}
+
+
+def answer_text(tokens, seed):
+    """Alternating prose paragraphs and code blocks, `tokens` long."""
+    rng = random.Random(seed)
+    parts, size = [], tokens * CHARS_PER_TOKEN
+    while sum(map(len, parts)) < size:
+        parts.append(SENTENCE * rng.randint(1, 5) + "\n\n")
+        parts.append("```python\n" + CODE_LINE * rng.randint(2, 6) + "```\n\n")
+    return "".join(parts)[:size].rstrip() + "\n"
+
+
+class FakeTransport:
+    """Writes `answer_tokens` of text, honouring maxOutputTokens."""
+
+    def __init__(self):
+        self.answer = ""
+        self.calls = []
+
+    def request(self, method, path, request_dict, http_options=None):
+        config = request_dict.get("generationConfig", {})
+        thinking = (config.get("thinkingConfig") or {}).get("thinking_budget")
+        thought = min(THINKING_TOKENS, thinking) if thinking is not None else THINKING_TOKENS
+        limit = config.get("maxOutputTokens")
+        written = "".join(
+            p.get("text", "") for c in request_dict["contents"][1:] if c["role"] == "model" for p in c["parts"]
+        )
+        rest = self.answer[len(written):]
+        if request_dict["contents"][-1]["parts"][0].get("text") == CONTINUE_PROMPT:
+            # Asked to finish the open example and stop there.
+            close = rest.find("```")
+            rest = rest if close < 0 else rest[: close + 3] + "\n"
+        room = None if limit is None else max(0, limit - thought) * CHARS_PER_TOKEN
+        text = rest if room is None or len(rest) <= room else rest[:room]
+        tokens = len(text) // CHARS_PER_TOKEN
+        self.calls.append((tokens, thought, len(text) < len(rest)))
+        body = {
+            "candidates": [{
+                "content": {"role": "model", "parts": [{"text": text}]},
+                "finishReason": "MAX_TOKENS" if len(text) < len(rest) else "STOP",
+            }],
+            "usageMetadata": {"candidatesTokenCount": tokens, "thoughtsTokenCount": thought},
+        }
+        return types.HttpResponse(headers={}, body=json.dumps(body))
+
+
+def replay(rows, budgeted):
+    client = genai.Client(api_key="benchmark")
+    transport = FakeTransport()
+    client._api_client.request = transport.request
+    agents = {}
+    for name, factory in FACTORIES.items():
+        agents[name] = factory(client)
+        agents[name].configure(AGENT_CONFIGS[name])
+        if not budgeted:
+            agents[name].max_output_tokens = None
+            agents[name].output_tokens_by_level = None
+
+    results = []
+    for i, row in enumerate(rows):
+        agent = agents[row["agent"]]
+        transport.answer = answer_text(row["answer_tokens"], seed=i)
+        transport.calls = []
+        known = {"topic": "loops", "level": row["level"], "learning_style": "adaptive", "difficulty": "easy"}
+        facts = agent.pre_resolve(known)
+        agent.query(row["message"], facts=facts, level=row["level"])
+        ttft, tps = SPEED.get(agent.model_id, SPEED["gemini-2.5-flash"])
+        answer = sum(a for a, _, _ in transport.calls)
+        tokens = answer + sum(t for _, t, _ in transport.calls)
+        cut = transport.calls[0][2]
+        results.append({
+            "level": row["level"],
+            "answer": answer,
+            "tokens": tokens,
+            "seconds": len(transport.calls) * ttft + tokens / tps,
+            "trimmed": cut and agent.last_continuations == 0,
+            "continued": agent.last_continuations > 0,
+        })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--log", help="JSONL request log to replay (default: synthetic)")
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    rows = list(read_log(args.log, args.requests) if args.log else synthetic_log(args.requests))
+    runs = {"uncapped": replay(rows, False), "budget": replay(rows, True)}
+    print(f"{len(rows)} requests from {args.log or 'the synthetic log'}; token columns are averages\n")
+
+    print(
+        f"{'level':<13} {'run':<9} {'n':>4} {'answer':>7} {'+think':>7} "
+        f"{'latency':>8} {'trimmed':>8} {'continued':>10}"
+    )
+    for level in ("beginner", "intermediate", "advanced", "all"):
+        for label, results in runs.items():
+            group = [r for r in results if level in ("all", r["level"])]
+            if not group:
+                continue
+            print(
+                f"{level:<13} {label:<9} {len(group):>4} "
+                f"{statistics.mean(r['answer'] for r in group):>7.0f} "
+                f"{statistics.mean(r['tokens'] for r in group):>7.0f} "
+                f"{statistics.mean(r['seconds'] for r in group):>7.2f}s "
+                f"{sum(r['trimmed'] for r in group):>8} {sum(r['continued'] for r in group):>10}"
+            )
+    print()
+    for key, label in (("answer", "Answer"), ("tokens", "Output (with thinking)")):
+        before = sum(r[key] for r in runs["uncapped"])
+        after = sum(r[key] for r in runs["budget"])
+        print(f"{label} tokens saved: {before - after} of {before} ({(before - after) / before:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Bytes on the wire and CPU per response, with and without compression.
+
+Usage:
+    python -m benchmarks.response_compression [--repeat 2000] [--turns 12]
+
+Runs in local mode, so every answer is the coordinator's own lesson text
+rather than synthetic filler. "typical" is one `/chat` body as the web UI
+gets it, "with context" adds the learner's state, "large" is an answer cut
+at the 4000-character cap with 15 topics and the context, and "batch" is a
+`/chat/batch` body of 8 answers. Bodies are encoded with the app's JSON
+provider, then compressed the way web/compression.py does it; the CPU column
+is that compression step alone, per response. brotli rows appear only when
+the `brotli` package is installed.
+
+The last table is one `/events` stream over a scripted session of --turns
+turns: every event the page would receive, sent raw and through one
+compressor flushed after each event, as the middleware streams it.
+"""
+
+import argparse
+import asyncio
+import time
+
+from flask import Flask
+
+from agents.coordinator import LearningCoachCoordinator
+from config.settings import COMPRESS_BROTLI_QUALITY, COMPRESS_GZIP_LEVEL, COMPRESS_MIN_BYTES
+from web.compression import _Stream, brotli
+from web.json_provider import FastJSONProvider
+
+TOPICS = [
+    "variables", "strings", "numbers", "lists", "dictionaries", "loops", "conditionals", "functions",
+    "tuples", "sets", "classes", "exceptions", "files", "modules", "comprehensions",
+]
+
+SESSION = [
+    ("assessment", "Hi, I know a little JavaScript and I'm new to Python"),
+    ("teaching", "Explain loops"),
+    ("practice", "Give me a practice exercise on loops"),
+    ("teaching", "How do functions work?"),
+    ("practice", "Give me an exercise on functions"),
+    ("progress", "How am I doing?"),
+    ("teaching", "What are dictionaries?"),
+    ("curriculum", "What should I learn next?"),
+]
+
+
+def lesson_text(coordinator, chars):
+    text = ""
+    for topic in TOPICS:
+        text += coordinator._local_fallback("teaching", f"explain {topic}", "bench") + "\n\n"
+        if len(text) >= chars:
+            break
+    return text[:chars]
+
+
+def bodies(coordinator):
+    view = lambda topics: LearningCoachCoordinator._public_view(  # noqa: E731
+        {
+            "skill_level": "intermediate",
+            "last_agent": "teaching",
+            "last_topic": topics[-1],
+            "last_response_source": "local",
+            "history": [{}] * 40,
+            "progress": {"topics_learned": topics, "exercises_delivered": 12, "interactions": 40},
+        }
+    )
+    reply = lambda chars, topics=None: {  # noqa: E731
+        "response": lesson_text(coordinator, chars),
+        "agent_used": "teaching",
+        "source": "local",
+        "model": None,
+        "user_id": "learner-42",
+        "status": "success",
+        **({"context": view(topics)} if topics else {}),
+    }
+    typical = reply(900)
+    return {
+        "typical": typical,
+        "with context": reply(900, TOPICS[:4]),
+        "large": reply(4000, TOPICS),
+        "batch": {"status": "success", "succeeded": 8, "failed": 0,
+                  "results": [{"index": i, **typical} for i in range(8)]},
+    }
+
+
+def compressed(data, encoding, level):
+    stream = _Stream(encoding, level)
+    return stream.chunk(data) + stream.finish()
+
+
+def timed(data, encoding, level, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        compressed(data, encoding, level)
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def session_events(coordinator, turns):
+    subscription = coordinator.feed.subscribe(
+        "session", coordinator.get_public_context("session"), coordinator.status_view()
+    )
+    events = ["retry: 3000\n\n"]
+    for n in range(turns):
+        agent, message = SESSION[n % len(SESSION)]
+        asyncio.run(coordinator.process_with_agent(agent, message, "session"))
+        while (event := subscription.next_event(0)) is not None:
+            events.append(event)
+    coordinator.feed.unsubscribe(subscription)
+    return [event.encode() for event in events]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=12)
+    args = parser.parse_args()
+
+    coordinator = LearningCoachCoordinator()
+    coordinator.initialize_agents()
+    app = Flask(__name__)
+    provider = FastJSONProvider(app)
+
+    settings = [("gzip", level) for level in (1, COMPRESS_GZIP_LEVEL, 6, 9)]
+    if brotli is not None:
+        settings += [("br", quality) for quality in (COMPRESS_BROTLI_QUALITY, 11)]
+    print(f"Defaults: gzip {COMPRESS_GZIP_LEVEL}, brotli {COMPRESS_BROTLI_QUALITY}, "
+          f"at least {COMPRESS_MIN_BYTES} bytes\n")
+    print(f"{'payload':<13} {'raw':>6} " + " ".join(f"{f'{enc} {lvl}':>17}" for enc, lvl in settings))
+    for name, body in bodies(coordinator).items():
+        data = provider.dumps(body).encode()
+        cells = []
+        for encoding, level in settings:
+            size = len(compressed(data, encoding, level))
+            cells.append(f"{size:>6} {timed(data, encoding, level, args.repeat):>7.1f}us")
+        print(f"{name:<13} {len(data):>6} " + " ".join(f"{cell:>17}" for cell in cells))
+
+    events = session_events(coordinator, args.turns)
+    raw = sum(len(event) for event in events)
+    print(f"\n/events over {args.turns} turns: {len(events)} events, {raw} bytes raw")
+    for encoding, level in settings:
+        stream = _Stream(encoding, level)
+        started = time.perf_counter()
+        sent = sum(len(stream.chunk(event, flush=True)) for event in events) + len(stream.finish())
+        per_event = (time.perf_counter() - started) / len(events) * 1e6
+        print(f"  {encoding} {level}: {sent} bytes ({sent / raw:.0%}), {per_event:.1f}us per event")
+
+
+if __name__ == "__main__":
+    main()
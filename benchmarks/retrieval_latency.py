@@ -0,0 +1,90 @@
+"""Nearest-answer lookup latency: NumPy TF-IDF index vs a per-document loop.
+
+Usage:
+    python -m benchmarks.retrieval_latency [--sizes 1000 10000 100000] [--batch 32]
+
+Documents are synthetic learner questions and answer openings over the lesson
+vocabulary, which is what the response cache holds. For each corpus size this
+reports the one-off build (merge) time, the latency of a single query, the
+per-query latency when queries are looked up in a batch, and - for contrast -
+a straightforward Python loop computing the same cosine against every
+document.
+"""
+
+import argparse
+import math
+import random
+import time
+from collections import Counter
+
+from agents.retrieval import library_sections, tokenize
+from agents.vector_index import TfidfIndex
+
+TEMPLATES = [
+    "how do I {a} {b} in python",
+    "what is the difference between {a} and {b}",
+    "explain {a} with an example about {b}",
+    "why does my {a} give an error when I use {b}",
+    "can you show {a} {b} step by step",
+]
+
+
+def corpus(rng: random.Random, size: int):
+    words = sorted({w for s in library_sections() for w in tokenize(s.text)})
+    for i in range(size):
+        a, b = rng.sample(words, 2)
+        extra = " ".join(rng.sample(words, rng.randint(3, 12)))
+        yield i, rng.choice(TEMPLATES).format(a=a, b=b) + " " + extra
+
+
+def naive_search(docs, query):
+    """The loop the index replaces: idf-weighted cosine against every document."""
+    q = Counter(tokenize(query))
+    best, best_score = None, 0.0
+    for key, (vec, norm) in docs.items():
+        dot = sum(w * vec.get(t, 0.0) for t, w in q.items())
+        if dot and dot / norm > best_score:
+            best, best_score = key, dot / norm
+    return best
+
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'docs':>8} {'build':>9} {'1 query':>10} {'batched/q':>10} {'py loop':>10}")
+    for size in args.sizes:
+        rng = random.Random(args.seed)
+        docs = list(corpus(rng, size))
+        queries = [text for _, text in rng.sample(docs, args.batch)]
+
+        index = TfidfIndex()
+        for key, text in docs:
+            index.add(key, text)
+        build = timed(lambda: index.search(["warm up"]), 1)  # first search merges
+
+        single = timed(lambda: [index.search([q]) for q in queries], 5) / len(queries)
+        batched = timed(lambda: index.search(queries), 10) / len(queries)
+
+        df = Counter(t for _, text in docs for t in set(tokenize(text)))
+        vectors = {}
+        for key, text in docs:
+            vec = {t: c * math.log(size / df[t]) for t, c in Counter(tokenize(text)).items()}
+            vectors[key] = (vec, math.sqrt(sum(v * v for v in vec.values())) or 1.0)
+        loop = timed(lambda: naive_search(vectors, queries[0]), 3)
+
+        print(f"{size:>8} {build * 1e3:>7.0f}ms {single * 1e3:>8.2f}ms {batched * 1e3:>8.2f}ms {loop * 1e3:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
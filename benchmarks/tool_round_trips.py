@@ -0,0 +1,92 @@
+"""Model round trips per answer: model-called tools vs pre-resolved tools.
+
+Usage:
+    python -m benchmarks.tool_round_trips [--latency-ms 600] [--repeat 5]
+
+Runs the real agents through the real google-genai SDK, including its
+automatic function calling loop, against a fake transport in place of the
+API. The fake model behaves the way Gemini does for these prompts: offered
+tools and no tool result yet, it calls the agent's first tool; otherwise it
+answers in text. Each request sleeps `--latency-ms`, standing in for one
+generation. Reports requests per answer, request bytes (a proxy for input
+tokens) and wall time, for "model" mode and for "resolved" mode, where the
+coordinator runs the tool up front and sends the result as facts.
+
+Real answers can take more trips than this in model mode (a second tool
+call, a retried call), so read the model-mode column as a lower bound.
+"""
+
+import argparse
+import json
+import time
+
+from google import genai
+from google.genai import types
+
+from agents.curriculum_agent import create_curriculum_agent
+from agents.practice_agent import create_practice_agent
+from agents.teaching_agent import create_teaching_agent
+
+CASES = [
+    (create_teaching_agent, "explain loops"),
+    (create_practice_agent, "give me an exercise on lists"),
+    (create_curriculum_agent, "what should I learn next?"),
+]
+KNOWN = {"level": "beginner", "learning_style": "adaptive", "difficulty": "easy"}
+TOPICS = {"explain loops": "loops", "give me an exercise on lists": "lists"}
+ARGS = {"topic": "loops", "experience_level": "beginner"}
+
+
+class FakeTransport:
+    """Stands in for the HTTP layer under `client.models.generate_content`."""
+
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+        self.requests = 0
+        self.bytes_sent = 0
+
+    def request(self, method, path, request_dict, http_options=None):
+        self.requests += 1
+        self.bytes_sent += len(json.dumps(request_dict))
+        time.sleep(self.latency_s)
+        answered = any("functionResponse" in p for c in request_dict["contents"] for p in c["parts"])
+        if request_dict.get("tools") and not answered:
+            declaration = request_dict["tools"][0]["functionDeclarations"][0]
+            required = declaration.get("parameters_json_schema", {}).get("required", [])
+            part = {"functionCall": {"name": declaration["name"], "args": {k: ARGS[k] for k in required}}}
+        else:
+            part = {"text": "Here is your answer."}
+        body = {"candidates": [{"content": {"role": "model", "parts": [part]}, "finishReason": "STOP"}]}
+        return types.HttpResponse(headers={}, body=json.dumps(body))
+
+
+def measure(factory, message, resolved, latency_s, repeat):
+    client = genai.Client(api_key="benchmark")
+    transport = FakeTransport(latency_s)
+    client._api_client.request = transport.request
+    agent = factory(client)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        facts = agent.pre_resolve({**KNOWN, "topic": TOPICS.get(message)}) if resolved else None
+        agent.query(message, facts=facts)
+    elapsed = (time.perf_counter() - started) / repeat
+    return transport.requests / repeat, transport.bytes_sent / repeat, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency-ms", type=float, default=600)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'agent':<11} {'mode':<9} {'trips':>6} {'sent':>9} {'time':>9}")
+    for factory, message in CASES:
+        for resolved in (False, True):
+            trips, sent, elapsed = measure(factory, message, resolved, args.latency_ms / 1000, args.repeat)
+            name = factory.__name__.replace("create_", "").replace("_agent", "")
+            mode = "resolved" if resolved else "model"
+            print(f"{name:<11} {mode:<9} {trips:>6.1f} {sent / 1024:>7.1f}KB {elapsed * 1e3:>7.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
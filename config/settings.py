@@ -11,6 +11,9 @@ BASE_DIR = Path(__file__).resolve().parents[1]
 # Runtime mode
 LOCAL_ONLY = os.getenv("LOCAL_ONLY", "").lower() in ("1", "true", "yes")
 FIRESTORE_ENABLED = os.getenv("FIRESTORE_ENABLED", "").lower() in ("1", "true", "yes")
+# Most recently active learners preloaded from Firestore when an instance
+# starts, so their first request after a deploy skips the read. 0 disables.
+WARMUP_USERS = int(os.getenv("WARMUP_USERS", 200))
 
 # Gemini / Vertex AI
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -43,6 +46,31 @@ MAX_CONVERSATION_HISTORY = 50
 # keeps a single oversized paste from consuming the API budget.
 MAX_MESSAGE_CHARS = int(os.getenv("MAX_MESSAGE_CHARS", 4000))
 MAX_USER_ID_CHARS = 64
+# Items accepted by one /chat/batch request. Each item can be a model call, so
+# this also bounds how much quota one HTTP request can spend.
+MAX_BATCH_ITEMS = int(os.getenv("MAX_BATCH_ITEMS", 50))
+# An /events stream ends after this long and the browser reconnects, so a
+# stream never outlives the Cloud Run request timeout (300 s) and a closed tab
+# frees its thread. A comment line every EVENT_HEARTBEAT_S keeps proxies from
+# dropping an idle stream.
+EVENT_STREAM_MAX_S = int(os.getenv("EVENT_STREAM_MAX_S", 240))
+EVENT_HEARTBEAT_S = 15
+# Under gunicorn each open stream holds one of the worker's 32 threads, so
+# streams past this many are refused (503) and those pages poll /status and
+# /context with ETags instead; the other threads stay free for requests. The
+# ASGI server holds no thread per stream and does not apply it.
+EVENT_STREAMS_MAX = int(os.getenv("EVENT_STREAMS_MAX", 16))
+# JSON replies of at least COMPRESS_MIN_BYTES, and /events streams, are sent
+# gzip- or brotli-compressed to clients that accept it (web/compression.py).
+# The levels favour latency: higher ones save under 1% for up to 40% more CPU.
+COMPRESS_RESPONSES = os.getenv("COMPRESS_RESPONSES", "true").lower() in ("1", "true", "yes")
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", 512))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", 4))
+COMPRESS_BROTLI_QUALITY = 4
+# Threads for blocking model calls when served over ASGI (`main:asgi_app`).
+# Each turn waiting on the model parks one; raise MODEL_CONCURRENCY too, or
+# most of them will be waiting for a call slot rather than on the API.
+ASGI_CALL_THREADS = int(os.getenv("ASGI_CALL_THREADS", 256))
 
 CORE_PYTHON_TOPICS = [
     "variables",
@@ -62,13 +90,103 @@ CORE_PYTHON_TOPICS = [
     "error_handling",
 ]
 
+# `priority` orders Gemini calls queued for the same model (lower goes first).
+# A new learner's assessment is their first impression of the coach; a
+# progress report can wait a few seconds.
+#
+# `answer_mode` is how the agent answers in live mode:
+#   "model"    - Gemini with the agent's tools; the model decides what to call
+#   "resolved" - the tool the turn obviously needs (the lesson for the named
+#                topic, the exercise at the next difficulty, the roadmap for the
+#                level) runs locally first and its result goes in the prompt,
+#                so the model answers in one round trip instead of two or three.
+#                Falls back to "model" when nothing obvious applies.
+#   "local"    - the coach's own deterministic content, no model call
+#   "hybrid"   - that content, phrased by the agent's model in one call, no tools
+# Progress is hybrid: its tools only recompute counters the coordinator already
+# holds, and letting the model call them cost up to four extra round trips.
+#
+# The generation profile, applied by BaseGenAIAgent.configure(); a key left
+# out keeps the default:
+#   model / fallback_models - this agent's model chain (default: GEMINI_MODEL
+#                             and GEMINI_FALLBACK_MODELS)
+#   max_output_tokens       - answer budget; any thinking budget is added on top
+#   output_tokens_by_level  - budget per learner level, replacing
+#                             max_output_tokens for the levels it lists
+#   temperature             - model default when unset
+#   thinking_budget         - 0 turns thinking off; ignored by pre-2.5 models
+#   max_tool_calls          - cap on automatic function-calling hops
+#   max_continuations       - extra calls allowed to finish an answer cut off
+#                             mid-example (prose is trimmed to its last
+#                             complete sentence instead)
+# Light, formulaic answers (roadmaps, progress) get small budgets and no
+# thinking, so a deployment can point them at a lighter model through
+# AGENT_MODELS. Teaching and practice cap thinking, which otherwise adds
+# seconds before the first word of a learner-facing answer.
+# A beginner lesson is one idea and one example, so it gets the smallest budget.
 AGENT_CONFIGS: Dict[str, Dict[str, Any]] = {
-    "assessment": {"description": "Python skill assessor"},
-    "curriculum": {"description": "Personalized learning path designer"},
-    "teaching": {"description": "Patient Python tutor"},
-    "practice": {"description": "Coding exercise creator"},
-    "progress": {"description": "Learning progress tracker"},
+    "assessment": {
+        "description": "Python skill assessor",
+        "priority": 0,
+        "answer_mode": "model",
+        "max_output_tokens": 600,
+        "temperature": 0.3,
+        "thinking_budget": 512,
+        "max_tool_calls": 3,
+    },
+    "curriculum": {
+        "description": "Personalized learning path designer",
+        "priority": 2,
+        "answer_mode": "resolved",
+        "max_output_tokens": 900,
+        "temperature": 0.4,
+        "thinking_budget": 0,
+        "max_tool_calls": 2,
+    },
+    "teaching": {
+        "description": "Patient Python tutor",
+        "priority": 1,
+        "answer_mode": "resolved",
+        "max_output_tokens": 1000,
+        "output_tokens_by_level": {"beginner": 450, "intermediate": 700, "advanced": 1000},
+        "temperature": 0.7,
+        "thinking_budget": 512,
+        "max_tool_calls": 2,
+    },
+    "practice": {
+        "description": "Coding exercise creator",
+        "priority": 1,
+        "answer_mode": "resolved",
+        "max_output_tokens": 800,
+        "output_tokens_by_level": {"beginner": 400, "intermediate": 600, "advanced": 800},
+        "temperature": 0.9,
+        "thinking_budget": 512,
+        "max_tool_calls": 2,
+    },
+    "progress": {
+        "description": "Learning progress tracker",
+        "priority": 3,
+        "answer_mode": "hybrid",
+        "max_output_tokens": 400,
+        "temperature": 0.4,
+        "thinking_budget": 0,
+        "max_tool_calls": 3,
+    },
 }
+ANSWER_MODES = ("model", "resolved", "local", "hybrid")
+
+# Per-deployment override, e.g. AGENT_ANSWER_MODES="progress=local,curriculum=hybrid".
+for _pair in os.getenv("AGENT_ANSWER_MODES", "").split(","):
+    _name, _, _mode = (part.strip().lower() for part in _pair.partition("="))
+    if _name in AGENT_CONFIGS and _mode in ANSWER_MODES:
+        AGENT_CONFIGS[_name]["answer_mode"] = _mode
+
+# Per-deployment model, e.g. AGENT_MODELS="curriculum=gemini-2.5-flash-lite".
+# A named agent falls back along GEMINI_FALLBACK_MODELS minus its own model.
+for _pair in os.getenv("AGENT_MODELS", "").split(","):
+    _name, _, _model = (part.strip() for part in _pair.partition("="))
+    if _name.lower() in AGENT_CONFIGS and _model:
+        AGENT_CONFIGS[_name.lower()]["model"] = _model
 
 
 def runtime_mode() -> str:
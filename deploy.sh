@@ -8,6 +8,15 @@ VERTEX_LOCATION="${VERTEX_LOCATION:-northamerica-northeast1}"
 # You can optionally export GOOGLE_CLOUD_PROJECT, otherwise it uses gcloud config
 PROJECT_ID="${GOOGLE_CLOUD_PROJECT:-$(gcloud config get-value project 2>/dev/null)}"
 
+# SERVER=asgi ./deploy.sh serves with uvicorn (web/asgi.py), where a turn
+# waiting on the model holds no thread, and lets Cloud Run send an instance
+# up to 500 requests at once instead of its default 80.
+SERVER="${SERVER:-gunicorn}"
+CONCURRENCY=80
+if [ "${SERVER}" = "asgi" ]; then
+  CONCURRENCY=500
+fi
+
 # Artifact Registry repo name (create once)
 AR_REPO="python-learning-coach"
 
@@ -24,6 +33,7 @@ echo "Project: ${PROJECT_ID}"
 echo "Region: ${REGION}"
 echo "Vertex: ${VERTEX_LOCATION}"
 echo "Repo:   ${AR_REPO}"
+echo "Server: ${SERVER} (concurrency ${CONCURRENCY})"
 echo "Image:  ${IMAGE_NAME}:latest"
 
 echo "Enabling required services..."
@@ -54,8 +64,10 @@ gcloud run deploy "${SERVICE_NAME}" \
   --allow-unauthenticated \
   --port 8080 \
   --timeout 300 \
+  --session-affinity \
+  --concurrency "${CONCURRENCY}" \
   --project "${PROJECT_ID}" \
-  --set-env-vars "FIRESTORE_ENABLED=1,GOOGLE_GENAI_USE_VERTEXAI=1,GOOGLE_CLOUD_PROJECT=${PROJECT_ID},GOOGLE_CLOUD_LOCATION=${VERTEX_LOCATION}"
+  --set-env-vars "SERVER=${SERVER},FIRESTORE_ENABLED=1,GOOGLE_GENAI_USE_VERTEXAI=1,GOOGLE_CLOUD_PROJECT=${PROJECT_ID},GOOGLE_CLOUD_LOCATION=${VERTEX_LOCATION}"
 
 echo "Service URL:"
 gcloud run services describe "${SERVICE_NAME}" \
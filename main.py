@@ -1,11 +1,19 @@
 import asyncio
 import logging
 import re
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
 
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, Response, jsonify, render_template, request
 
+from agents.code_analysis import find_code
 from agents.coordinator import LearningCoachCoordinator
+from agents.grader import GradingUnavailable
+from agents.genai_clients import pool_stats
 from config import settings
+from web import AssetTable, AsyncFront, Compression, FastJSONProvider, send_asset
 
 logging.basicConfig(
     level=logging.DEBUG if settings.DEBUG else logging.INFO,
@@ -22,6 +30,23 @@ for noisy in ("httpx", "httpcore", "google_genai.models", "urllib3"):
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+# orjson when installed; Flask's own encoder otherwise (web/json_provider.py).
+app.json = FastJSONProvider(app)
+if settings.COMPRESS_RESPONSES:
+    Compression(
+        app,
+        min_bytes=settings.COMPRESS_MIN_BYTES,
+        gzip_level=settings.COMPRESS_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESS_BROTLI_QUALITY,
+    )
+
+# Content-hashed, precompressed copies of static/, linked from the templates.
+assets = AssetTable(app.static_folder)
+app.jinja_env.globals["asset_url"] = assets.url
+
+# ETags below come from in-memory version counters, which restart with the
+# process; the boot id keeps a restarted instance from matching old tags.
+BOOT_ID = uuid.uuid4().hex[:8]
 
 # ==========================================
 # 1. INITIALIZATION
@@ -31,6 +56,20 @@ coordinator = LearningCoachCoordinator()
 coordinator.initialize_agents()
 logger.info("Coordinator ready in %s mode with %d agents", coordinator.mode, len(coordinator.agents))
 
+# Preload recent learners in the background: the instance starts serving at
+# once, and anyone who arrives before the warm-up finishes just reads normally.
+if coordinator.store and settings.WARMUP_USERS > 0:
+    threading.Thread(
+        target=coordinator.warm_up_contexts,
+        args=(settings.WARMUP_USERS,),
+        name="context-warmup",
+        daemon=True,
+    ).start()
+
+# Start the grading sandboxes now, so the first submission finds one waiting.
+if coordinator.grader:
+    coordinator.grader.start()
+
 
 def run_async(coro):
     """Run async agent logic from Flask's synchronous request handlers."""
@@ -52,18 +91,50 @@ def health():
     return jsonify({"status": "degraded" if snapshot["degraded"] else "healthy", **snapshot}), 200
 
 
+def _conditional_json(etag: str, build, private: bool = False):
+    """`build()` as JSON with a strong ETag, or a bodiless 304 if it matches.
+
+    The ETag is derived from a version counter, so a matching request skips
+    building and serializing the body altogether. `no-cache` makes browsers
+    revalidate every time rather than trust a stale copy.
+    """
+    # Weak comparison: a compressed reply carries the weak form (web/compression.py).
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache" if private else "no-cache"
+    return response
+
+
+_STATUS_KEYS = ("mode", "model", "fallback_models", "agents_count", "degraded", "api_paused", "last_error")
+# Pool fields that change on every call; /health reports them.
+_VOLATILE_POOL_KEYS = ("open_connections", "idle_connections", "requests")
+
+
 @app.route("/status", methods=["GET"])
 def status():
-    """Status page (JSON) used by the web UI badges."""
-    snapshot = coordinator.health_snapshot()
-    return jsonify(
-        {
+    """Status page (JSON) used by the web UI badges.
+
+    Only what changes with the API's state, so it can be served from an
+    ETag. The per-request counters (queue, caches, grader) are on /health.
+    So are the HTTP pool's connection and request counts; only its settings
+    and client count are here.
+    """
+    pool = {key: value for key, value in pool_stats().items() if key not in _VOLATILE_POOL_KEYS}
+
+    def build():
+        snapshot = coordinator.health_snapshot()
+        return {
             "service": "Python Learning Coach AI",
             "status": "Online",
             "agents": list(coordinator.agents.keys()),
-            **snapshot,
+            **{key: snapshot[key] for key in _STATUS_KEYS},
+            "http_pool": pool,
         }
-    )
+
+    return _conditional_json(f"status-{BOOT_ID}-{coordinator.status_version()}-{pool['clients']}", build)
 
 
 # ==========================================
@@ -168,8 +239,15 @@ def is_greeting_only(message: str) -> bool:
 
 
 def determine_agent(message: str, user_id: str) -> str:
-    """Route a learner turn to the right expert agent."""
-    msg = (message or "").lower()
+    """Route a learner turn to the right expert agent.
+
+    When the message contains code, only the words around it are scanned for
+    keywords: a solution that prints "Practice makes perfect" or loops over a
+    `plan` list is not a request for practice or a roadmap. `find_code` is
+    cached per message, so the coordinator reuses this parse when it answers.
+    """
+    code = find_code(message)
+    msg = (code.prose if code else message or "").lower()
     context = coordinator.get_user_context(user_id)
 
     # 1. "Say that again, simpler" is always a teaching follow-up.
@@ -186,24 +264,32 @@ def determine_agent(message: str, user_id: str) -> str:
     if _matches_any(msg, HELP_SIGNALS):
         return "teaching"
 
-    # 4. Bare greeting: onboard with an assessment.
+    # 4. Pasted code with no request around it: grade it against the open
+    #    exercise (answered locally, no model call), else read the learner's
+    #    level from it. A question about the code is a teaching turn.
+    if code is not None:
+        if coordinator.current_exercise(context):
+            return "practice"
+        return "teaching" if msg.rstrip().endswith("?") else "assessment"
+
+    # 5. Bare greeting: onboard with an assessment.
     if is_greeting_only(msg):
         return "assessment"
 
-    # 5. "I want to start learning Python" is a roadmap request.
+    # 6. "I want to start learning Python" is a roadmap request.
     if _matches_any(msg, ("start", "begin", "get started", "learn")) and _matches_any(
         msg, ("python", "programming", "coding", "code")
     ):
         return "curriculum"
 
-    # 6. Onboard a brand-new learner with an assessment. Gated on being early
+    # 7. Onboard a brand-new learner with an assessment. Gated on being early
     #    in the conversation: an unknown skill level several turns in should not
     #    turn every unmatched question into another assessment.
     turns = len(context.get("history", []))
     if context.get("skill_level") == "unknown" and turns < 4:
         return "assessment"
 
-    # 7. Default: keep teaching early on, shift to practice once they have
+    # 8. Default: keep teaching early on, shift to practice once they have
     #    covered some ground.
     return "teaching" if turns < 6 else "practice"
 
@@ -211,46 +297,49 @@ def determine_agent(message: str, user_id: str) -> str:
 # ==========================================
 # 4. API ENDPOINTS
 # ==========================================
-@app.route("/chat", methods=["POST"])
-def chat():
-    """Main entry point for the multi-agent coach."""
-    data = request.get_json(silent=True) or {}
+def _validate_chat_input(data) -> Tuple[str, str, Optional[Tuple[Dict[str, Any], int]]]:
+    """Pull `message` and `user_id` out of one chat item.
+
+    Returns (user_id, message, error). `error` is a (payload, status) pair when
+    the item must be rejected, so /chat and /chat/batch reject the same input
+    the same way.
+    """
+    data = data if isinstance(data, dict) else {}
     user_message = str(data.get("message", "")).strip()
     user_id = str(data.get("user_id", settings.DEFAULT_USER_ID)).strip() or settings.DEFAULT_USER_ID
 
     if not user_message:
-        return jsonify({"error": "Message is empty", "status": "error"}), 400
+        return user_id, user_message, ({"error": "Message is empty", "status": "error"}, 400)
 
     # Cap the payload before it reaches a metered API. Without this a single
     # oversized paste can blow the request budget or be rejected downstream.
     if len(user_message) > settings.MAX_MESSAGE_CHARS:
         return (
-            jsonify(
+            user_id,
+            user_message,
+            (
                 {
                     "error": (
                         f"Message is too long ({len(user_message)} characters). "
                         f"Please keep it under {settings.MAX_MESSAGE_CHARS}."
                     ),
                     "status": "error",
-                }
+                },
+                413,
             ),
-            413,
         )
-    user_id = user_id[: settings.MAX_USER_ID_CHARS]
+    return user_id[: settings.MAX_USER_ID_CHARS], user_message, None
 
-    try:
-        agent_name = determine_agent(user_message, user_id)
-        response = run_async(coordinator.process_with_agent(agent_name, user_message, user_id))
-    except Exception as e:
-        # The coordinator already falls back locally for API failures, so
-        # reaching here means a genuine bug. Log the detail, return a generic
-        # message rather than echoing internals to the browser.
-        logger.exception("Unhandled error while processing chat for user %s", user_id)
-        return (
-            jsonify({"error": "The coach hit an internal error. Please try again.", "status": "error"}),
-            500,
-        )
 
+def _chat_payload(
+    response: str, agent_name: str, user_id: str, include_context: bool = False
+) -> Dict[str, Any]:
+    """The JSON body for one answered learner turn.
+
+    Just the reply and where it came from. The learner's updated state reaches
+    the web UI over /events; other clients can ask for it inline with
+    `include_context`.
+    """
     public_context = coordinator.get_public_context(user_id)
     source = public_context.get("last_response_source", "unknown")
     payload = {
@@ -259,36 +348,289 @@ def chat():
         "source": source,
         "model": public_context.get("last_model"),
         "user_id": user_id,
-        "context": public_context,
         "status": "success",
     }
+    if include_context:
+        payload["context"] = public_context
     # Tell the UI why an answer is canned instead of letting it look like the
     # model simply gave a poor reply.
     if source == "fallback" and coordinator.last_error:
         payload["degraded"] = True
         payload["degraded_reason"] = coordinator.last_error.get("kind")
-    return jsonify(payload)
+    return payload
+
+
+_INTERNAL_ERROR = {"error": "The coach hit an internal error. Please try again.", "status": "error"}
+# The sandbox cannot isolate itself on this host (agents/grader.py).
+_GRADING_UNAVAILABLE = {"error": "Code grading is unavailable on this server", "status": "error"}
+
+
+async def _chat():
+    """`/chat`, for either server: awaited on the ASGI loop, or via `chat` below."""
+    data = request.get_json(silent=True)
+    user_id, user_message, error = _validate_chat_input(data)
+    if error:
+        return jsonify(error[0]), error[1]
+
+    try:
+        # Loaded off the loop here, so routing reads it from memory.
+        await coordinator.load_user_context(user_id)
+        agent_name = determine_agent(user_message, user_id)
+        response = await coordinator.process_with_agent(agent_name, user_message, user_id)
+    except Exception as e:
+        # The coordinator already falls back locally for API failures, so
+        # reaching here means a genuine bug. Log the detail, return a generic
+        # message rather than echoing internals to the browser.
+        logger.exception("Unhandled error while processing chat for user %s", user_id)
+        return jsonify(_INTERNAL_ERROR), 500
+
+    return jsonify(_chat_payload(response, agent_name, user_id, _wants_context(data)))
+
+
+@app.route("/chat", methods=["POST"])
+def chat():
+    """Main entry point for the multi-agent coach."""
+    return run_async(_chat())
+
+
+def _wants_context(data) -> bool:
+    return isinstance(data, dict) and data.get("include_context") is True
+
+
+async def _run_user_turns(
+    user_id: str, turns: List[Tuple[int, str]], include_context: bool = False
+) -> List[Tuple[int, Dict[str, Any]]]:
+    """Answer one learner's queued turns strictly in order.
+
+    Order matters within a learner: routing and memory for turn 2 depend on
+    what turn 1 did. A failed turn is reported and the next one still runs.
+    """
+    results = []
+    for index, message in turns:
+        try:
+            await coordinator.load_user_context(user_id)
+            agent_name = determine_agent(message, user_id)
+            response = await coordinator.process_with_agent(agent_name, message, user_id)
+        except Exception:
+            logger.exception("Unhandled error in batch item %d for user %s", index, user_id)
+            results.append((index, dict(_INTERNAL_ERROR, user_id=user_id)))
+            continue
+        results.append((index, _chat_payload(response, agent_name, user_id, include_context)))
+    return results
+
+
+async def _run_batch(
+    groups: Dict[str, List[Tuple[int, str]]], include_context: bool = False
+) -> List[List[Tuple[int, Dict[str, Any]]]]:
+    # Different learners are independent, so their model calls overlap.
+    return await asyncio.gather(
+        *(_run_user_turns(uid, turns, include_context) for uid, turns in groups.items())
+    )
+
+
+async def _chat_batch():
+    """Answer many queued learner turns in one HTTP request.
+
+    Accepts `{"items": [{"user_id", "message"}, ...]}` (or the bare list), for
+    clients that replay messages queued offline. Each item gets its own result
+    at the same index; a bad item fails on its own instead of failing the batch.
+    `"include_context": true` next to `items` adds each learner's state to
+    their results.
+    """
+    data = request.get_json(silent=True)
+    items = data.get("items") if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Expected a non-empty list of items", "status": "error"}), 400
+    if len(items) > settings.MAX_BATCH_ITEMS:
+        return (
+            jsonify(
+                {
+                    "error": (
+                        f"Batch has {len(items)} items. "
+                        f"Please send at most {settings.MAX_BATCH_ITEMS}."
+                    ),
+                    "status": "error",
+                }
+            ),
+            413,
+        )
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    groups: Dict[str, List[Tuple[int, str]]] = {}
+    for index, item in enumerate(items):
+        user_id, user_message, error = _validate_chat_input(item)
+        if error:
+            results[index] = dict(error[0], user_id=user_id)
+            continue
+        groups.setdefault(user_id, []).append((index, user_message))
+
+    # One store read for every learner in the batch instead of one per learner,
+    # made off the event loop.
+    await asyncio.get_running_loop().run_in_executor(None, coordinator.prefetch_contexts, list(groups))
+    for user_results in await _run_batch(groups, _wants_context(data)):
+        for index, payload in user_results:
+            results[index] = payload
+
+    failed = sum(1 for r in results if r["status"] != "success")
+    return jsonify(
+        {
+            "status": "success" if not failed else "partial" if failed < len(results) else "error",
+            "succeeded": len(results) - failed,
+            "failed": failed,
+            "results": [dict(r, index=i) for i, r in enumerate(results)],
+        }
+    )
+
+
+@app.route("/chat/batch", methods=["POST"])
+def chat_batch():
+    return run_async(_chat_batch())
+
+
+@app.route("/grade", methods=["POST"])
+def grade():
+    """Run submitted code against the learner's current exercise.
+
+    Takes `{"user_id", "code"}`, plus optional `topic` and `difficulty` to
+    grade a specific exercise instead. Returns whether it passed, each check,
+    the code's output and any error.
+    """
+    if coordinator.grader is None:
+        return jsonify({"error": "Code grading is turned off on this server", "status": "error"}), 503
+    if coordinator.grader.unavailable is not None:
+        return jsonify(_GRADING_UNAVAILABLE), 503
+    data = request.get_json(silent=True)
+    data = data if isinstance(data, dict) else {}
+    user_id = str(data.get("user_id", settings.DEFAULT_USER_ID)).strip() or settings.DEFAULT_USER_ID
+    user_id = user_id[: settings.MAX_USER_ID_CHARS]
+    code = str(data.get("code", ""))
+    if not code.strip():
+        return jsonify({"error": "No code to grade", "status": "error"}), 400
+    if len(code) > settings.MAX_MESSAGE_CHARS:
+        return (
+            jsonify(
+                {
+                    "error": (
+                        f"Code is too long ({len(code)} characters). "
+                        f"Please keep it under {settings.MAX_MESSAGE_CHARS}."
+                    ),
+                    "status": "error",
+                }
+            ),
+            413,
+        )
+
+    topic = str(data["topic"]).strip() if data.get("topic") else None
+    difficulty = str(data["difficulty"]).strip() if data.get("difficulty") else None
+    try:
+        result = coordinator.grade_submission(user_id, code, topic, difficulty)
+    except GradingUnavailable:
+        return jsonify(_GRADING_UNAVAILABLE), 503
+    except Exception:
+        logger.exception("Unhandled error while grading for user %s", user_id)
+        return jsonify(_INTERNAL_ERROR), 500
+    if result is None:
+        return (
+            jsonify({"error": "No exercise to grade yet. Ask for a practice exercise first.", "status": "error"}),
+            400,
+        )
+    return jsonify({"status": "success", "user_id": user_id, **result})
 
 
 @app.route("/", methods=["GET"])
 def index():
     """Basic web UI."""
-    return render_template("index.html")
+    response = app.make_response(render_template("index.html"))
+    # Always revalidated: it names the current hashed assets.
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.route("/assets/<path:name>", methods=["GET"])
+def asset(name):
+    """A static file under its content-hashed name (see web/assets.py)."""
+    found = assets.get(name)
+    if found is None:
+        return jsonify({"error": "Not found", "status": "error"}), 404
+    return send_asset(found, request)
 
 
 @app.route("/context/<user_id>", methods=["GET"])
 def context(user_id):
     """Current learner state, for the frontend."""
     user_id = (str(user_id).strip() or settings.DEFAULT_USER_ID)[: settings.MAX_USER_ID_CHARS]
-    return jsonify(
-        {
+    return _conditional_json(
+        f"ctx-{BOOT_ID}-{coordinator.context_version(user_id)}",
+        lambda: {
             "status": "success",
             "user_id": user_id,
             "context": coordinator.get_public_context(user_id),
-        }
+        },
+        private=True,
+    )
+
+
+EVENT_STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+# How long a page refused a stream polls before asking again (static/app.js).
+EVENT_STREAM_RETRY_S = 60
+
+
+def _subscribe(user_id: str, limit: Optional[int] = None):
+    user_id = (str(user_id).strip() or settings.DEFAULT_USER_ID)[: settings.MAX_USER_ID_CHARS]
+    return coordinator.feed.subscribe(
+        user_id, coordinator.get_public_context(user_id), coordinator.status_view(), limit=limit
     )
 
 
+@app.route("/events/<user_id>", methods=["GET"])
+def events(user_id):
+    """Server-Sent Events: the learner's context and the service status.
+
+    The first `context` and `status` events carry the full state; each later
+    one carries only what changed. The stream ends after EVENT_STREAM_MAX_S
+    and the browser's EventSource reconnects on its own.
+
+    Each open stream holds a request thread here, so past EVENT_STREAMS_MAX
+    the answer is a 503, on which the page polls /status and /context.
+    """
+    subscription = _subscribe(user_id, limit=settings.EVENT_STREAMS_MAX)
+    if subscription is None:
+        response = jsonify(
+            {"error": "Too many open event streams; poll /status and /context", "status": "error"}
+        )
+        return response, 503, {"Retry-After": str(EVENT_STREAM_RETRY_S)}
+
+    def stream():
+        try:
+            yield "retry: 3000\n\n"
+            deadline = time.monotonic() + settings.EVENT_STREAM_MAX_S
+            while time.monotonic() < deadline:
+                event = subscription.next_event(timeout=settings.EVENT_HEARTBEAT_S)
+                yield event if event is not None else ": ping\n\n"
+        finally:
+            coordinator.feed.unsubscribe(subscription)
+
+    return Response(stream(), mimetype="text/event-stream", headers=EVENT_STREAM_HEADERS)
+
+
+async def _events(user_id):
+    """`events` on the ASGI server's loop: an open stream holds no thread."""
+    # The first read of a learner's context may go to the store.
+    subscription = await asyncio.get_running_loop().run_in_executor(None, _subscribe, user_id)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            deadline = time.monotonic() + settings.EVENT_STREAM_MAX_S
+            while time.monotonic() < deadline:
+                event = await subscription.next_event_async(timeout=settings.EVENT_HEARTBEAT_S)
+                yield event if event is not None else ": ping\n\n"
+        finally:
+            coordinator.feed.unsubscribe(subscription)
+
+    return Response(stream(), mimetype="text/event-stream", headers=EVENT_STREAM_HEADERS)
+
+
 @app.route("/reset", methods=["POST"])
 def reset():
     """Reset one learner's context."""
@@ -308,5 +650,16 @@ def reset():
 # ==========================================
 # 5. SERVER RUN
 # ==========================================
+# gunicorn serves `app`. `uvicorn main:asgi_app` (SERVER=asgi in the
+# container) serves the same routes, with the two model-bound ones and the
+# event stream awaited on the server's event loop instead of holding a thread
+# each. See web/asgi.py.
+asgi_app = AsyncFront(
+    app,
+    {("POST", "chat"): _chat, ("POST", "chat_batch"): _chat_batch, ("GET", "events"): _events},
+    call_threads=settings.ASGI_CALL_THREADS,
+)
+
+
 if __name__ == "__main__":
     app.run(host=settings.HOST, port=settings.PORT, debug=settings.DEBUG)
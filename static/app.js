@@ -1,7 +1,24 @@
+// Long sessions used to slow down with every turn: each message rebuilt the
+// whole log and re-serialized the history into localStorage. Now a message
+// appends one row, only the newest rows stay in the DOM, and history is saved
+// to IndexedDB in batches.
+const RENDER_WINDOW = 150; // message rows kept in the DOM; older ones on request
+const HISTORY_LIMIT = 1000; // messages kept per learner
+const SAVE_DELAY_MS = 500; // messages sent within this share one write
+const LOCAL_HISTORY_LIMIT = 100; // localStorage fallback, as before IndexedDB
+const POLL_INTERVAL_MS = 5000; // /status and /context, while there is no stream
+const STREAM_RETRY_MS = 60000; // a refused stream is asked for again after this
+
 const state = {
   status: null,
   context: null,
   history: [],
+  firstRendered: 0, // index in history of the oldest row in the DOM
+  windowSize: RENDER_WINDOW, // grows each time earlier messages are shown
+  events: null, // the /events stream, when the browser has EventSource
+  poll: null, // interval polling /status and /context while there is no stream
+  streamRetry: null, // timer asking for a stream again after a refusal
+  contextUpdates: 0, // context events received, to spot a missed update
 };
 
 const els = {
@@ -35,6 +52,8 @@ const DEGRADED_REASONS = {
     "Gemini rejected the credentials. Check GEMINI_API_KEY or the Vertex AI permissions.",
   model_not_found:
     "The configured model is not available to this project. Check GEMINI_MODEL.",
+  queue_timeout:
+    "The coach is very busy. Some answers come from the built-in lesson library for now.",
 };
 
 function showBanner(text) {
@@ -45,22 +64,165 @@ function showBanner(text) {
   els.banner.classList.toggle("hidden", !text);
 }
 
-const storageKey = () => `plc_history_${currentUserId()}`;
+const storageKey = (userId = currentUserId()) => `plc_history_${userId}`;
 
 function currentUserId() {
   return els.userId.value.trim() || "demo";
 }
 
-function loadHistory() {
+// History is one IndexedDB record per message, indexed by learner. Browsers
+// without IndexedDB (some private modes) keep the last 100 in localStorage.
+const historyStore = {
+  db: null, // Promise of the database, or of null when unavailable
+  pending: [], // records waiting for the next batched write
+  timer: null,
+};
+
+function openHistoryDb() {
+  if (!historyStore.db) {
+    historyStore.db = new Promise((resolve) => {
+      if (!window.indexedDB) {
+        resolve(null);
+        return;
+      }
+      const request = indexedDB.open("plc", 1);
+      request.onupgradeneeded = () => {
+        const messages = request.result.createObjectStore("messages", {
+          keyPath: "id",
+          autoIncrement: true,
+        });
+        messages.createIndex("user", "user");
+      };
+      request.onsuccess = () => resolve(request.result);
+      request.onerror = () => resolve(null);
+    });
+  }
+  return historyStore.db;
+}
+
+function transactionDone(tx) {
+  return new Promise((resolve, reject) => {
+    tx.oncomplete = resolve;
+    tx.onerror = tx.onabort = () => reject(tx.error);
+  });
+}
+
+function requestResult(request) {
+  return new Promise((resolve, reject) => {
+    request.onsuccess = () => resolve(request.result);
+    request.onerror = () => reject(request.error);
+  });
+}
+
+// Delete a learner's records through `cursorRequest`, oldest first, `limit`
+// at most.
+function deleteRecords(cursorRequest, limit = Infinity) {
+  let left = limit;
+  cursorRequest.onsuccess = () => {
+    const cursor = cursorRequest.result;
+    if (cursor && left-- > 0) {
+      cursor.delete();
+      cursor.continue();
+    }
+  };
+}
+
+function readLocalHistory(userId) {
   try {
-    state.history = JSON.parse(localStorage.getItem(storageKey()) || "[]");
+    return JSON.parse(localStorage.getItem(storageKey(userId)) || "[]");
   } catch {
-    state.history = [];
+    return [];
+  }
+}
+
+function writeLocalHistory(records) {
+  const byUser = new Map();
+  for (const { user, ...item } of records) {
+    byUser.set(user, [...(byUser.get(user) || []), item]);
+  }
+  for (const [user, items] of byUser) {
+    const kept = readLocalHistory(user).concat(items).slice(-LOCAL_HISTORY_LIMIT);
+    localStorage.setItem(storageKey(user), JSON.stringify(kept));
+  }
+}
+
+async function loadHistory() {
+  const userId = currentUserId();
+  await flushHistory();
+  const db = await openHistoryDb();
+  let items = readLocalHistory(userId);
+  if (db) {
+    if (items.length) {
+      // One-time move of a history saved before IndexedDB.
+      const tx = db.transaction("messages", "readwrite");
+      items.forEach((item) => tx.objectStore("messages").add({ user: userId, ...item }));
+      await transactionDone(tx);
+      localStorage.removeItem(storageKey(userId));
+    }
+    const index = db.transaction("messages").objectStore("messages").index("user");
+    items = await requestResult(index.getAll(userId));
+  }
+  if (userId !== currentUserId()) {
+    return false; // switched learner while reading
+  }
+  // Messages sent while reading are still queued; they come after.
+  const queued = historyStore.pending.filter((record) => record.user === userId);
+  state.history = items
+    .concat(queued)
+    .slice(-HISTORY_LIMIT)
+    .map(({ role, text, meta }) => ({ role, text, meta }));
+  return true;
+}
+
+function queueSave(item) {
+  historyStore.pending.push({ user: currentUserId(), ...item });
+  if (!historyStore.timer) {
+    historyStore.timer = setTimeout(flushHistory, SAVE_DELAY_MS);
+  }
+}
+
+// Write every queued message in one transaction, then trim each learner in
+// the batch back to HISTORY_LIMIT.
+async function flushHistory() {
+  clearTimeout(historyStore.timer);
+  historyStore.timer = null;
+  const batch = historyStore.pending.splice(0);
+  if (!batch.length) {
+    return;
+  }
+  const db = await openHistoryDb();
+  if (!db) {
+    writeLocalHistory(batch);
+    return;
+  }
+  const tx = db.transaction("messages", "readwrite");
+  const messages = tx.objectStore("messages");
+  batch.forEach((record) => messages.add(record));
+  for (const user of new Set(batch.map((record) => record.user))) {
+    const count = messages.index("user").count(user);
+    count.onsuccess = () => {
+      if (count.result > HISTORY_LIMIT) {
+        deleteRecords(messages.index("user").openCursor(user), count.result - HISTORY_LIMIT);
+      }
+    };
+  }
+  try {
+    await transactionDone(tx);
+  } catch (error) {
+    console.warn("Could not save chat history", error);
   }
 }
 
-function saveHistory() {
-  localStorage.setItem(storageKey(), JSON.stringify(state.history.slice(-100)));
+async function clearHistory() {
+  const userId = currentUserId();
+  historyStore.pending = historyStore.pending.filter((record) => record.user !== userId);
+  localStorage.removeItem(storageKey(userId));
+  const db = await openHistoryDb();
+  if (db) {
+    const tx = db.transaction("messages", "readwrite");
+    deleteRecords(tx.objectStore("messages").index("user").openCursor(userId));
+    await transactionDone(tx).catch((error) => console.warn("Could not clear chat history", error));
+  }
 }
 
 function setBusy(isBusy) {
@@ -70,40 +232,122 @@ function setBusy(isBusy) {
 }
 
 function addMessage(role, text, meta = "") {
-  state.history.push({ role, text, meta });
-  saveHistory();
-  renderMessages();
+  const item = { role, text, meta };
+  state.history.push(item);
+  queueSave(item);
+  if (state.history.length > HISTORY_LIMIT) {
+    state.history.shift();
+    if (state.firstRendered) {
+      state.firstRendered -= 1;
+    } else {
+      dropOldestRow();
+    }
+  }
+  appendMessage(item);
+}
+
+function messageRow(item) {
+  const row = document.createElement("div");
+  row.className = `message-row ${item.role}`;
+
+  const bubble = document.createElement("div");
+  bubble.className = "message";
+  bubble.textContent = item.text;
+
+  if (item.meta) {
+    const meta = document.createElement("div");
+    meta.className = "message-meta";
+    meta.textContent = item.meta;
+    bubble.appendChild(meta);
+  }
+
+  row.appendChild(bubble);
+  return row;
+}
+
+function earlierButton() {
+  if (!els.earlier) {
+    els.earlier = document.createElement("button");
+    els.earlier.type = "button";
+    els.earlier.className = "secondary load-earlier";
+    els.earlier.addEventListener("click", showEarlier);
+  }
+  return els.earlier;
+}
+
+// The "show earlier" button heads the log while any message is left out.
+function updateEarlier() {
+  const button = earlierButton();
+  const hidden = state.firstRendered;
+  if (!hidden) {
+    button.remove();
+    return;
+  }
+  button.textContent = `Show earlier messages (${hidden})`;
+  if (els.chatLog.firstChild !== button) {
+    els.chatLog.insertBefore(button, els.chatLog.firstChild);
+  }
+}
+
+function dropOldestRow() {
+  const button = earlierButton();
+  const oldest = button.parentNode ? button.nextSibling : els.chatLog.firstChild;
+  oldest.remove();
+}
+
+function appendMessage(item) {
+  const log = els.chatLog;
+  if (state.history.length === 1) {
+    log.replaceChildren(); // the empty state
+  }
+  log.appendChild(messageRow(item));
+  // One row in, one row out: the DOM stays at the window however long the
+  // session runs.
+  while (state.history.length - state.firstRendered > state.windowSize) {
+    dropOldestRow();
+    state.firstRendered += 1;
+  }
+  updateEarlier();
+  log.scrollTop = log.scrollHeight;
 }
 
 function renderMessages() {
-  els.chatLog.innerHTML = "";
+  const log = els.chatLog;
+  log.replaceChildren();
+  state.windowSize = RENDER_WINDOW;
+  state.firstRendered = Math.max(0, state.history.length - RENDER_WINDOW);
   if (!state.history.length) {
     const row = document.createElement("div");
     row.className = "empty-state";
     row.textContent = "Start with an assessment, roadmap, explanation, or practice request.";
-    els.chatLog.appendChild(row);
+    log.appendChild(row);
+    updateEarlier();
     return;
   }
 
-  for (const item of state.history) {
-    const row = document.createElement("div");
-    row.className = `message-row ${item.role}`;
-
-    const bubble = document.createElement("div");
-    bubble.className = "message";
-    bubble.textContent = item.text;
-
-    if (item.meta) {
-      const meta = document.createElement("div");
-      meta.className = "message-meta";
-      meta.textContent = item.meta;
-      bubble.appendChild(meta);
-    }
+  const rows = document.createDocumentFragment();
+  for (const item of state.history.slice(state.firstRendered)) {
+    rows.appendChild(messageRow(item));
+  }
+  log.appendChild(rows);
+  updateEarlier();
+  log.scrollTop = log.scrollHeight;
+}
 
-    row.appendChild(bubble);
-    els.chatLog.appendChild(row);
+function showEarlier() {
+  const log = els.chatLog;
+  const start = Math.max(0, state.firstRendered - RENDER_WINDOW);
+  const rows = document.createDocumentFragment();
+  for (const item of state.history.slice(start, state.firstRendered)) {
+    rows.appendChild(messageRow(item));
   }
-  els.chatLog.scrollTop = els.chatLog.scrollHeight;
+  // Keep the reader's place: the rows go in above what they are reading.
+  const fromBottom = log.scrollHeight - log.scrollTop;
+  log.insertBefore(rows, earlierButton().nextSibling);
+  state.windowSize += state.firstRendered - start;
+  state.firstRendered = start;
+  updateEarlier();
+  log.scrollTop = log.scrollHeight - fromBottom;
 }
 
 function renderContext(context) {
@@ -143,18 +387,25 @@ function renderContext(context) {
   }
 }
 
-async function loadStatus() {
-  const res = await fetch("/status");
-  state.status = await res.json();
-  els.modeBadge.textContent = state.status.mode || "unknown";
-  els.modelBadge.textContent = state.status.model || "model unknown";
+function renderStatus(status) {
+  els.modeBadge.textContent = status.mode || "unknown";
+  els.modelBadge.textContent = status.model || "model unknown";
 
-  const kind = state.status.last_error && state.status.last_error.kind;
-  if (state.status.degraded && kind) {
+  const kind = status.degraded_reason;
+  if (status.degraded && kind) {
     showBanner(DEGRADED_REASONS[kind] || `Gemini is unavailable (${kind}).`);
+  } else if (!status.degraded) {
+    showBanner("");
   }
 }
 
+async function loadStatus() {
+  const res = await fetch("/status");
+  const data = await res.json();
+  state.status = { ...data, degraded_reason: data.last_error && data.last_error.kind };
+  renderStatus(state.status);
+}
+
 async function loadContext() {
   const res = await fetch(`/context/${encodeURIComponent(currentUserId())}`);
   const data = await res.json();
@@ -162,6 +413,85 @@ async function loadContext() {
   renderContext(state.context);
 }
 
+// Events after the first carry only what changed; nested objects (progress)
+// are merged, everything else replaced.
+function mergeInto(target, delta) {
+  const merged = { ...(target || {}) };
+  for (const [key, value] of Object.entries(delta)) {
+    const isObject = value && typeof value === "object" && !Array.isArray(value);
+    merged[key] = isObject ? mergeInto(merged[key], value) : value;
+  }
+  return merged;
+}
+
+// One stream per page replaces fetching /status and /context: the server sends
+// the full state once, then each change as the coordinator saves it.
+function connectEvents() {
+  if (state.events) {
+    state.events.close();
+  }
+  if (!window.EventSource) {
+    state.events = null;
+    loadWithoutStream();
+    return;
+  }
+  state.context = null;
+  const events = new EventSource(`/events/${encodeURIComponent(currentUserId())}`);
+  events.addEventListener("context", (event) => {
+    state.context = mergeInto(state.context, JSON.parse(event.data));
+    state.contextUpdates += 1;
+    renderContext(state.context);
+  });
+  events.addEventListener("status", (event) => {
+    state.status = mergeInto(state.status, JSON.parse(event.data));
+    renderStatus(state.status);
+  });
+  events.addEventListener("open", stopPolling);
+  events.addEventListener("error", () => {
+    // EventSource retries on its own; it gives up only if the server refuses,
+    // as it does with a 503 when it has no thread to spare for another stream.
+    if (events.readyState === EventSource.CLOSED && state.events === events) {
+      state.events = null;
+      startPolling();
+    }
+  });
+  state.events = events;
+}
+
+function loadWithoutStream() {
+  loadStatus().catch(() => renderStatus({ mode: "offline", model: "unavailable" }));
+  loadContext().catch(() => renderContext(null));
+}
+
+// Without a stream the page polls. Both routes answer with an ETag, so an
+// unchanged state costs a 304 and no body. The stream is asked for again
+// later, and polling stops once it opens.
+function startPolling() {
+  loadWithoutStream();
+  if (!state.poll) {
+    state.poll = setInterval(loadWithoutStream, POLL_INTERVAL_MS);
+  }
+  clearTimeout(state.streamRetry);
+  state.streamRetry = setTimeout(connectEvents, STREAM_RETRY_MS);
+}
+
+function stopPolling() {
+  clearInterval(state.poll);
+  clearTimeout(state.streamRetry);
+  state.poll = null;
+  state.streamRetry = null;
+}
+
+// The reply no longer carries the context. If no update came over the stream
+// (no stream, or it is held by another server process), read it once.
+function refreshContextIfMissed(updatesBefore) {
+  setTimeout(() => {
+    if (state.contextUpdates === updatesBefore) {
+      loadContext().catch(() => {});
+    }
+  }, 300);
+}
+
 async function sendMessage(message) {
   const text = message.trim();
   if (!text) {
@@ -171,6 +501,7 @@ async function sendMessage(message) {
   addMessage("user", text, "You");
   els.message.value = "";
   setBusy(true);
+  const updatesBefore = state.contextUpdates;
 
   try {
     const res = await fetch("/chat", {
@@ -186,8 +517,7 @@ async function sendMessage(message) {
     const modelPart = data.model ? ` - ${data.model}` : "";
     const meta = `${data.agent_used || "coach"} - ${data.source || "unknown"}${modelPart}`;
     addMessage("coach", data.response || "", meta);
-    state.context = data.context;
-    renderContext(state.context);
+    refreshContextIfMissed(updatesBefore);
 
     if (data.degraded) {
       showBanner(
@@ -205,15 +535,17 @@ async function sendMessage(message) {
 }
 
 async function resetSession() {
-  await fetch("/reset", {
+  const res = await fetch("/reset", {
     method: "POST",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify({ user_id: currentUserId() }),
   });
+  const data = await res.json();
+  state.context = data.context;
+  renderContext(state.context);
   state.history = [];
-  saveHistory();
   renderMessages();
-  await loadContext();
+  await clearHistory();
 }
 
 function bindPromptButtons() {
@@ -234,21 +566,27 @@ els.resetBtn.addEventListener("click", resetSession);
 
 els.clearLocalBtn.addEventListener("click", () => {
   state.history = [];
-  saveHistory();
   renderMessages();
+  clearHistory();
 });
 
 els.userId.addEventListener("change", async () => {
-  loadHistory();
-  renderMessages();
-  await loadContext();
+  connectEvents();
+  if (await loadHistory()) {
+    renderMessages();
+  }
+});
+
+// A queued batch is written before the tab goes away.
+document.addEventListener("visibilitychange", () => {
+  if (document.visibilityState === "hidden") {
+    flushHistory();
+  }
 });
 
 bindPromptButtons();
-loadHistory();
 renderMessages();
-loadStatus().catch(() => {
-  els.modeBadge.textContent = "offline";
-  els.modelBadge.textContent = "unavailable";
-});
-loadContext().catch(() => renderContext(null));
+loadHistory()
+  .then((loaded) => loaded && renderMessages())
+  .catch((error) => console.warn("Could not load chat history", error));
+connectEvents();
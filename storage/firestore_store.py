@@ -1,13 +1,17 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, List, Optional, Sequence
 
 try:
     from google.cloud import firestore
 except Exception:  # pragma: no cover - optional dependency
     firestore = None
 
+# Documents per get_all() call. Keeps one batch read's response bounded however
+# many learners a caller asks for at once.
+GET_ALL_CHUNK = 100
+
 
 class FirestoreStore:
     def __init__(self):
@@ -17,17 +21,69 @@ class FirestoreStore:
         self.client = firestore.Client(project=project_id) if project_id else firestore.Client()
         self.collection = self.client.collection("users")
 
+    @staticmethod
+    def _context_from(doc) -> Dict[str, Any]:
+        data = doc.to_dict() or {}
+        # Store bookkeeping, not learner state.
+        data.pop("updated_at", None)
+        return data
+
     def get_user_context(self, user_id: str) -> Dict[str, Any] | None:
         doc = self.collection.document(user_id).get()
         if not doc.exists:
             return None
-        data = doc.to_dict() or {}
-        return data
+        return self._context_from(doc)
+
+    def get_user_contexts(self, user_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Read several learners in batched round trips. Missing users are omitted."""
+        refs = [self.collection.document(user_id) for user_id in dict.fromkeys(user_ids)]
+        found: Dict[str, Dict[str, Any]] = {}
+        for start in range(0, len(refs), GET_ALL_CHUNK):
+            for doc in self.client.get_all(refs[start : start + GET_ALL_CHUNK]):
+                if doc.exists:
+                    found[doc.id] = self._context_from(doc)
+        return found
+
+    def get_recent_user_contexts(self, limit: int) -> Dict[str, Dict[str, Any]]:
+        """The `limit` most recently saved learners, newest first, in one query.
+
+        Documents written before `updated_at` existed are not indexed on it and
+        so are never returned; they load on first request as before.
+        """
+        query = self.collection.order_by(
+            "updated_at", direction=firestore.Query.DESCENDING
+        ).limit(limit)
+        return {doc.id: self._context_from(doc) for doc in query.stream()}
 
     def save_user_context(self, user_id: str, context: Dict[str, Any]) -> None:
+        context = dict(context)
         # Keep history bounded to avoid unbounded growth.
         history = context.get("history", [])
         if isinstance(history, list) and len(history) > 50:
-            context = dict(context)
             context["history"] = history[-50:]
+        # Lets a fresh instance find the learners worth warming up.
+        context["updated_at"] = firestore.SERVER_TIMESTAMP
         self.collection.document(user_id).set(context, merge=True)
+
+    def update_user_context(
+        self,
+        user_id: str,
+        updates: Dict[str, Any],
+        deletes: Sequence[str] = (),
+        appends: Optional[Dict[str, List[Any]]] = None,
+    ) -> None:
+        """Apply a field-level change to an existing learner document.
+
+        `updates` keys are dotted field paths ("progress.interactions"),
+        `deletes` are paths to remove, and `appends` are array fields to
+        ArrayUnion into. ArrayUnion skips values already present, so appended
+        elements must be distinct (history turns carry a timestamp for this).
+        Raises if the document does not exist; callers fall back to a full save.
+        """
+        fields: Dict[str, Any] = dict(updates)
+        for path in deletes:
+            fields[path] = firestore.DELETE_FIELD
+        for path, values in (appends or {}).items():
+            fields[path] = firestore.ArrayUnion(list(values))
+        fields["updated_at"] = firestore.SERVER_TIMESTAMP
+        self.collection.document(user_id).update(fields)
@@ -1,9 +1,14 @@
+import asyncio
+import gzip
+import json
 import os
+import tempfile
 import unittest
+import zlib
 
 os.environ["LOCAL_ONLY"] = "1"
 
-from main import app, coordinator, determine_agent, is_greeting_only
+from main import app, asgi_app, coordinator, determine_agent, is_greeting_only
 
 
 class LocalAppTests(unittest.TestCase):
@@ -29,8 +34,10 @@ class LocalAppTests(unittest.TestCase):
         self.assertEqual(data["agent_used"], "practice")
         self.assertEqual(data["source"], "local")
         self.assertIn("Problem:", data["response"])
-        self.assertEqual(data["context"]["last_agent"], "practice")
-        self.assertEqual(data["context"]["progress"]["exercises_delivered"], 1)
+        self.assertNotIn("context", data)  # pushed over /events instead
+        public = coordinator.get_public_context("unit_user")
+        self.assertEqual(public["last_agent"], "practice")
+        self.assertEqual(public["progress"]["exercises_delivered"], 1)
         context = coordinator.get_user_context("unit_user")
         self.assertEqual(context["last_agent"], "practice")
         self.assertIn("last_exercise", context)
@@ -60,9 +67,482 @@ class LocalAppTests(unittest.TestCase):
         self.assertIn("too long", response.get_json()["error"])
 
 
+class BatchChatTests(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        for uid in ("batch_a", "batch_b"):
+            coordinator.reset_user_context(uid)
+
+    def test_batch_answers_each_item_in_place(self):
+        response = self.client.post(
+            "/chat/batch",
+            json={
+                "items": [
+                    {"user_id": "batch_a", "message": "Explain loops"},
+                    {"user_id": "batch_b", "message": "Give me a practice exercise on lists"},
+                    {"user_id": "batch_a", "message": "Give me a practice exercise"},
+                ],
+                "include_context": True,
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(data["status"], "success")
+        self.assertEqual([r["index"] for r in data["results"]], [0, 1, 2])
+        self.assertEqual(
+            [r["agent_used"] for r in data["results"]], ["teaching", "practice", "practice"]
+        )
+        # Same-learner items run in order, so the second one sees the first.
+        self.assertEqual(data["results"][2]["context"]["progress"]["interactions"], 2)
+        self.assertIn("Exercise: loops", data["results"][2]["response"])
+
+    def test_invalid_item_fails_alone(self):
+        response = self.client.post(
+            "/chat/batch",
+            json=[
+                {"user_id": "batch_a", "message": "   "},
+                {"user_id": "batch_b", "message": "Explain lists"},
+            ],
+        )
+        data = response.get_json()
+        self.assertEqual(data["status"], "partial")
+        self.assertEqual(data["failed"], 1)
+        self.assertEqual(data["results"][0]["status"], "error")
+        self.assertEqual(data["results"][1]["status"], "success")
+
+    def test_empty_and_oversized_batches_rejected(self):
+        self.assertEqual(self.client.post("/chat/batch", json={"items": []}).status_code, 400)
+        items = [{"message": "hi"}] * 51
+        self.assertEqual(self.client.post("/chat/batch", json=items).status_code, 413)
+
+
+class ConditionalGetTests(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        coordinator.reset_user_context("etag_user")
+
+    def test_context_is_304_until_the_learner_changes(self):
+        first = self.client.get("/context/etag_user")
+        etag = first.headers["ETag"]
+        again = self.client.get("/context/etag_user", headers={"If-None-Match": etag})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.data, b"")
+
+        self.client.post("/chat", json={"message": "Explain loops", "user_id": "etag_user"})
+        changed = self.client.get("/context/etag_user", headers={"If-None-Match": etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers["ETag"], etag)
+        self.assertEqual(changed.get_json()["context"]["last_agent"], "teaching")
+
+    def test_status_is_304_while_nothing_changes(self):
+        etag = self.client.get("/status").headers["ETag"]
+        self.assertEqual(self.client.get("/status", headers={"If-None-Match": etag}).status_code, 304)
+
+    def test_status_etag_ignores_pool_connection_counts(self):
+        from unittest import mock
+
+        busy = {"open_connections": 3, "idle_connections": 1}
+        first = self.client.get("/status")
+        with mock.patch("agents.genai_clients.connection_stats", return_value=busy):
+            again = self.client.get("/status", headers={"If-None-Match": first.headers["ETag"]})
+        self.assertEqual(again.status_code, 304)
+        self.assertNotIn("open_connections", first.get_json()["http_pool"])
+
+    def test_page_links_hashed_assets_served_immutable_and_compressed(self):
+        page = self.client.get("/").get_data(as_text=True)
+        url = next(part.split('"')[0] for part in page.split('src="')[1:] if part.startswith("/assets/app."))
+        response = self.client.get(url, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertIn("immutable", response.headers["Cache-Control"])
+        self.assertIn(b"addMessage", gzip.decompress(response.data))
+        self.assertEqual(
+            self.client.get(url, headers={"If-None-Match": response.headers["ETag"], "Accept-Encoding": "gzip"}).status_code,
+            304,
+        )
+        self.assertEqual(self.client.get("/assets/app.000000000000.js").status_code, 404)
+
+
+class CompressionTests(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        coordinator.reset_user_context("gzip_user")
+
+    def test_large_json_is_gzipped_for_clients_that_accept_it(self):
+        payload = {"message": "Explain loops", "user_id": "gzip_user", "include_context": True}
+        plain = self.client.post("/chat", json=payload)
+        packed = self.client.post("/chat", json=payload, headers={"Accept-Encoding": "gzip, deflate"})
+        self.assertNotIn("Content-Encoding", plain.headers)
+        self.assertEqual(packed.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", packed.headers["Vary"])
+        self.assertLess(len(packed.data), len(plain.data))
+        self.assertEqual(json.loads(gzip.decompress(packed.data))["response"], plain.get_json()["response"])
+
+    def test_small_bodies_go_uncompressed_and_etags_still_match(self):
+        status = self.client.get("/status", headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("Content-Encoding", status.headers)
+        self.assertIn("Accept-Encoding", status.headers["Vary"])
+
+        coordinator.get_user_context("gzip_user")["progress"]["topics_learned"] = [f"topic {n}" for n in range(80)]
+        coordinator._save_context("gzip_user", coordinator.get_user_context("gzip_user"))
+        context = self.client.get("/context/gzip_user", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(context.headers["Content-Encoding"], "gzip")
+        self.assertTrue(context.headers["ETag"].startswith("W/"))
+        again = self.client.get(
+            "/context/gzip_user", headers={"Accept-Encoding": "gzip", "If-None-Match": context.headers["ETag"]}
+        )
+        self.assertEqual(again.status_code, 304)
+
+    def test_event_stream_is_compressed_event_by_event(self):
+        response = self.client.get("/events/gzip_user", headers={"Accept-Encoding": "gzip"}, buffered=False)
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        inflate = zlib.decompressobj(31)
+        chunks = iter(response.response)
+        try:
+            received = ""
+            while received.count("event: ") < 2:
+                received += inflate.decompress(next(chunks)).decode()
+            self.assertIn("retry: 3000", received)
+            self.assertIn('"skill_level":"unknown"', received)
+        finally:
+            response.close()
+        self.assertEqual(coordinator.feed.snapshot()["streams"], 0)
+
+
+class EventStreamTests(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        coordinator.reset_user_context("stream_user")
+
+    @staticmethod
+    def _events(chunks, count):
+        """The next `count` named events as (name, data), skipping comments."""
+        events = []
+        while len(events) < count:
+            chunk = next(chunks)
+            chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+            if chunk.startswith("event: "):
+                name, data = chunk.split("\n")[:2]
+                events.append((name[len("event: "):], json.loads(data[len("data: "):])))
+        return events
+
+    def test_stream_sends_the_state_then_only_what_changed(self):
+        response = self.client.get("/events/stream_user", buffered=False)
+        self.assertEqual(response.mimetype, "text/event-stream")
+        chunks = iter(response.response)
+        try:
+            (_, context), (_, status) = self._events(chunks, 2)
+            self.assertEqual(context["skill_level"], "unknown")
+            self.assertEqual(status["mode"], "local")
+            self.assertEqual(coordinator.feed.snapshot()["streams"], 1)
+
+            self.client.post("/chat", json={"message": "Give me a practice exercise on loops", "user_id": "stream_user"})
+            # The turn saves twice (the question, then the answer): two deltas.
+            (first, question), (second, answer) = self._events(chunks, 2)
+            self.assertEqual((first, second), ("context", "context"))
+            self.assertEqual(question, {"history_count": 1})
+            self.assertEqual(answer["last_agent"], "practice")
+            self.assertEqual(answer["progress"]["exercises_delivered"], 1)
+            self.assertNotIn("skill_level", answer)  # unchanged
+        finally:
+            response.close()
+        self.assertEqual(coordinator.feed.snapshot()["streams"], 0)
+
+    def test_streams_past_the_cap_are_refused_so_the_page_polls(self):
+        from unittest import mock
+
+        from config import settings
+
+        with mock.patch.object(settings, "EVENT_STREAMS_MAX", 1):
+            first = self.client.get("/events/stream_user", buffered=False)
+            try:
+                refused = self.client.get("/events/stream_user", buffered=False)
+                self.assertEqual(refused.status_code, 503)
+                self.assertEqual(refused.headers["Retry-After"], "60")
+                self.assertEqual(refused.get_json()["status"], "error")
+                self.assertEqual(coordinator.feed.snapshot()["streams"], 1)
+                # What the page polls instead, revalidated by ETag.
+                context = self.client.get("/context/stream_user")
+                again = self.client.get("/context/stream_user", headers={"If-None-Match": context.headers["ETag"]})
+                self.assertEqual(again.status_code, 304)
+            finally:
+                first.close()
+            second = self.client.get("/events/stream_user", buffered=False)
+            self.assertEqual(second.status_code, 200)
+            second.close()
+        self.assertEqual(coordinator.feed.snapshot()["streams"], 0)
+
+
+class AsgiModeTests(unittest.TestCase):
+    """main:asgi_app, driven with the ASGI messages a server would send."""
+
+    @staticmethod
+    async def _request(method, path, payload=None, headers=()):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        inbox = [{"type": "http.request", "body": body, "more_body": False}]
+        sent = []
+
+        async def receive():
+            if inbox:
+                return inbox.pop()
+            await asyncio.Event().wait()  # the client stays connected
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http",
+            "method": method,
+            "path": path,
+            "query_string": b"",
+            "http_version": "1.1",
+            "headers": [(b"content-type", b"application/json"), *headers],
+        }
+        await asgi_app(scope, receive, send)
+        headers = {k.decode(): v.decode() for k, v in sent[0]["headers"]}
+        return sent[0]["status"], headers, b"".join(m.get("body", b"") for m in sent[1:])
+
+    def test_chat_is_answered_on_the_loop_like_the_wsgi_route(self):
+        coordinator.reset_user_context("asgi_user")
+        status, headers, body = asyncio.run(
+            self._request(
+                "POST", "/chat", {"message": "Explain loops", "user_id": "asgi_user"},
+                headers=[(b"accept-encoding", b"gzip")],
+            )
+        )
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["content-encoding"], "gzip")  # after_request hooks still run
+        self.assertEqual(json.loads(gzip.decompress(body))["agent_used"], "teaching")
+        status, _, body = asyncio.run(self._request("POST", "/chat", {"user_id": "asgi_user"}))
+        self.assertEqual(status, 400)
+
+        # Everything else goes through Flask's WSGI interface.
+        status, _, body = asyncio.run(self._request("GET", "/health"))
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)["mode"], "local")
+
+    def test_concurrent_learners_share_one_loop(self):
+        async def many():
+            return await asyncio.gather(
+                *(
+                    self._request("POST", "/chat", {"message": "Give me a practice exercise", "user_id": f"asgi_{n}"})
+                    for n in range(40)
+                )
+            )
+
+        replies = asyncio.run(many())
+        self.assertEqual({status for status, _, _ in replies}, {200})
+        self.assertEqual({json.loads(body)["user_id"] for _, _, body in replies}, {f"asgi_{n}" for n in range(40)})
+
+    def test_store_round_trips_stay_off_the_loop(self):
+        import threading
+
+        callers = []
+
+        class RecordingStore:
+            def __getattr__(self, name):
+                def call(*args):
+                    callers.append((name, threading.get_ident()))
+                    return {} if name == "get_user_contexts" else None
+
+                return call
+
+        self.addCleanup(setattr, coordinator, "store", coordinator.store)
+        coordinator.store = RecordingStore()
+        for uid in ("asgi_store", "asgi_store_b"):
+            coordinator.user_contexts.pop(uid, None)
+
+        async def scenario():
+            await self._request("POST", "/chat", {"message": "Explain loops", "user_id": "asgi_store"})
+            await self._request("POST", "/chat/batch", {"items": [{"message": "Explain lists", "user_id": "asgi_store_b"}]})
+            return threading.get_ident()
+
+        loop_thread = asyncio.run(scenario())
+        names = {name for name, _ in callers}
+        self.assertTrue({"get_user_context", "get_user_contexts", "save_user_context"} <= names, names)
+        self.assertNotIn(loop_thread, {thread for _, thread in callers})
+
+    def test_open_event_streams_hold_no_threads(self):
+        coordinator.reset_user_context("asgi_stream")
+
+        async def open_stream(leave):
+            inbox = [{"type": "http.request", "body": b"", "more_body": False}]
+            sent = []
+
+            async def receive():
+                if inbox:
+                    return inbox.pop()
+                await leave.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {"type": "http", "method": "GET", "path": "/events/asgi_stream",
+                     "query_string": b"", "http_version": "1.1", "headers": []}
+            return sent, asyncio.ensure_future(asgi_app(scope, receive, send))
+
+        async def scenario():
+            leave = asyncio.Event()
+            streams = [await open_stream(leave) for _ in range(asgi_app.wsgi_threads + 8)]
+            await asyncio.sleep(0.1)
+            health = await asyncio.wait_for(self._request("GET", "/health"), 5)
+            await self._request("POST", "/chat", {"message": "Explain loops", "user_id": "asgi_stream"})
+            await asyncio.sleep(0.1)
+            open_streams = coordinator.feed.snapshot()["streams"]
+            leave.set()
+            await asyncio.wait_for(asyncio.gather(*(task for _, task in streams)), 5)
+            return health, open_streams, streams
+
+        (status, _, body), open_streams, streams = asyncio.run(scenario())
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)["status"], "healthy")
+        self.assertEqual(open_streams, asgi_app.wsgi_threads + 8)
+        for sent, _ in streams:
+            self.assertEqual(sent[0]["status"], 200)
+            received = b"".join(m.get("body", b"") for m in sent[1:]).decode()
+            self.assertIn('"last_topic":"loops"', received)  # the turn's delta reached every page
+        self.assertEqual(coordinator.feed.snapshot()["streams"], 0)
+
+
+class GradeEndpointTests(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        coordinator.reset_user_context("grade_user")
+
+    def _exercise(self):
+        self.client.post("/chat", json={"message": "Give me a practice exercise on loops", "user_id": "grade_user"})
+
+    def test_passing_submission_completes_the_exercise(self):
+        self._exercise()
+        code = "for i in range(2, 21, 2):\n    print(i)"
+        data = self.client.post("/grade", json={"user_id": "grade_user", "code": code}).get_json()
+        self.assertTrue(data["passed"], data)
+        self.assertEqual(data["exercise"], {"topic": "loops", "difficulty": "easy"})
+        self.assertLess(data["seconds"], 1.0)
+        progress = coordinator.get_public_context("grade_user")["progress"]
+        self.assertEqual(progress["exercises_completed"], 1)
+
+    def test_failing_submission_reports_the_checks_and_error(self):
+        self._exercise()
+        data = self.client.post("/grade", json={"user_id": "grade_user", "code": "print(1)"}).get_json()
+        self.assertFalse(data["passed"])
+        self.assertEqual([c["passed"] for c in data["checks"]], [False, False])
+        data = self.client.post("/grade", json={"user_id": "grade_user", "code": "print(x)"}).get_json()
+        self.assertIn("NameError", data["error"])
+        self.assertEqual(coordinator.get_public_context("grade_user")["progress"]["exercises_completed"], 0)
+
+    def test_sandbox_refuses_network_and_runaway_code(self):
+        network = "import socket\nsocket.create_connection(('example.com', 80))"
+        data = self.client.post("/grade", json={"user_id": "grade_user", "code": network, "topic": "loops"}).get_json()
+        self.assertIn("PermissionError", data["error"])
+        data = self.client.post(
+            "/grade", json={"user_id": "grade_user", "code": "while True:\n    pass", "topic": "loops"}
+        ).get_json()
+        self.assertFalse(data["passed"])
+
+    def _grade(self, code):
+        return self.client.post("/grade", json={"user_id": "grade_user", "code": code, "topic": "loops"}).get_json()
+
+    def test_sandbox_cannot_see_the_server_process(self):
+        data = self._grade("import os\nprint(open(f'/proc/{os.getppid()}/environ').read())")
+        self.assertFalse(data["passed"])
+        self.assertIn("FileNotFoundError", data["error"])
+        self.assertEqual(data["output"], "")
+        data = self._grade("import os\nprint(os.listdir('/'))")
+        self.assertEqual(data["output"], "[]\n")
+
+    def test_sandbox_cannot_truncate_or_open_files_for_writing(self):
+        with tempfile.NamedTemporaryFile("w", delete=False) as f:
+            f.write("keep me")
+        self.addCleanup(os.unlink, f.name)
+        for code in (
+            f"import os\nos.truncate({f.name!r}, 0)",
+            "import os\nos.ftruncate(1, 0)",
+            f"import os\nos.open({f.name!r}, os.O_WRONLY | os.O_CREAT | os.O_TRUNC)",
+            f"import os\nos.open({f.name!r}, os.O_RDWR)",
+        ):
+            data = self._grade(code)
+            self.assertFalse(data["passed"])
+            self.assertIn("PermissionError", data["error"], code)
+        with open(f.name) as fh:
+            self.assertEqual(fh.read(), "keep me")
+
+    def test_sandbox_output_is_cut_off_not_buffered(self):
+        for code in (
+            "import os\nwhile True:\n    os.write(1, b'x' * 65536)",
+            "import sys\nwhile True:\n    sys.__stdout__.write('x' * 65536)",
+        ):
+            data = self._grade(code)
+            self.assertFalse(data["passed"])
+            self.assertEqual(data["error"], "The code printed too much output", code)
+            self.assertLess(data["seconds"], 1.0)
+        data = self._grade("raise ValueError('x' * 100000)")
+        self.assertLess(len(data["error"]), 2100)
+
+    def test_sandbox_root_is_made_on_first_use_and_removed_on_close(self):
+        from agents.grader import Grader
+
+        grader = Grader(1)
+        self.assertIsNone(grader.root)  # constructing a coordinator leaves nothing behind
+        self.assertTrue(grader.grade("print(1)", {"ok": "output == '1\\n'"})["passed"])
+        root = grader.root
+        self.assertTrue(os.path.isdir(root))
+        grader.close()
+        self.assertFalse(os.path.exists(root))
+
+    def test_sandbox_that_cannot_isolate_runs_nothing(self):
+        from agents.grader import Grader, GradingUnavailable
+
+        grader = Grader(1)
+        self.addCleanup(grader.close)
+        grader.root = "/nonexistent/sandbox-root"  # chroot fails
+        with self.assertRaises(GradingUnavailable):
+            grader.grade("print('ran')", {"ok": "True"})
+        self.assertIn("FileNotFoundError", grader.snapshot()["unavailable"])
+        self.assertEqual(grader.graded, 0)
+
+    def test_unavailable_grading_is_not_reported_as_a_failed_grade(self):
+        from agents.grader import Grader
+
+        grader = Grader(1)
+        self.addCleanup(grader.close)
+        grader.unavailable = "OSError: unshare refused"
+        self.addCleanup(setattr, coordinator, "grader", coordinator.grader)
+        coordinator.grader = grader
+        self._exercise()
+
+        response = self.client.post("/grade", json={"user_id": "grade_user", "code": "print(1)"})
+        self.assertEqual(response.status_code, 503)
+        message = "here is my solution\n```python\nfor i in range(2, 21, 2):\n    print(i)\n```"
+        data = self.client.post("/chat", json={"message": message, "user_id": "grade_user"}).get_json()
+        self.assertNotEqual(data["source"], "graded")
+        self.assertNotIn("checks passed", data["response"])
+
+    def test_nothing_to_grade_is_a_400(self):
+        response = self.client.post("/grade", json={"user_id": "grade_user", "code": "print(1)"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_code_pasted_into_chat_is_graded_locally(self):
+        self._exercise()
+        message = "here is my solution\n```python\nfor i in range(2, 21, 2):\n    print(i)\n```"
+        data = self.client.post("/chat", json={"message": message, "user_id": "grade_user"}).get_json()
+        self.assertEqual((data["agent_used"], data["source"]), ("practice", "graded"))
+        self.assertIn("2 of 2 checks passed", data["response"])
+        progress = coordinator.get_public_context("grade_user")["progress"]
+        self.assertEqual((progress["exercises_completed"], progress["exercises_delivered"]), (1, 1))
+
+
 class RouterTests(unittest.TestCase):
     """Regression tests for the substring-matching router bugs."""
 
+    def test_pasted_code_is_routed_by_the_words_around_it(self):
+        coordinator.reset_user_context("route_code_user")
+        # "plan" and "practice" inside the code are not requests.
+        code = "plan = ['practice', 'review']\nfor step in plan:\n    print(step)"
+        self.assertEqual(determine_agent(code, "route_code_user"), "assessment")
+        self.assertEqual(determine_agent("why does this print twice?\n" + code, "route_code_user"), "teaching")
+        self.assertEqual(determine_agent("explain this\n```\n" + code + "\n```", "route_code_user"), "teaching")
+
     def test_greeting_does_not_match_substrings(self):
         self.assertEqual(determine_agent("This is a dictionary question", "route_user"), "assessment")
         self.assertEqual(determine_agent("hi", "route_user"), "assessment")
@@ -245,6 +725,16 @@ class LocalFallbackTests(unittest.TestCase):
         text = coordinator._local_fallback("teaching", "explain that again", self.uid)
         self.assertIn("Topic: dictionaries", text)
 
+    def test_teaching_fallback_searches_the_library_without_a_topic_word(self):
+        text = coordinator._local_fallback("teaching", "I keep getting an index error", self.uid)
+        self.assertIn("Topic: lists", text)
+        self.assertIn("Most relevant to your question (common mistake):\nIndex errors", text)
+
+    def test_teaching_fallback_quotes_the_section_that_answers_the_question(self):
+        text = coordinator._local_fallback("teaching", "why a KeyError in my dictionary?", self.uid)
+        self.assertIn("Topic: dictionaries", text)
+        self.assertIn("Key errors when accessing non-existent keys", text.split("\n\n")[1])
+
     def test_practice_difficulty_follows_level_and_history(self):
         coordinator.update_context(self.uid, {"skill_level": "advanced"})
         text = coordinator._local_fallback("practice", "exercise on loops", self.uid)
@@ -256,5 +746,26 @@ class LocalFallbackTests(unittest.TestCase):
         self.assertIn("Python Developer Path", text)
 
 
+class ContentLibraryTests(unittest.TestCase):
+    """The lesson tables are shared module state, so results must be copies."""
+
+    def test_editing_a_result_does_not_change_the_library(self):
+        from agents.curriculum_agent import generate_python_curriculum
+        from agents.practice_agent import generate_python_exercise
+        from agents.teaching_agent import teach_python_concept
+
+        lesson = teach_python_concept("loops")
+        lesson["code_examples"].append("junk")
+        self.assertNotIn("junk", teach_python_concept("loops")["code_examples"])
+
+        exercise = generate_python_exercise("lists", difficulty="medium")
+        exercise["hints"].clear()
+        self.assertTrue(generate_python_exercise("lists", difficulty="medium")["hints"])
+
+        plan = generate_python_curriculum("beginner")
+        plan["weekly_plan"][0]["topic"] = "junk"
+        self.assertNotEqual(generate_python_curriculum("beginner")["weekly_plan"][0]["topic"], "junk")
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -7,12 +7,16 @@ real free-tier quota, so a quota error caused more quota errors.
 
 import asyncio
 import os
+import threading
+import time
 import unittest
+from unittest import mock
 
 os.environ["LOCAL_ONLY"] = "1"
 
 from agents.base_agent import AgentCallError, build_contents, classify_error
 from agents.coordinator import LearningCoachCoordinator
+from agents.vector_index import np
 
 QUOTA_MESSAGE = (
     "429 RESOURCE_EXHAUSTED. {'error': {'code': 429, 'message': 'You exceeded your "
@@ -85,13 +89,16 @@ class FakeAgent:
         self.last_model_used = "gemini-test"
         self.received = []
 
-    def query(self, message, history=None, profile_note=""):
+    def query(self, message, history=None, profile_note="", **options):
         self.calls += 1
-        self.received.append({"message": message, "history": history, "profile": profile_note})
+        self.received.append({"message": message, "history": history, "profile": profile_note, **options})
         if self.error:
             raise self.error
         return self.reply
 
+    def pre_resolve(self, known):
+        return None
+
 
 class RetryPolicyTests(unittest.TestCase):
     def setUp(self):
@@ -205,6 +212,136 @@ class PromptWiringTests(unittest.TestCase):
             self.assertIs(cls.system_instruction, AGENT_PROMPTS[cls.name], cls.name)
 
 
+class FakeStore:
+    """In-memory stand-in for FirestoreStore that counts round trips."""
+
+    def __init__(self, docs=None, fail=False):
+        self.docs = dict(docs or {})
+        self.fail = fail
+        self.single_reads = 0
+        self.batch_reads = 0
+
+    def get_user_context(self, user_id):
+        self.single_reads += 1
+        return self.docs.get(user_id)
+
+    def get_user_contexts(self, user_ids):
+        self.batch_reads += 1
+        if self.fail:
+            raise RuntimeError("firestore unavailable")
+        return {uid: self.docs[uid] for uid in user_ids if uid in self.docs}
+
+    def get_recent_user_contexts(self, limit):
+        return dict(list(self.docs.items())[:limit])
+
+    def save_user_context(self, user_id, context):
+        self.full_writes = getattr(self, "full_writes", 0) + 1
+        self.docs[user_id] = dict(context)
+
+    def update_user_context(self, user_id, updates, deletes=(), appends=None):
+        if user_id not in self.docs:
+            raise KeyError(user_id)
+        self.deltas = getattr(self, "deltas", [])
+        self.deltas.append({"updates": updates, "deletes": list(deletes), "appends": appends or {}})
+
+
+class PrefetchTests(unittest.TestCase):
+    def test_prefetch_reads_every_learner_in_one_call(self):
+        coord = LearningCoachCoordinator()
+        coord.store = FakeStore({"a": {"skill_level": "advanced"}})
+
+        self.assertEqual(coord.prefetch_contexts(["a", "b", "a"]), 2)
+        self.assertEqual(coord.store.batch_reads, 1)
+        self.assertEqual(coord.get_user_context("a")["skill_level"], "advanced")
+        self.assertEqual(coord.get_user_context("b")["skill_level"], "unknown")
+        # Both were cached by the batch read; no per-user reads followed.
+        self.assertEqual(coord.store.single_reads, 0)
+
+    def test_failed_prefetch_leaves_learners_to_the_normal_read(self):
+        coord = LearningCoachCoordinator()
+        coord.store = FakeStore({"a": {"skill_level": "advanced"}}, fail=True)
+
+        self.assertEqual(coord.prefetch_contexts(["a"]), 0)
+        self.assertEqual(coord.get_user_context("a")["skill_level"], "advanced")
+
+    def test_warm_up_does_not_replace_a_live_context(self):
+        coord = LearningCoachCoordinator()
+        coord.store = FakeStore(
+            {"a": {"skill_level": "advanced"}, "b": {"skill_level": "beginner"}}
+        )
+        live = coord.get_user_context("b")
+        live["skill_level"] = "intermediate"
+
+        self.assertEqual(coord.warm_up_contexts(10), 1)
+        self.assertEqual(coord.get_user_context("a")["skill_level"], "advanced")
+        self.assertIs(coord.get_user_context("b"), live)
+        self.assertEqual(coord.store.single_reads, 1)
+
+
+class DeltaPersistenceTests(unittest.TestCase):
+    def setUp(self):
+        self.coord = LearningCoachCoordinator()
+        self.coord.store = FakeStore()
+        self.coord.mode = "local"
+        self.coord.agents = {name: None for name in self.coord._agent_names()}
+
+    def _turn(self, agent_name, message, user_id="delta_user"):
+        return asyncio.run(self.coord.process_with_agent(agent_name, message, user_id))
+
+    def test_turn_writes_only_changed_fields_and_new_history(self):
+        self._turn("teaching", "explain loops")
+        self.assertEqual(self.coord.store.full_writes, 1)
+
+        self._turn("teaching", "explain lists")
+        self.assertEqual(self.coord.store.full_writes, 1)
+        recorded = self.coord.store.deltas[-1]
+        self.assertEqual(recorded["updates"]["progress.interactions"], 2)
+        self.assertEqual(recorded["updates"]["last_topic"], "lists")
+        self.assertNotIn("history", recorded["updates"])
+        self.assertNotIn("skill_level", recorded["updates"])
+        self.assertEqual([t["role"] for t in recorded["appends"]["history"]], ["coach"])
+
+    def test_removed_field_is_deleted(self):
+        self._turn("practice", "give me an exercise on loops")
+        self._turn("teaching", "I solved it, here is my code")
+        deletes = [d for delta in self.coord.store.deltas for d in delta["deletes"]]
+        self.assertIn("last_exercise", deletes)
+
+    def test_long_history_is_rewritten_not_appended_forever(self):
+        for _ in range(40):
+            self._turn("teaching", "explain loops")
+        rewrites = [d for d in self.coord.store.deltas if "history" in d["updates"]]
+        self.assertTrue(rewrites)
+        self.assertLessEqual(len(rewrites[-1]["updates"]["history"]), 50)
+
+    def test_failed_delta_falls_back_to_a_full_write(self):
+        self._turn("teaching", "explain loops")
+        self.coord.store.docs.clear()
+        self._turn("teaching", "explain lists")
+        self.assertEqual(self.coord.store.full_writes, 2)
+
+    def test_store_round_trips_run_off_the_event_loop(self):
+        import threading
+
+        store, callers = self.coord.store, []
+        for name in ("get_user_context", "save_user_context", "update_user_context"):
+            def recording(*args, _method=getattr(store, name)):
+                callers.append(threading.get_ident())
+                return _method(*args)
+
+            setattr(store, name, recording)
+
+        async def turns():
+            loop_thread = threading.get_ident()
+            await self.coord.process_with_agent("teaching", "explain loops", "offloop_user")
+            await self.coord.process_with_agent("teaching", "explain lists", "offloop_user")
+            return loop_thread
+
+        loop_thread = asyncio.run(turns())
+        self.assertEqual(len(callers), 5)  # one read, four writes
+        self.assertNotIn(loop_thread, callers)
+
+
 class ContextMigrationTests(unittest.TestCase):
     def test_legacy_stored_context_is_upgraded(self):
         coord = LearningCoachCoordinator()
@@ -221,6 +358,713 @@ class ContextMigrationTests(unittest.TestCase):
         self.assertEqual(context["progress"]["exercises_delivered"], 0)
         self.assertEqual(context["progress"]["exercises_completed"], 2)
 
+    def test_compact_context_round_trips_the_stored_shape(self):
+        from agents.learner_context import LearnerContext
+
+        stored = {
+            "skill_level": "intermediate",
+            "learning_style": "visual",
+            "last_topic": "loops",
+            "last_model": None,
+            "future_field": {"kept": True},
+            "history": [
+                {"role": "user", "text": "explain loops", "agent": "teaching", "at": 1.5},
+                {"role": "coach", "text": "Loops repeat work", "agent": "teaching"},
+            ],
+            "progress": {
+                "topics_learned": ["loops"],
+                "exercises_delivered": 1,
+                "exercises_completed": 0,
+                "interactions": 2,
+                "streak": 3,
+            },
+        }
+        self.assertEqual(LearnerContext.from_dict(stored).to_dict(), stored)
+
+    def test_null_progress_fields_load_as_defaults(self):
+        coord = LearningCoachCoordinator()
+        stored = {"progress": {"topics_learned": None, "interactions": None, "exercises_completed": 2}}
+        context = coord._normalize_context(stored)
+        coord._record_response_context("nulls", context, "teaching", "explain loops", "Loops repeat", "local")
+
+        self.assertEqual(context["progress"]["topics_learned"], ["loops"])
+        self.assertEqual(context["progress"]["interactions"], 1)
+        self.assertEqual(context["progress"]["exercises_completed"], 2)
+
+    def test_progress_setdefault_returns_the_stored_list(self):
+        from agents.learner_context import Progress
+
+        progress = Progress()
+        del progress["topics_learned"]
+        progress.setdefault("topics_learned", []).append("loops")
+        self.assertEqual(progress["topics_learned"], ["loops"])
+
+    def test_turn_roles_share_one_string(self):
+        from agents.learner_context import Turn
+
+        # Firestore hands back a fresh string per document; interning stops
+        # every stored turn from carrying its own copy.
+        a = Turn.from_dict({"role": "".join(["co", "ach"]), "text": "x"})
+        b = Turn.from_dict({"role": "".join(["coa", "ch"]), "text": "y"})
+        self.assertIs(a["role"], b["role"])
+
+
+class HistoryCompressionTests(unittest.TestCase):
+    REPLY = (
+        "Loops let you repeat a block of code. A for loop walks over a sequence:\n\n"
+        "for i in range(5):\n    print(i)\n\n"
+        "Common mistakes: Infinite loops, Off-by-one errors, Modifying list while iterating\n\n"
+        "Practice: Write a loop that prints the numbers from 1 to 10."
+    )
+
+    def test_long_reply_is_stored_compressed_and_read_back_intact(self):
+        from agents.learner_context import Turn
+
+        turn = Turn("coach", self.REPLY, "teaching", 2.0)
+        stored = turn.to_dict()
+        self.assertNotIn("text", stored)
+        self.assertLess(len(stored["z"]), len(self.REPLY) // 2)
+
+        loaded = Turn.from_dict(stored)
+        self.assertIs(loaded._text, stored["z"])  # nothing decompressed on load
+        self.assertEqual(loaded["text"], self.REPLY)
+        self.assertEqual(build_contents("next", [loaded])[0].parts[0].text, self.REPLY)
+
+    def test_short_text_stays_plain(self):
+        from agents.learner_context import Turn
+
+        self.assertEqual(Turn("user", "explain loops").to_dict()["text"], "explain loops")
+
+    def test_current_dictionary_holds_no_dated_sample_text(self):
+        import re
+
+        from agents import text_codec
+
+        dictionary = text_codec._DICTIONARIES[text_codec.CURRENT_VERSION]
+        self.assertIsNone(re.search(rb"\d{4}-\d{2}-\d{2}", dictionary))
+        self.assertNotIn(b"Report date", dictionary)
+
+    def test_unknown_dictionary_version_is_refused(self):
+        from agents import text_codec
+
+        with self.assertRaises(ValueError):
+            text_codec.decompress(b"\xff\x00")
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class ResponseCacheTests(unittest.TestCase):
+    ANSWER = "A for loop walks over each item: for fruit in fruits: print(fruit)"
+
+    def setUp(self):
+        self.coord = LearningCoachCoordinator()
+        self.coord.mode = "gemini_api_key"
+        self.coord.agents = {name: None for name in self.coord._agent_names()}
+
+    def _run(self, agent, message, user_id):
+        self.coord.agents["teaching"] = agent
+        return asyncio.run(self.coord.process_with_agent("teaching", message, user_id))
+
+    def test_degraded_mode_reuses_an_answer_to_the_same_question(self):
+        self._run(FakeAgent(reply=self.ANSWER), "what is a for loop?", "cache_a")
+        quota = FakeAgent(error=classify_error(Exception(QUOTA_MESSAGE)))
+        text = self._run(quota, "What's a for loop", "cache_b")
+
+        self.assertTrue(text.endswith(self.ANSWER))
+        self.assertIn("an earlier answer to a very similar question", text)
+        self.assertNotIn("lesson library", text)
+
+    def test_different_question_still_gets_the_library(self):
+        self._run(FakeAgent(reply=self.ANSWER), "what is a for loop?", "cache_a")
+        quota = FakeAgent(error=classify_error(Exception(QUOTA_MESSAGE)))
+        text = self._run(quota, "what is a while loop?", "cache_b")
+        self.assertIn("Topic: loops", text)
+
+    def test_closer_questions_at_other_levels_do_not_hide_a_match(self):
+        from agents.response_cache import ResponseCache
+
+        cache = ResponseCache(100)
+        for n in range(10):
+            cache.add("teaching", "advanced", "adaptive", "what is a for loop exactly", f"advanced {n}")
+        cache.add("teaching", "beginner", "adaptive", "what is a for loop please", "beginner answer")
+        hit = cache.nearest("teaching", "beginner", "adaptive", "what is a for loop exactly")
+        self.assertEqual(hit.answer, "beginner answer")
+        self.assertIsNone(cache.nearest("practice", "beginner", "adaptive", "what is a for loop exactly"))
+        self.assertIsNone(cache.nearest("teaching", "beginner", "visual", "what is a for loop exactly"))
+
+    def test_answers_written_for_one_learners_history_are_not_shared(self):
+        agent = FakeAgent(reply=self.ANSWER)
+        self._run(agent, "what are lists?", "cache_a")
+        self._run(agent, "what is a for loop?", "cache_a")
+        self.assertIn("lists", agent.received[-1]["profile"])
+        self.assertEqual(len(self.coord.response_cache), 1)  # only the first, generic answer
+
+    def test_questions_with_code_are_not_shared(self):
+        self._run(FakeAgent(reply=self.ANSWER), "why does x = 5 print nothing?", "cache_a")
+        self.assertEqual(len(self.coord.response_cache), 0)
+
+    def test_banked_answer_is_served_before_the_library(self):
+        from agents.answer_bank import AnswerBank
+
+        self.coord.answer_bank = AnswerBank(
+            [
+                {"topic": "loops", "level": "beginner", "style": "adaptive",
+                 "template": "mistakes", "answer": "Banked: watch for infinite loops."},
+                {"topic": "loops", "level": "beginner", "style": "visual",
+                 "template": "explain", "answer": "Banked: picture a conveyor belt."},
+            ]
+        )
+        quota = FakeAgent(error=classify_error(Exception(QUOTA_MESSAGE)))
+        self.coord.update_context("bank_user", {"skill_level": "beginner", "learning_style": "visual"})
+
+        # Another style's answer to the right question beats the wrong question.
+        text = self._run(quota, "what mistakes do people make with loops?", "bank_user")
+        self.assertTrue(text.endswith("Banked: watch for infinite loops."))
+        self.assertIn("prepared in advance", text)
+
+        text = self._run(quota, "explain loops", "bank_user")
+        self.assertTrue(text.endswith("Banked: picture a conveyor belt."))
+
+        text = self._run(quota, "explain lists", "bank_user")
+        self.assertIn("Topic: lists", text)
+
+    def test_missing_bank_file_is_an_empty_bank(self):
+        from agents.answer_bank import AnswerBank
+
+        self.assertEqual(len(AnswerBank.load("/nonexistent/answer_bank.json")), 0)
+
+    def test_malformed_bank_file_is_an_empty_bank(self):
+        import json
+        import tempfile
+
+        from agents.answer_bank import BANK_VERSION, AnswerBank
+
+        for data in ([], 7, "answers", {"version": BANK_VERSION, "answers": {"a": 1}},
+                     {"version": BANK_VERSION, "answers": [["topic"], None, 3]}):
+            with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+                json.dump(data, f)
+            try:
+                with self.assertLogs("agents.answer_bank", "INFO"):
+                    self.assertEqual(len(AnswerBank.load(f.name)), 0)
+            finally:
+                os.unlink(f.name)
+
+    def test_index_survives_eviction_and_merges(self):
+        from agents.vector_index import MERGE_AT, TfidfIndex
+
+        index = TfidfIndex()
+        index.add("loops", "what is a for loop")
+        index.add("dicts", "how do dictionaries store keys")
+        index.discard("dicts")
+        self.assertEqual(index.search(["dictionaries keys"])[0], [])
+        for i in range(MERGE_AT + 5):
+            index.add(i, f"filler question q{i}")
+        self.assertEqual(index.search(["for loop", "filler question q7"])[0][0][0], "loops")
+        self.assertEqual(index.search(["filler question q7"])[0][0][0], 7)
+
+
+
+class ExercisePrefetchTests(unittest.TestCase):
+    def setUp(self):
+        from agents.prefetch import Prefetcher
+
+        self.coord = LearningCoachCoordinator()
+        self.coord.mode = "gemini_api_key"
+        self.coord.agents = {name: None for name in self.coord._agent_names()}
+        self.coord.agents["teaching"] = FakeAgent(reply="lesson on loops")
+        self.practice = FakeAgent(reply="Exercise: loops (easy)")
+        self.coord.agents["practice"] = self.practice
+        self.coord.prefetcher = Prefetcher(calls_per_hour=2)
+
+    def _run(self, agent_name, message, user_id="ahead_user"):
+        text = asyncio.run(self.coord.process_with_agent(agent_name, message, user_id))
+        self.coord.prefetcher.wait(timeout=5)
+        return text
+
+    def test_next_exercise_is_ready_after_a_lesson(self):
+        self._run("teaching", "explain loops")
+        self.assertEqual(self.practice.received[0]["message"], "Give me a new easy practice exercise on loops.")
+        # The background thread never writes the context a request may be saving.
+        context = self.coord.get_user_context("ahead_user")
+        self.assertNotIn("next_exercise", context)
+
+        text = self._run("practice", "give me an exercise")
+        self.assertEqual(text, "Exercise: loops (easy)")
+        self.assertEqual(self.coord.get_public_context("ahead_user")["last_response_source"], "prefetched")
+        # Served without a live call; the one after it is being prepared.
+        self.assertEqual(self.practice.calls, 2)
+        self.coord._collect_prefetched("ahead_user", context)
+        self.assertIn("next_exercise", context)
+
+    def test_exercise_prepared_for_a_reset_session_is_dropped(self):
+        self._run("teaching", "explain loops")
+        self.coord.reset_user_context("ahead_user")
+        context = self.coord.get_user_context("ahead_user")
+        self.coord._collect_prefetched("ahead_user", context)
+        self.assertNotIn("next_exercise", context)
+
+    def test_exercise_for_another_topic_is_not_served(self):
+        self._run("teaching", "explain loops")
+        self.practice.reply = "Exercise: lists"
+        text = self._run("practice", "give me an exercise on lists")
+        self.assertEqual(text, "Exercise: lists")
+        self.assertEqual(self.coord.get_public_context("ahead_user")["last_response_source"], "gemini")
+
+    def test_hourly_budget_caps_speculative_calls(self):
+        for user_id in ("a", "b", "c"):
+            self._run("teaching", "explain loops", user_id)
+        self.assertEqual(self.practice.calls, 2)
+        self.assertNotIn("next_exercise", self.coord.get_user_context("c"))
+        self.assertEqual(self.coord.health_snapshot()["prefetch_calls_left"], 0)
+
+
+
+class CallSchedulerTests(unittest.TestCase):
+    def setUp(self):
+        from agents.scheduler import CallScheduler
+
+        self.scheduler = CallScheduler(concurrency=1, queue_timeout_s=5)
+
+    def _wait_for_queue(self, depth):
+        for _ in range(500):
+            if self.scheduler.snapshot()["queued"] == depth:
+                return
+            time.sleep(0.01)
+        self.fail(f"queue never reached {depth}")
+
+    def test_lower_priority_number_is_admitted_first(self):
+        order = []
+
+        def call(name, priority):
+            with self.scheduler.slot("m", priority, self.scheduler.deadline()):
+                order.append(name)
+
+        with self.scheduler.slot("m", 1, self.scheduler.deadline()):
+            threads = []
+            for name, priority in (("progress", 3), ("practice", 1), ("assessment", 0)):
+                threads.append(threading.Thread(target=call, args=(name, priority)))
+                threads[-1].start()
+                self._wait_for_queue(len(threads))
+        for thread in threads:
+            thread.join(timeout=5)
+        self.assertEqual(order, ["assessment", "practice", "progress"])
+
+    def test_caller_past_its_deadline_gets_queue_timeout(self):
+        with self.scheduler.slot("m", 1, self.scheduler.deadline()):
+            with self.assertRaises(AgentCallError) as raised:
+                with self.scheduler.slot("m", 0, time.monotonic() + 0.05):
+                    pass
+            # Other models have their own slots.
+            with self.scheduler.slot("other", 1, self.scheduler.deadline()):
+                pass
+        self.assertEqual(raised.exception.kind, "queue_timeout")
+        self.assertFalse(raised.exception.retryable)
+        snapshot = self.scheduler.snapshot()
+        self.assertEqual((snapshot["queued"], snapshot["timeouts"]), (0, 1))
+
+    def test_queued_out_turn_gets_local_content_at_once(self):
+        coord = LearningCoachCoordinator()
+        coord.mode = "gemini_api_key"
+        coord.agents = {name: None for name in coord._agent_names()}
+        agent = FakeAgent(error=AgentCallError("queue_timeout", "No slot free"))
+        coord.agents["teaching"] = agent
+
+        text = asyncio.run(coord.process_with_agent("teaching", "explain loops", "busy_user"))
+        self.assertEqual(agent.calls, 1)
+        self.assertIn("very busy", text)
+        self.assertIn("Topic: loops", text)
+        self.assertIn("call_queue", coord.health_snapshot())
+
+
+
+class AnswerModeTests(unittest.TestCase):
+    def setUp(self):
+        self.coord = LearningCoachCoordinator()
+        self.coord.mode = "gemini_api_key"
+        self.coord.agents = {name: None for name in self.coord._agent_names()}
+        self.coord.update_context("mode_user", {"progress": {"topics_learned": ["loops"], "exercises_completed": 2}})
+
+    def _progress(self, agent):
+        self.coord.agents["progress"] = agent
+        return asyncio.run(self.coord.process_with_agent("progress", "how am I doing?", "mode_user"))
+
+    def test_progress_is_computed_locally_and_phrased_in_one_call(self):
+        agent = FakeAgent(reply="You've studied loops and finished 2 exercises - nice!")
+        text = self._progress(agent)
+        self.assertEqual(text, agent.reply)
+        self.assertEqual(agent.calls, 1)
+        sent = agent.received[0]
+        self.assertIn("Exercises completed: 2", sent["facts"])
+        self.assertIn("Next steps", sent["facts"])
+
+    def test_failed_phrasing_serves_the_local_report(self):
+        text = self._progress(FakeAgent(error=classify_error(Exception(QUOTA_MESSAGE))))
+        self.assertIn("Topics studied (1): loops", text)
+        self.assertNotIn("Note:", text)
+        self.assertEqual(self.coord.get_public_context("mode_user")["last_response_source"], "local")
+
+    def test_local_mode_makes_no_call(self):
+        from config.settings import AGENT_CONFIGS
+
+        agent = FakeAgent()
+        with mock.patch.dict(AGENT_CONFIGS["progress"], {"answer_mode": "local"}):
+            text = self._progress(agent)
+        self.assertEqual(agent.calls, 0)
+        self.assertIn("Exercises completed: 2", text)
+
+    def test_facts_go_in_the_message_and_tools_stay_off(self):
+        from types import SimpleNamespace
+
+        from agents.progress_agent import GenAIProgressAgent
+
+        sent = []
+
+        def generate_content(model, contents, config):
+            sent.append((model, contents, config))
+            return SimpleNamespace(text="phrased")
+
+        agent = GenAIProgressAgent(SimpleNamespace(models=SimpleNamespace(generate_content=generate_content)))
+        agent.query("how am I doing?", facts="Exercises completed: 2", models=["cheap-model"])
+        model, contents, config = sent[0]
+        self.assertEqual(model, "cheap-model")
+        self.assertIn("Exercises completed: 2", contents[-1].parts[0].text)
+        self.assertFalse(config.tools)
+
+
+
+class PreResolvedToolTests(unittest.TestCase):
+    """Tools the turn obviously needs run locally, so the model answers in one trip."""
+
+    def setUp(self):
+        from types import SimpleNamespace
+
+        from agents.curriculum_agent import GenAICurriculumAgent
+        from agents.practice_agent import GenAIPracticeAgent
+        from agents.teaching_agent import GenAITeachingAgent
+
+        self.sent = []
+
+        def generate_content(model, contents, config):
+            self.sent.append((contents[-1].parts[0].text, config))
+            return SimpleNamespace(text="narrated")
+
+        client = SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+        self.coord = LearningCoachCoordinator()
+        self.coord.mode = "gemini_api_key"
+        self.coord.agents = {name: None for name in self.coord._agent_names()}
+        self.coord.agents["teaching"] = GenAITeachingAgent(client)
+        self.coord.agents["practice"] = GenAIPracticeAgent(client)
+        self.coord.agents["curriculum"] = GenAICurriculumAgent(client)
+
+    def _run(self, agent_name, message):
+        return asyncio.run(self.coord.process_with_agent(agent_name, message, "tools_user"))
+
+    def test_lesson_for_a_named_topic_is_sent_as_facts(self):
+        self._run("teaching", "explain loops to me")
+        text, config = self.sent[0]
+        self.assertEqual(len(self.sent), 1)
+        self.assertIn("teach_python_concept(topic='loops', level='beginner'", text)
+        self.assertIn("Infinite while loops", text)
+        self.assertFalse(config.tools)
+
+    def test_practice_uses_the_topic_under_discussion_and_next_difficulty(self):
+        self.coord.update_context("tools_user", {"last_topic": "lists", "skill_level": "intermediate"})
+        self._run("practice", "give me an exercise")
+        self.assertIn("generate_python_exercise(topic='lists', level='intermediate', difficulty='medium')", self.sent[0][0])
+        self._run("curriculum", "what should I learn next?")
+        self.assertIn("generate_python_curriculum(experience_level='intermediate')", self.sent[1][0])
+
+    def test_no_obvious_call_leaves_tools_to_the_model(self):
+        self._run("teaching", "why is my code slow?")
+        text, config = self.sent[0]
+        self.assertEqual(text, "why is my code slow?")
+        self.assertTrue(config.tools)
+
+
+
+class AgentProfileTests(unittest.TestCase):
+    def _agent(self, profile):
+        from agents.progress_agent import GenAIProgressAgent
+
+        agent = GenAIProgressAgent(client=None, model_id="gemini-2.5-flash")
+        agent.configure(profile)
+        return agent
+
+    def test_profile_sets_the_model_chain_and_generation_settings(self):
+        from config.settings import AGENT_CONFIGS
+
+        profile = dict(AGENT_CONFIGS["progress"], model="gemini-2.5-flash-lite")
+        profile["fallback_models"] = ["gemini-2.0-flash-lite"]
+        agent = self._agent(profile)
+        self.assertEqual(agent.model_id, "gemini-2.5-flash-lite")
+        self.assertEqual(agent.fallback_models, ["gemini-2.0-flash-lite"])
+        self.assertEqual(agent.priority, 3)
+        config = agent._config("", model=agent.model_id)
+        self.assertEqual((config.temperature, config.max_output_tokens), (0.4, 400))
+        self.assertEqual(config.thinking_config.thinking_budget, 0)
+        self.assertEqual(config.automatic_function_calling.maximum_remote_calls, 3)
+
+    def test_agent_models_come_from_the_environment(self):
+        import importlib
+
+        import config.settings as settings
+
+        env = {"AGENT_MODELS": "Curriculum=gemini-2.5-flash-lite, progress=, nobody=x"}
+        try:
+            with mock.patch.dict(os.environ, env):
+                configs = importlib.reload(settings).AGENT_CONFIGS
+        finally:
+            importlib.reload(settings)
+        self.assertEqual(configs["curriculum"]["model"], "gemini-2.5-flash-lite")
+        self.assertTrue(all("model" not in configs[name] for name in configs if name != "curriculum"))
+        self.assertTrue(all("model" not in profile for profile in settings.AGENT_CONFIGS.values()))
+
+        agent = self._agent(configs["progress"])
+        self.assertEqual(agent.model_id, "gemini-2.5-flash")
+
+    def test_thinking_budget_is_added_to_the_output_cap_and_skipped_for_old_models(self):
+        agent = self._agent({"max_output_tokens": 1000, "thinking_budget": 512})
+        self.assertEqual(agent._config("", model="gemini-2.5-flash").max_output_tokens, 1512)
+        old = agent._config("", model="gemini-2.0-flash-lite")
+        self.assertIsNone(old.thinking_config)
+        self.assertEqual(old.max_output_tokens, 1000)
+
+    def test_empty_profile_keeps_the_defaults(self):
+        agent = self._agent({})
+        config = agent._config("")
+        self.assertEqual(agent.model_id, "gemini-2.5-flash")
+        self.assertIsNone(config.max_output_tokens)
+        self.assertIsNone(config.thinking_config)
+        self.assertEqual(config.automatic_function_calling.maximum_remote_calls, 4)
+
+
+def _response(text, finish="STOP"):
+    from google.genai import types
+
+    content = types.Content(role="model", parts=[types.Part(text=text)])
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=content, finish_reason=finish)]
+    )
+
+
+class StubModels:
+    """`client.models` returning canned responses and recording each config."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def generate_content(self, model, contents, config):
+        self.calls.append((contents, config))
+        return self.responses.pop(0)
+
+
+class OutputBudgetTests(unittest.TestCase):
+    def _agent(self, *responses):
+        from types import SimpleNamespace
+
+        from agents.teaching_agent import GenAITeachingAgent
+        from config.settings import AGENT_CONFIGS
+
+        models = StubModels(*responses)
+        agent = GenAITeachingAgent(client=SimpleNamespace(models=models), model_id="gemini-2.5-flash")
+        agent.configure(AGENT_CONFIGS["teaching"])
+        return agent, models
+
+    def test_budget_follows_the_learner_level(self):
+        agent, _ = self._agent()
+        self.assertEqual(agent._config("", use_tools=False, level="beginner").max_output_tokens, 450 + 512)
+        self.assertEqual(agent._config("", use_tools=False, level="advanced").max_output_tokens, 1000 + 512)
+        self.assertEqual(agent._config("", use_tools=False).max_output_tokens, 1000 + 512)
+
+    def test_prose_cut_off_is_trimmed_without_another_call(self):
+        agent, models = self._agent(_response("Loops repeat work. A for loop walks a list. It also", "MAX_TOKENS"))
+        text = agent.query("explain loops", facts="lesson", level="beginner")
+        self.assertEqual(text, "Loops repeat work. A for loop walks a list.")
+        self.assertEqual((len(models.calls), agent.last_continuations), (1, 0))
+
+    def test_example_cut_off_is_finished_in_one_short_call(self):
+        from agents.base_agent import CONTINUATION_TOKENS, CONTINUE_PROMPT
+
+        agent, models = self._agent(
+            _response("A loop:\n\n```python\nfor n in [1, 2]:\n", "MAX_TOKENS"),
+            _response("    print(n)\n```"),
+        )
+        text = agent.query("explain loops", facts="lesson", level="beginner")
+        self.assertTrue(text.endswith("for n in [1, 2]:\n    print(n)\n```"))
+        self.assertEqual(agent.last_continuations, 1)
+        contents, config = models.calls[1]
+        self.assertEqual(contents[-1].parts[0].text, CONTINUE_PROMPT)
+        self.assertEqual(config.max_output_tokens, CONTINUATION_TOKENS)
+        self.assertEqual(config.thinking_config.thinking_budget, 0)
+
+
+class CodeAnalysisTests(unittest.TestCase):
+    def test_strings_and_comments_are_not_syntax(self):
+        from agents.assessment_agent import assess_with_code_sample
+
+        code = "# use @property and yield here\nemail = 'me@example.com'\nprint('for lambda: async')\n"
+        result = assess_with_code_sample(code)
+        self.assertEqual(result["assessed_level"], "beginner")
+        self.assertEqual(result["features"], {"assignments": 1, "calls": 1})
+
+    def test_features_and_complexity_come_from_one_walk(self):
+        from agents.code_analysis import analyze_code
+
+        code = (
+            "@cache\n"
+            "def evens(n):\n"
+            "    for i in range(n):\n"
+            "        if i % 2 == 0 and i > 0:\n"
+            "            yield i\n"
+        )
+        features = analyze_code(code)
+        self.assertEqual(features.level, "advanced")
+        self.assertEqual(features.complexity, 4)
+        self.assertIs(analyze_code(code), features)  # cached per code text
+
+    def test_code_that_does_not_parse_fails_soft(self):
+        from agents.code_analysis import analyze_code
+
+        features = analyze_code("def area(r):\n    return 3.14 * r *\n")
+        self.assertFalse(features.parsed)
+        self.assertIn("line 2", features.syntax_error)
+        self.assertTrue(features.is_code)
+        self.assertEqual(features.present(), ["functions", "returns"])
+        self.assertFalse(analyze_code("I want to learn for loops and while loops").is_code)
+
+    def test_lines_equal_to_code_lines_stay_in_the_words(self):
+        from agents.code_analysis import find_code
+
+        # "#" is a one-character string, so every copy is the same object.
+        block = find_code("x = 1\ny = 2\n#\nprint(x + y)\nWhy does the comment line below break it?\n#\nthanks")
+        self.assertEqual(block.code, "x = 1\ny = 2\n#\nprint(x + y)")
+        self.assertEqual(block.prose, "Why does the comment line below break it?\n#\nthanks")
+
+    def test_local_assessment_reads_a_pasted_sample(self):
+        coord = LearningCoachCoordinator()
+        code = "class Stack:\n    def __init__(self):\n        self.items = []\n    key = lambda self: 1\n"
+        text = coord._local_fallback("assessment", code, "code_user")
+        self.assertIn("Skill Level: advanced", text)
+        self.assertIn("Your code uses: dunder methods, lambdas", text)
+
+
+
+class LiveUpdatesTests(unittest.TestCase):
+    def test_events_carry_only_what_changed(self):
+        from agents.live_updates import ContextFeed
+
+        feed = ContextFeed()
+        view = {"skill_level": "unknown", "progress": {"interactions": 0, "topics_learned": []}}
+        stream = feed.subscribe("u", view, {"degraded": False})
+        self.assertIn('"skill_level":"unknown"', stream.next_event(0))
+        self.assertIn('"degraded":false', stream.next_event(0))
+
+        feed.publish("u", {"skill_level": "unknown", "progress": {"interactions": 1, "topics_learned": []}})
+        feed.publish("u", {"skill_level": "unknown", "progress": {"interactions": 1, "topics_learned": []}})
+        feed.publish("other", {"skill_level": "advanced"})
+        self.assertEqual(stream.next_event(0), 'event: context\ndata: {"progress":{"interactions":1}}\n\n')
+        self.assertIsNone(stream.next_event(0))
+
+    def test_a_page_that_stops_reading_gets_a_snapshot(self):
+        from agents.live_updates import MAX_QUEUED_EVENTS, ContextFeed
+
+        feed = ContextFeed()
+        stream = feed.subscribe("u", {"n": 0}, {"degraded": False})
+        for n in range(1, MAX_QUEUED_EVENTS * 2):
+            feed.publish("u", {"n": n})
+        events = []
+        while (event := stream.next_event(0)) is not None:
+            events.append(event)
+        self.assertLessEqual(len(events), MAX_QUEUED_EVENTS)
+        self.assertIn('"n":%d' % (MAX_QUEUED_EVENTS * 2 - 1), events[-1] + events[-2])
+        self.assertTrue(any('"degraded":false' in e for e in events))
+
+
+class JSONProviderTests(unittest.TestCase):
+    def test_output_decodes_the_same_as_the_default_provider(self):
+        import datetime
+        import decimal
+        import json
+
+        from flask import Flask
+        from flask.json.provider import DefaultJSONProvider
+
+        from web.json_provider import FastJSONProvider
+
+        app = Flask(__name__)
+        fast, default = FastJSONProvider(app), DefaultJSONProvider(app)
+        body = {
+            "response": "Loops — repeat ✓",
+            "when": datetime.datetime(2024, 5, 1, 12, 30, tzinfo=datetime.timezone.utc),
+            "score": decimal.Decimal("9.5"),
+            "context": {"b": 1, "a": [1, 2, None]},
+        }
+        with app.app_context():
+            sent = fast.response(body).get_data()
+            self.assertEqual(json.loads(sent), json.loads(default.response(body).get_data()))
+            self.assertLess(sent.index(b'"context"'), sent.index(b'"response"'))  # still sorted
+            # What orjson refuses falls back to the standard library.
+            self.assertEqual(fast.dumps({"big": 2**70}), '{"big": 1180591620717411303424}')
+
+    def test_loads_accepts_what_the_stdlib_accepts(self):
+        import math
+
+        from flask import Flask
+
+        from web.json_provider import FastJSONProvider
+
+        provider = FastJSONProvider(Flask(__name__))
+        self.assertEqual(provider.loads(b'{"message": "hi"}'), {"message": "hi"})
+        self.assertTrue(math.isnan(provider.loads("[NaN]")[0]))
+        with self.assertRaises(ValueError):
+            provider.loads("{not json")
+
+
+class GenaiClientTests(unittest.TestCase):
+    def test_same_credentials_share_one_pooled_client(self):
+        from agents import genai_clients
+
+        client = genai_clients.client_for(api_key="pool-test-key")
+        self.assertIs(genai_clients.client_for(api_key="pool-test-key"), client)
+        self.assertIsNot(genai_clients.client_for(api_key="pool-test-other"), client)
+
+        options = genai_clients.http_options()
+        self.assertEqual(options.timeout, int(genai_clients.GENAI_TIMEOUT_S * 1000))
+        limits = options.client_args["limits"]
+        self.assertEqual(limits.max_connections, genai_clients.GENAI_MAX_CONNECTIONS)
+        self.assertEqual(limits.keepalive_expiry, genai_clients.GENAI_KEEPALIVE_S)
+
+        stats = genai_clients.pool_stats()
+        self.assertGreaterEqual(stats["clients"], 2)
+        self.assertEqual(stats["open_connections"], 0)  # none until the first call
+        self.assertEqual(stats["idle_connections"], 0)
+
+    def test_pool_stats_leave_out_counts_when_httpx_internals_move(self):
+        from agents import genai_clients
+
+        genai_clients.client_for(api_key="pool-test-key")
+        with mock.patch.object(genai_clients, "_pool", return_value=object()):
+            self.assertEqual(genai_clients.connection_stats(), {})
+            stats = genai_clients.pool_stats()
+        self.assertNotIn("open_connections", stats)
+        self.assertEqual(stats["max_connections"], genai_clients.GENAI_MAX_CONNECTIONS)
+
+    def test_helper_reuses_the_registry_client(self):
+        from agents import genai_clients
+        from api import get_gemini_client
+
+        env = {"GEMINI_API_KEY": "pool-test-helper", "GOOGLE_GENAI_USE_VERTEXAI": ""}
+        with mock.patch.dict(os.environ, env):
+            client = get_gemini_client()
+            self.assertIs(get_gemini_client(), client)
+        self.assertIs(genai_clients.client_for(api_key="pool-test-helper"), client)
+
+    def test_http_timeouts_are_classified_as_timeouts(self):
+        import httpx
+
+        self.assertEqual(classify_error(httpx.ReadTimeout("The read operation timed out")).kind, "timeout")
+        self.assertEqual(classify_error(httpx.PoolTimeout("")).kind, "timeout")
+
 
 if __name__ == "__main__":
     unittest.main()
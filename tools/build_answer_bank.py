@@ -0,0 +1,119 @@
+"""Fill the degraded-mode answer bank from the real teaching agent.
+
+Usage:
+    python tools/build_answer_bank.py [--output data/answer_bank.json]
+        [--max-calls 200] [--interval 4] [--topics loops lists ...]
+        [--overwrite]
+
+Run it off-peak - e.g. from Cloud Scheduler shortly after the daily quota
+window resets - with the same credentials as the service. Each run asks for
+the answers still missing, most common question shapes first (see
+`agents/answer_bank.TEMPLATES`), until `--max-calls` is spent or the API says
+the quota is gone. It then exits cleanly, and the next run carries on where
+this one stopped. The file is rewritten atomically after every answer, so an
+interrupted run loses nothing, and a running service picks the bank up on its
+next start.
+
+The full grid is topics x 3 levels x 4 styles x 5 templates (780 answers for
+the 13 topics), so a free-tier key fills it over a few nights.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from itertools import product
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from agents.answer_bank import BANK_VERSION, LEVELS, STYLES, TEMPLATES  # noqa: E402
+from agents.base_agent import AgentCallError  # noqa: E402
+from agents.coordinator import ANSWER_BANK_PATH, TOPIC_ALIASES, LearningCoachCoordinator  # noqa: E402
+from agents.learner_context import LearnerContext  # noqa: E402
+
+
+def load(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("answers", [])
+
+
+def save(path, answers):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": BANK_VERSION, "answers": answers}, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", default=ANSWER_BANK_PATH)
+    parser.add_argument("--max-calls", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=4.0, help="seconds between calls (free tier: ~15/min)")
+    parser.add_argument("--topics", nargs="+", default=list(TOPIC_ALIASES))
+    parser.add_argument("--overwrite", action="store_true", help="regenerate answers already in the bank")
+    args = parser.parse_args()
+
+    coordinator = LearningCoachCoordinator()
+    coordinator.initialize_agents()
+    agent = coordinator.agents.get("teaching")
+    if agent is None:
+        sys.exit("No Gemini credentials configured; nothing to generate with.")
+
+    answers = [] if args.overwrite else load(args.output)
+    have = {(a["topic"], a["level"], a["style"], a["template"]) for a in answers}
+    # Template first: with a limited budget the common question shapes are
+    # covered for every topic before the rarer ones for any.
+    todo = [
+        (topic, level, style, template)
+        for template, level, topic, style in product(TEMPLATES, LEVELS, args.topics, STYLES)
+        if (topic, level, style, template) not in have
+    ]
+    print(f"{len(have)} answers banked, {len(todo)} missing, budget {args.max_calls} calls")
+
+    calls = 0
+    for topic, level, style, template in todo:
+        if calls >= args.max_calls:
+            break
+        question = TEMPLATES[template].format(topic=topic)
+        profile = coordinator._profile_note(
+            LearnerContext.from_dict({"skill_level": level, "learning_style": style})
+        )
+        calls += 1
+        try:
+            answer = agent.query(question, history=None, profile_note=profile)
+        except AgentCallError as err:
+            if err.retryable:
+                print(f"  {topic}/{level}/{style}/{template}: {err.kind}, skipped")
+                time.sleep(max(args.interval, err.retry_after or 0))
+                continue
+            print(f"Stopping: {err.kind} ({str(err)[:200]})")
+            break
+        if answer and answer.strip():
+            answers.append(
+                {
+                    "topic": topic,
+                    "level": level,
+                    "style": style,
+                    "template": template,
+                    "question": question,
+                    "answer": answer.strip(),
+                    "model": getattr(agent, "last_model_used", None),
+                    "generated_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                }
+            )
+            save(args.output, answers)
+            print(f"  {topic}/{level}/{style}/{template}: {len(answer)} chars")
+        time.sleep(args.interval)
+
+    print(f"{calls} calls made, {len(answers)} answers in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Train the preset deflate dictionary used to compress history text.
+
+Usage:
+    python tools/train_history_dictionary.py agents/history_v2.zdict \
+        [--corpus replies.txt ...] [--size 16384]
+
+The built-in corpus is turn text as a learner's history stores it: scripted
+sessions (assessment, lessons, exercises, "I finished it", plans, progress)
+run through the coordinator in local mode for every level and style, with
+some turns answered as during an outage, notice and all. Only turns long
+enough to be compressed (`HISTORY_COMPRESS_MIN_CHARS`) are kept, and a text
+counts as often as the sessions stored it, as it would in Firestore.
+`--corpus` adds real coach output, one reply per paragraph block separated
+by a line containing only `---` (export it from Firestore history). Retraining on real
+Gemini replies is the main way to improve the ratio.
+
+Lines that differ from one day or learner to the next (dates, counters,
+topic lists) are dropped before counting, and a segment must recur in at
+least `MIN_REPLIES` turns, so nothing in the dictionary belongs to one
+sample. Selection is plain frequency counting: word n-grams scored by how
+many turns contain them times the text they add beyond what is already in
+the dictionary. The best segments go at the end of the dictionary, where
+deflate reaches them with the shortest distances.
+
+A shipped dictionary is frozen - blobs in Firestore name it by version. Write
+a new `history_v<N>.zdict`, register it in `agents/text_codec.py` and bump
+CURRENT_VERSION; keep the old file.
+"""
+
+import argparse
+import asyncio
+import heapq
+import os
+import re
+import sys
+from collections import Counter
+from itertools import product
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("LOCAL_ONLY", "1")
+
+from agents import text_codec  # noqa: E402
+from agents.base_agent import AgentCallError  # noqa: E402
+from agents.coordinator import LearningCoachCoordinator  # noqa: E402
+from agents.teaching_agent import LEVEL_ADAPTATIONS, STYLE_SUGGESTIONS, TEACHING_MATERIALS  # noqa: E402
+
+MIN_WORDS, MAX_WORDS = 2, 12
+
+# Turns a segment must appear in to be worth dictionary space.
+MIN_REPLIES = 3
+
+# Lines that change per day or per learner: "Report date: 2026-10-19",
+# "Exercises completed: 3", "Topics studied (2): loops, lists".
+VOLATILE = re.compile(r"\d{4}-\d{2}-\d{2}|^[^:]+: \d+$|^Topics studied \(")
+
+SESSION = [
+    ("assessment", "Hi, my Python is {level} and I learn best by {style_hint}"),
+    ("teaching", "Explain {topic}"),
+    ("teaching", "Can you explain {topic} again but simpler?"),
+    ("practice", "Give me a practice exercise on {topic}"),
+    ("practice", "I'm stuck on this exercise, can you help?"),
+    ("practice", "I finished it!"),
+    ("practice", "Give me another exercise on {topic}"),
+    ("practice", "Done, that one works too"),
+    ("practice", "One more exercise on {topic} please"),
+    ("teaching", "What are common mistakes with {topic}?"),
+    ("curriculum", "What should I learn next?"),
+    ("progress", "How am I doing?"),
+]
+STYLE_HINTS = {"visual": "seeing diagrams", "auditory": "talking things through",
+               "kinesthetic": "typing out examples", "adaptive": "trying things"}
+OUTAGES = ("quota_exhausted", "rate_limit", "server_error")
+
+
+def builtin_corpus(topics=None):
+    """History turn text from scripted local sessions at every level and style.
+
+    `topics` limits the sessions to those lessons (all of them by default),
+    so a benchmark can hold some out.
+    """
+    coordinator = LearningCoachCoordinator()
+    coordinator.initialize_agents()
+    min_chars = text_codec.MIN_CHARS or 200
+    turns = []
+    for n, (level, style) in enumerate(product(LEVEL_ADAPTATIONS, STYLE_SUGGESTIONS)):
+        for t, topic in enumerate(topics or TEACHING_MATERIALS):
+            user = f"trainer-{n}-{t}"
+            coordinator.update_context(user, {"skill_level": level, "learning_style": style})
+            for i, (agent, message) in enumerate(SESSION):
+                message = message.format(topic=topic, level=level, style_hint=STYLE_HINTS[style])
+                if (i + t) % 4 == 0:
+                    # A turn served during an outage carries its notice.
+                    notice = coordinator._degraded_notice(AgentCallError(OUTAGES[i % len(OUTAGES)], ""))
+                    context = coordinator.get_user_context(user)
+                    reply = coordinator._local_fallback(agent, message, user, context, notice=notice)
+                    coordinator._append_history(context, "user", message, agent)
+                    coordinator._record_response_context(user, context, agent, message, reply, "fallback")
+                else:
+                    asyncio.run(coordinator.process_with_agent(agent, message, user))
+            for turn in coordinator.get_user_context(user)["history"]:
+                text = turn["text"]
+                if len(text) >= min_chars:
+                    turns.append(text)
+            coordinator.reset_user_context(user)
+    return turns
+
+
+def stable_lines(text):
+    """`text` without the lines that differ between otherwise identical turns."""
+    return "\n".join(line for line in text.split("\n") if not VOLATILE.search(line))
+
+
+def read_corpus(path):
+    text = Path(path).read_text(encoding="utf-8")
+    return [block.strip() for block in text.split("\n---\n") if block.strip()]
+
+
+def train(replies, size):
+    counts = Counter()
+    for reply in map(stable_lines, replies):
+        words = reply.split(" ")
+        seen = set()
+        for n in range(MIN_WORDS, MAX_WORDS + 1):
+            for i in range(len(words) - n + 1):
+                seen.add(tuple(words[i : i + n]))
+        counts.update(seen)
+
+    def pairs(segment):
+        return {segment[i : i + 2] for i in range(len(segment) - 1)}
+
+    def gain(segment, covered):
+        return counts[segment] * sum(len(a) + len(b) + 1 for a, b in pairs(segment) - covered)
+
+    # Lazy greedy: a segment's value is only what it adds beyond the word
+    # pairs already in the dictionary, so near-duplicate sentences do not
+    # crowd everything else out. Scores only fall, so re-score on pop.
+    covered = set()
+    heap = [(-gain(seg, covered), seg) for seg, count in counts.items() if count >= MIN_REPLIES]
+    heapq.heapify(heap)
+    chosen, total = [], 0
+    while heap and total < size:
+        _, segment = heapq.heappop(heap)
+        score = gain(segment, covered)
+        if score <= 0:
+            continue
+        if heap and score < -heap[0][0]:
+            heapq.heappush(heap, (-score, segment))
+            continue
+        text = " ".join(segment)
+        chosen.append(text)
+        covered |= pairs(segment)
+        total += len(text) + 1
+    # Best last: deflate distances are shortest to the end of the dictionary.
+    return "\n".join(reversed(chosen)).encode("utf-8")[-size:]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("output")
+    parser.add_argument("--corpus", action="append", default=[])
+    parser.add_argument("--size", type=int, default=16 * 1024)
+    args = parser.parse_args()
+
+    replies = builtin_corpus()
+    for path in args.corpus:
+        replies.extend(read_corpus(path))
+    dictionary = train(replies, args.size)
+    Path(args.output).write_bytes(dictionary)
+    print(f"{len(replies)} turns -> {len(dictionary)} byte dictionary at {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+from .asgi import AsyncFront
+from .assets import AssetTable, send_asset
+from .compression import Compression
+from .json_provider import FastJSONProvider
+
+__all__ = ["AssetTable", "AsyncFront", "Compression", "FastJSONProvider", "send_asset"]
@@ -0,0 +1,246 @@
+# web/asgi.py
+"""The Flask app served by an ASGI server, with the slow routes awaited natively.
+
+Under gunicorn every request holds a thread until its answer is written, and
+a `/chat` turn mostly waits seconds on the model; 32 threads means at most
+32 learners mid-turn per instance. `AsyncFront` is an ASGI application
+wrapping the same Flask app. Views given to it as coroutines, by method and
+endpoint (`/chat`, `/chat/batch`, `/events/<user_id>`), run on the server's
+event loop inside a Flask request context, so a turn waiting on the model
+holds no request thread at all. A native view may answer with an async
+iterator as the body; it is sent chunk by chunk until the client leaves,
+which is how an open `/events` stream costs a task and not a thread.
+
+Every other route goes through Flask's WSGI interface on a small thread pool,
+unchanged: a2wsgi's `WSGIMiddleware` when it is installed, a minimal bridge
+here otherwise. Nothing long-lived goes that way, so `/health` and the rest
+do not queue behind open streams.
+
+The model call itself is still the SDK's blocking call, which the
+coordinator hands to the loop's default executor, as it does store reads and
+writes. `AsyncFront` installs a pool of `call_threads` for that, shared by
+every turn on the loop; a thread parked on a socket costs memory, not CPU.
+How many calls actually reach the API at once is still the scheduler's
+`MODEL_CONCURRENCY` per model.
+
+Flask's `after_request` hooks (compression) run for native routes too, and
+responses are sent through the same `Response` objects, so both paths send
+the same bytes.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from flask import Flask
+from werkzeug.exceptions import HTTPException
+
+try:
+    from a2wsgi import WSGIMiddleware
+except Exception:  # pragma: no cover - optional dependency
+    WSGIMiddleware = None
+
+Route = Tuple[str, str]  # (method, endpoint)
+
+
+def wsgi_environ(scope: Dict[str, Any], body: bytes) -> Dict[str, Any]:
+    """The WSGI environ for one ASGI HTTP request (PEP 3333)."""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+        "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin1"),
+        "SERVER_NAME": str(server[0]),
+        "SERVER_PORT": str(server[1] or 80),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin1").upper().replace("-", "_")
+        value = value.decode("latin1")
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = f"HTTP_{name}"
+            if name in environ:  # a repeated header becomes one, comma-joined
+                value = f"{environ[name]},{value}"
+        environ[name] = value
+    return environ
+
+
+async def _read_body(receive) -> Tuple[bytes, bool]:
+    """The whole request body, and whether the client went away first."""
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return b"".join(chunks), True
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks), False
+
+
+class AsyncFront:
+    """ASGI application for `app`; `routes` maps (method, endpoint) to a coroutine view."""
+
+    def __init__(
+        self,
+        app: Flask,
+        routes: Dict[Route, Callable[..., Awaitable[Any]]],
+        call_threads: int = 256,
+        wsgi_threads: int = 32,
+    ):
+        self.app = app
+        self.routes = routes
+        self.call_threads = call_threads
+        self.wsgi_threads = wsgi_threads
+        self.wsgi: Optional[ThreadPoolExecutor] = None
+        self.bridge: Any = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        self._adopt_loop()
+        matched = self._match(scope)
+        if matched is None:
+            await self._through_wsgi(scope, receive, send)
+            return
+        body, gone = await _read_body(receive)
+        if gone:
+            return
+        await self._native(*matched, wsgi_environ(scope, body), receive, send)
+
+    def _match(self, scope) -> Optional[Tuple[Callable[..., Awaitable[Any]], Dict[str, Any]]]:
+        """The native view for this request and its URL arguments, if it has one."""
+        adapter = self.app.url_map.bind_to_environ(wsgi_environ(scope, b""))
+        try:
+            endpoint, args = adapter.match()
+        except HTTPException:  # 404, 405 and redirects are Flask's to answer
+            return None
+        view = self.routes.get((scope["method"], endpoint))
+        return (view, args) if view is not None else None
+
+    def _adopt_loop(self) -> None:
+        # The coordinator runs model calls with run_in_executor(None, ...).
+        # Pools belong to one loop: a loop shuts its default executor down
+        # when it closes, so a new loop (in tests, say) gets new ones.
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            loop.set_default_executor(ThreadPoolExecutor(self.call_threads, thread_name_prefix="model-call"))
+            if WSGIMiddleware is not None:
+                self.bridge = WSGIMiddleware(self.app.wsgi_app, workers=self.wsgi_threads)
+                self.wsgi = self.bridge.executor
+            else:
+                self.wsgi = ThreadPoolExecutor(self.wsgi_threads, thread_name_prefix="wsgi")
+            self._loop = loop
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self._adopt_loop()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.wsgi.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _native(self, view, args: Dict[str, Any], environ: Dict[str, Any], receive, send) -> None:
+        app = self.app
+        # The request context is a context variable, so it stays with this
+        # task across awaits and other requests on the loop never see it.
+        with app.request_context(environ):
+            try:
+                response = app.make_response(await view(**args))
+                response = app.process_response(response)
+            except Exception as exc:  # same contract as a Flask view raising
+                response = app.make_response(app.handle_exception(exc))
+            if hasattr(response.response, "__aiter__"):
+                await self._stream(response, receive, send)
+                return
+        started: List[Any] = []
+        chunks = response(environ, lambda status, headers, exc_info=None: started.extend((status, headers)))
+        body = b"".join(chunks)
+        await self._start(send, *started)
+        await send({"type": "http.response.body", "body": body})
+
+    async def _stream(self, response, receive, send) -> None:
+        """Send an async-iterator body until it ends or the client goes away."""
+        chunks = response.response.__aiter__()
+        # The only message left to receive is the disconnect. A stream waits
+        # on it alongside each chunk, so a closed tab frees it at once.
+        gone = asyncio.ensure_future(receive())
+        try:
+            await self._start(send, response.status, response.headers.to_wsgi_list())
+            while True:
+                step = asyncio.ensure_future(chunks.__anext__())
+                await asyncio.wait((step, gone), return_when=asyncio.FIRST_COMPLETED)
+                if not step.done():
+                    step.cancel()
+                    await asyncio.gather(step, return_exceptions=True)
+                    return
+                try:
+                    chunk = step.result()
+                except StopAsyncIteration:
+                    break
+                if chunk:
+                    data = chunk.encode() if isinstance(chunk, str) else chunk
+                    await send({"type": "http.response.body", "body": data, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            gone.cancel()
+            close = getattr(chunks, "aclose", None)
+            if close is not None:
+                await close()
+
+    async def _through_wsgi(self, scope, receive, send) -> None:
+        if self.bridge is not None:
+            await self.bridge(scope, receive, send)
+            return
+        body, gone = await _read_body(receive)
+        if gone:
+            return
+        environ = wsgi_environ(scope, body)
+        started: List[Any] = []
+
+        def run() -> bytes:
+            def start_response(status, headers, exc_info=None):
+                started[:] = [status, headers]
+
+            chunks = self.app.wsgi_app(environ, start_response)
+            try:
+                return b"".join(chunks)
+            finally:
+                close = getattr(chunks, "close", None)
+                if close is not None:
+                    close()
+
+        body = await asyncio.get_running_loop().run_in_executor(self.wsgi, run)
+        await self._start(send, *started)
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    async def _start(send, status: str, headers: List[Tuple[str, str]]) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": int(status.split(" ", 1)[0]),
+                "headers": [(k.lower().encode("latin1"), v.encode("latin1")) for k, v in headers],
+            }
+        )
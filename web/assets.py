@@ -0,0 +1,100 @@
+# web/assets.py
+"""Static files under content-hashed names, cacheable forever.
+
+Flask served `static/app.js` and `static/styles.css` with its defaults, so a
+returning learner's browser asked for both again on every visit. Here each
+file under static/ is also published as `/assets/<name>.<hash>.<ext>`, where
+the hash is of its content, and the page links to those (`asset_url` in the
+templates). A changed file gets a new name, so every published name can be
+cached as immutable.
+
+The files are read and compressed once, at startup: gzip always, brotli when
+the `brotli` package is installed. A client gets the smallest variant it
+accepts. `/static/...` keeps working for anything that links there directly.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+import os
+from typing import Dict, NamedTuple, Optional
+
+from flask import Request, Response
+
+try:
+    import brotli
+except Exception:  # pragma: no cover - optional dependency
+    brotli = None
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+class Asset(NamedTuple):
+    """One static file: its published name, content and compressed variants."""
+
+    name: str
+    mimetype: str
+    body: bytes
+    variants: Dict[str, bytes]  # content-encoding -> body, smallest first
+    etag: str
+
+
+def _variants(body: bytes) -> Dict[str, bytes]:
+    found = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        found["br"] = brotli.compress(body, quality=11)
+    kept = {enc: data for enc, data in found.items() if len(data) < len(body)}
+    return dict(sorted(kept.items(), key=lambda item: len(item[1])))
+
+
+class AssetTable:
+    """Every file under `folder`, by original and by published name."""
+
+    def __init__(self, folder: str, url_prefix: str = "/assets"):
+        self.url_prefix = url_prefix
+        self._by_file: Dict[str, Asset] = {}
+        self._by_name: Dict[str, Asset] = {}
+        for root, _, files in os.walk(folder):
+            for filename in files:
+                path = os.path.join(root, filename)
+                relative = os.path.relpath(path, folder).replace(os.sep, "/")
+                with open(path, "rb") as fh:
+                    body = fh.read()
+                digest = hashlib.sha256(body).hexdigest()[:12]
+                stem, ext = os.path.splitext(relative)
+                asset = Asset(
+                    name=f"{stem}.{digest}{ext}",
+                    mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+                    body=body,
+                    variants=_variants(body),
+                    etag=digest,
+                )
+                self._by_file[relative] = asset
+                self._by_name[asset.name] = asset
+
+    def url(self, filename: str) -> str:
+        """The published URL of `filename`; its plain /static URL if unknown."""
+        asset = self._by_file.get(filename)
+        return f"{self.url_prefix}/{asset.name}" if asset else f"/static/{filename}"
+
+    def get(self, name: str) -> Optional[Asset]:
+        return self._by_name.get(name)
+
+
+def send_asset(asset: Asset, request: Request) -> Response:
+    """The asset in the smallest encoding `request` accepts, or a 304."""
+    encoding = next((enc for enc in asset.variants if request.accept_encodings[enc]), None)
+    # A strong ETag names one representation, so each encoding has its own.
+    etag = f"{asset.etag}-{encoding}" if encoding else asset.etag
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(asset.variants[encoding] if encoding else asset.body, mimetype=asset.mimetype)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = IMMUTABLE
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
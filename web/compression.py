@@ -0,0 +1,147 @@
+# web/compression.py
+"""gzip or brotli for JSON replies and event streams, negotiated per request.
+
+Coach answers and learner state are prose and repeated JSON keys, and they
+compress to a third of their size or less; main.py sent them as they were.
+`Compression` is an `after_request` hook. For a client whose
+`Accept-Encoding` allows it, it compresses:
+
+- JSON bodies of at least `min_bytes`. Below that the gzip framing and the
+  CPU cost more than the bytes saved, so `/status` and most errors go as
+  they are.
+- `text/event-stream` responses as they stream. One compressor runs for the
+  whole stream and is flushed after every event, so each event reaches the
+  page at once, and later events reuse the keys earlier ones already sent.
+  A stream served natively by `AsyncFront` (an async iterator) is wrapped
+  the same way.
+
+Levels are chosen for latency, not the smallest output: past gzip 4 a
+4000-character reply gets under 1% smaller for up to 40% more CPU
+(benchmarks/response_compression.py), and brotli's quality 4 is its usual
+fast setting. brotli is used when the `brotli`
+package is installed and the client accepts it at least as readily as gzip;
+otherwise gzip.
+
+Responses that already carry a `Content-Encoding` (the precompressed
+/assets files) and bodiless ones (304s) are left alone. A compressed
+response's ETag becomes weak, since the bytes now depend on the encoding.
+"""
+
+from __future__ import annotations
+
+import zlib
+from typing import AsyncIterator, Iterable, Iterator, Optional
+
+from flask import Flask, Response, request
+
+try:
+    import brotli
+except Exception:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESSIBLE = ("application/json", "text/event-stream")
+
+
+class _Stream:
+    """One encoder for one response: `chunk` per piece, then `finish`."""
+
+    def __init__(self, encoding: str, level: int):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=level)
+            self._zlib = None
+        else:
+            self._brotli = None
+            # wbits 31: a gzip header and trailer rather than a zlib one.
+            self._zlib = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes, flush: bool = False) -> bytes:
+        if self._brotli is not None:
+            out = self._brotli.process(data)
+            return out + self._brotli.flush() if flush else out
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self) -> bytes:
+        return self._brotli.finish() if self._brotli is not None else self._zlib.flush()
+
+
+class Compression:
+    """Registers itself on `app` and compresses what it can (module docstring)."""
+
+    def __init__(
+        self,
+        app: Optional[Flask] = None,
+        min_bytes: int = 512,
+        gzip_level: int = 4,
+        brotli_quality: int = 4,
+    ):
+        self.min_bytes = min_bytes
+        self.levels = {"gzip": gzip_level, "br": brotli_quality}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.after_request(self.compress)
+
+    def choose(self, accept) -> Optional[str]:
+        """The encoding to send a client with this `Accept-Encoding`, or None."""
+        usable = ("br", "gzip") if brotli is not None else ("gzip",)
+        return accept.best_match(usable) if accept else None
+
+    def compress(self, response: Response) -> Response:
+        if response.mimetype not in COMPRESSIBLE:
+            return response
+        response.vary.add("Accept-Encoding")
+        if (
+            response.status_code < 200
+            or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers
+        ):
+            return response
+        encoding = self.choose(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        if hasattr(response.response, "__aiter__"):
+            response.response = self._stream_async(response.response, encoding)
+            response.headers.pop("Content-Length", None)
+        elif response.is_streamed:
+            response.response = self._stream(response.response, encoding)
+            response.headers.pop("Content-Length", None)
+        else:
+            body = response.get_data()
+            if len(body) < self.min_bytes:
+                return response
+            stream = _Stream(encoding, self.levels[encoding])
+            response.set_data(stream.chunk(body) + stream.finish())
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def _stream(self, chunks: Iterable, encoding: str) -> Iterator[bytes]:
+        stream = _Stream(encoding, self.levels[encoding])
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                yield stream.chunk(chunk, flush=True)
+            yield stream.finish()
+        finally:
+            # Closing this generator (the client went away) must still close
+            # the view's, so its cleanup runs.
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+
+    async def _stream_async(self, chunks, encoding: str) -> AsyncIterator[bytes]:
+        stream = _Stream(encoding, self.levels[encoding])
+        try:
+            async for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                yield stream.chunk(chunk, flush=True)
+            yield stream.finish()
+        finally:
+            await chunks.aclose()
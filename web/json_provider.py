@@ -0,0 +1,80 @@
+# web/json_provider.py
+"""Flask's JSON provider, with orjson doing the work when it is installed.
+
+Every `/chat` reply, every batch result and every `/health` probe goes
+through `app.json`. Flask's default provider encodes with the standard
+library into a `str` and then encodes that again to bytes. orjson writes
+UTF-8 bytes directly and is several times faster on the same payloads (see
+benchmarks/json_serialization.py).
+
+Output matches the default provider wherever it matters: keys are sorted
+when `sort_keys` is set (Flask's default), debug responses are indented, and
+dates, decimals and anything with `__html__` still go through Flask's
+`default`, so dates stay HTTP dates rather than orjson's ISO format. The only
+visible difference is that non-ASCII text is sent as UTF-8 rather than
+`\\u` escapes.
+
+Anything orjson refuses (integers wider than 64 bits, non-string keys, a
+type `default` does not know) is handed to the standard library, which gives
+the same result or the same error it always did. Without orjson this is the
+default provider.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except Exception:  # pragma: no cover - optional dependency
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """`DefaultJSONProvider` that encodes and decodes with orjson if it can."""
+
+    def _encode(self, obj: Any, pretty: bool = False) -> bytes:
+        option = orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        # Callers asking for stdlib-only options (cls, ensure_ascii...) get
+        # the stdlib encoder.
+        if orjson is None or set(kwargs) - {"default", "sort_keys"}:
+            return super().dumps(obj, **kwargs)
+        try:
+            return self._encode(obj).decode()
+        except TypeError:
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            # NaN, huge integers and the like; the stdlib decides, and raises
+            # the usual ValueError if it is not JSON at all.
+            return super().loads(s, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any):
+        """Same contract as Flask's, without the str round trip."""
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        if args and kwargs:
+            raise TypeError("app.json.response() takes either args or kwargs, not both")
+        obj = args[0] if len(args) == 1 else (args or kwargs or None)
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        try:
+            body = self._encode(obj, pretty)
+        except TypeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)